@@ -0,0 +1,338 @@
+"""
+build_user_adoption_leaderboard as main.py had it before adoption.py: one dict of
+stats per user, scored user by user. Kept verbatim as the reference the NumPy
+leaderboard of adoption.UserAdoptionAccumulator is checked and timed against by
+benchmarks/bench_adoption.py.
+"""
+import math
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "cpuad-updater"))
+
+from fingerprint_cache import generate_unique_hash
+
+
+def _compute_percentile(sorted_values, percentile):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * (percentile / 100)
+    lower = math.floor(k)
+    upper = math.ceil(k)
+    if lower == upper:
+        return float(sorted_values[int(k)])
+    lower_value = sorted_values[lower]
+    upper_value = sorted_values[upper]
+    weight_upper = k - lower
+    weight_lower = upper - k
+    return float(lower_value) * weight_lower + float(upper_value) * weight_upper
+
+
+def _robust_scale(value, lower, upper):
+    if upper <= lower:
+        return 1.0
+    return max(0.0, min(1.0, (value - lower) / (upper - lower)))
+
+
+def build_user_adoption_leaderboard(metrics_data, organization_slug, slug_type, top_n=10, user_team_lookup=None):
+    if not metrics_data:
+        return []
+
+    grouped = {}
+    report_start_days = set()
+    report_end_days = set()
+
+    for record in metrics_data:
+        login = record.get("user_login") or "unknown"
+        entry = grouped.setdefault(login, {
+            "events_logged": 0,
+            "volume": 0,
+            "code_generation": 0,
+            "code_acceptance": 0,
+            "loc_added": 0,
+            "loc_suggested": 0,
+            "agent_usage": 0,
+            "chat_usage": 0,
+            "days": set(),
+        })
+
+        entry["events_logged"] += 1
+        entry["volume"] += record.get("user_initiated_interaction_count", 0)
+        entry["code_generation"] += record.get("code_generation_activity_count", 0)
+        entry["code_acceptance"] += record.get("code_acceptance_activity_count", 0)
+        entry["loc_added"] += record.get("loc_added_sum", 0)
+        entry["loc_suggested"] += record.get("loc_suggested_to_add_sum", 0)
+        if record.get("used_agent"):
+            entry["agent_usage"] += 1
+        if record.get("used_chat"):
+            entry["chat_usage"] += 1
+        day_val = record.get("day")
+        if day_val:
+            entry["days"].add(day_val)
+
+        start_day = record.get("report_start_day")
+        if start_day:
+            report_start_days.add(start_day)
+        end_day = record.get("report_end_day")
+        if end_day:
+            report_end_days.add(end_day)
+
+    global_start_day = min(report_start_days) if report_start_days else None
+    global_end_day = max(report_end_days) if report_end_days else None
+
+    # Determine range days for Activity Score: prefer report window, fall back to 28
+    if global_start_day and global_end_day:
+        try:
+            start_dt = datetime.strptime(global_start_day, "%Y-%m-%d")
+            end_dt = datetime.strptime(global_end_day, "%Y-%m-%d")
+            range_days = max((end_dt - start_dt).days + 1, 1)
+        except ValueError:
+            range_days = 28
+    else:
+        range_days = 28
+
+    summaries = []
+    for login, stats in grouped.items():
+        active_days = len(stats["days"])
+        interaction_per_day = (
+            stats["volume"] / active_days if active_days else 0.0
+        )
+        accepted_per_active_day = (
+            stats["code_acceptance"] / active_days if active_days else 0.0
+        )
+        # Chat engagement rate: fraction of activity records where chat was used.
+        # user_initiated_interaction_count (volume) tracks all user-initiated prompts but
+        # equals interaction_per_day; use chat_usage / events_logged as a distinct signal.
+        chat_per_active_day = (
+            stats["chat_usage"] / stats["events_logged"] if stats["events_logged"] else 0.0
+        )
+        acceptance_rate = (
+            stats["code_acceptance"] / stats["code_generation"]
+            if stats["code_generation"]
+            else 0.0
+        )
+        average_loc_added = (
+            stats["loc_added"] / active_days if active_days else 0.0
+        )
+        # Reliance proxy: fraction of suggested lines the user accepted (0.0-1.0)
+        loc_acceptance_rate = (
+            stats["loc_added"] / stats["loc_suggested"]
+            if stats["loc_suggested"]
+            else 0.0
+        )
+        feature_breadth = stats["agent_usage"] + stats["chat_usage"]
+
+        # Stamp a day for Grafana time filtering: prefer global_end_day, fallback to current UTC day
+        stamped_day = (
+            global_end_day if global_end_day else datetime.utcnow().strftime("%Y-%m-%d")
+        )
+
+        summary = {
+            "user_login": login,
+            "organization_slug": organization_slug,
+            "slug_type": slug_type,
+            "assignee_team_slug": (user_team_lookup or {}).get(login, "no-team"),
+            "events_logged": stats["events_logged"],
+            "volume": stats["volume"],
+            "code_generation_activity_count": stats["code_generation"],
+            "code_acceptance_activity_count": stats["code_acceptance"],
+            "loc_added_sum": stats["loc_added"],
+            "loc_suggested_to_add_sum": stats["loc_suggested"],
+            "average_loc_added": average_loc_added,
+            "accepted_per_active_day": accepted_per_active_day,
+            "chat_per_active_day": chat_per_active_day,
+            "loc_acceptance_rate": loc_acceptance_rate,
+            "interactions_per_day": interaction_per_day,
+            "acceptance_rate": acceptance_rate,
+            "feature_breadth": feature_breadth,
+            "agent_usage": stats["agent_usage"],
+            "chat_usage": stats["chat_usage"],
+            "active_days": active_days,
+            "report_start_day": global_start_day,
+            "report_end_day": global_end_day,
+            "day": stamped_day,
+            "bucket_type": "user",
+            "is_top10": False,
+            "rank": None,
+        }
+
+        summary["unique_hash"] = generate_unique_hash(
+            summary,
+            key_properties=[
+                "organization_slug",
+                "user_login",
+                "report_start_day",
+                "report_end_day",
+                "bucket_type",
+            ],
+        )
+
+        summaries.append(summary)
+
+    if not summaries:
+        return []
+
+    signals = {
+        "volume": [entry["volume"] for entry in summaries],
+        "interactions_per_day": [entry["interactions_per_day"] for entry in summaries],
+        "acceptance_rate": [entry["acceptance_rate"] for entry in summaries],
+        "average_loc_added": [entry["average_loc_added"] for entry in summaries],
+        "feature_breadth": [entry["feature_breadth"] for entry in summaries],
+        "accepted_per_active_day": [entry["accepted_per_active_day"] for entry in summaries],
+        "chat_per_active_day": [entry["chat_per_active_day"] for entry in summaries],
+        "loc_acceptance_rate": [entry["loc_acceptance_rate"] for entry in summaries],
+    }
+
+    bounds = {}
+    for key, values in signals.items():
+        sorted_values = sorted(values)
+        lower = _compute_percentile(sorted_values, 5)
+        upper = _compute_percentile(sorted_values, 95)
+        bounds[key] = (lower, upper)
+
+    for entry in summaries:
+        norm_volume = _robust_scale(entry["volume"], *bounds["volume"])
+        norm_interactions = _robust_scale(
+            entry["interactions_per_day"], *bounds["interactions_per_day"]
+        )
+        norm_acceptance = _robust_scale(
+            entry["acceptance_rate"], *bounds["acceptance_rate"]
+        )
+        norm_loc_added = _robust_scale(
+            entry["average_loc_added"], *bounds["average_loc_added"]
+        )
+        norm_feature = _robust_scale(
+            entry["feature_breadth"], *bounds["feature_breadth"]
+        )
+
+        base_score = (
+            0.2 * norm_volume
+            + 0.2 * norm_interactions
+            + 0.2 * norm_acceptance
+            + 0.2 * norm_loc_added
+            + 0.2 * norm_feature
+        )
+        entry["_base_score"] = base_score
+
+        # A) Activity Score (0-100): active days + suggestions accepted/day + chat prompts/day
+        active_days_component = min(entry["active_days"] / range_days, 1.0)
+        accepted_component = _robust_scale(
+            entry["accepted_per_active_day"], *bounds["accepted_per_active_day"]
+        )
+        chat_component = _robust_scale(
+            entry["chat_per_active_day"], *bounds["chat_per_active_day"]
+        )
+        activity_score_pct = round(
+            (0.4 * active_days_component + 0.35 * accepted_component + 0.25 * chat_component) * 100,
+            1,
+        )
+        entry["activity_score_pct"] = activity_score_pct
+
+        # B) Reliance Score proxy (0-100): fraction of Copilot-suggested lines accepted
+        # Note: True reliance = Copilot lines accepted / total lines added (git data not available).
+        # Proxy uses loc_added / loc_suggested (line acceptance rate of Copilot suggestions).
+        reliance_score_pct = round(
+            _robust_scale(entry["loc_acceptance_rate"], *bounds["loc_acceptance_rate"]) * 100,
+            1,
+        )
+        entry["reliance_score_pct"] = reliance_score_pct
+
+    max_active_days = max(entry["active_days"] for entry in summaries)
+    for entry in summaries:
+        bonus = 0.1 * (entry["active_days"] / max_active_days) if max_active_days else 0.0
+        bonus = min(bonus, 0.1)
+        entry["consistency_bonus"] = bonus
+        entry["adoption_score"] = entry["_base_score"] * (1 + bonus)
+
+    max_score = max(entry["adoption_score"] for entry in summaries)
+    for entry in summaries:
+        entry["adoption_pct"] = (
+            round(entry["adoption_score"] / max_score * 100, 1)
+            if max_score
+            else 0.0
+        )
+
+    summaries.sort(key=lambda e: e["adoption_pct"], reverse=True)
+    leaderboard = summaries[:top_n]
+    for rank, entry in enumerate(leaderboard, start=1):
+        entry["rank"] = rank
+        entry["is_top10"] = True
+
+    entries = []
+    for entry in leaderboard:
+        entry["bucket_type"] = "user"
+        entries.append(entry)
+
+    others = summaries[top_n:]
+    if others:
+        others_count = len(others)
+        # Stamp a day for Grafana time filtering: prefer global_end_day, fallback to current UTC day
+        stamped_day = (
+            global_end_day if global_end_day else datetime.utcnow().strftime("%Y-%m-%d")
+        )
+
+        others_entry = {
+            "user_login": "Others",
+            "organization_slug": organization_slug,
+            "slug_type": slug_type,
+            "assignee_team_slug": "no-team",
+            "events_logged": sum(o["events_logged"] for o in others),
+            "volume": sum(o["volume"] for o in others),
+            "code_generation_activity_count": sum(
+                o["code_generation_activity_count"] for o in others
+            ),
+            "code_acceptance_activity_count": sum(
+                o["code_acceptance_activity_count"] for o in others
+            ),
+            "loc_added_sum": sum(o["loc_added_sum"] for o in others),
+            "loc_suggested_to_add_sum": sum(
+                o["loc_suggested_to_add_sum"] for o in others
+            ),
+            "average_loc_added": sum(o["average_loc_added"] for o in others) / others_count,
+            "accepted_per_active_day": sum(o["accepted_per_active_day"] for o in others) / others_count,
+            "chat_per_active_day": sum(o["chat_per_active_day"] for o in others) / others_count,
+            "loc_acceptance_rate": sum(o["loc_acceptance_rate"] for o in others) / others_count,
+            "interactions_per_day": sum(
+                o["interactions_per_day"] for o in others
+            )
+            / others_count,
+            "acceptance_rate": sum(o["acceptance_rate"] for o in others) / others_count,
+            "feature_breadth": sum(o["feature_breadth"] for o in others) / others_count,
+            "agent_usage": sum(o["agent_usage"] for o in others),
+            "chat_usage": sum(o["chat_usage"] for o in others),
+            "active_days": sum(o["active_days"] for o in others),
+            "activity_score_pct": round(sum(o["activity_score_pct"] for o in others) / others_count, 1),
+            "reliance_score_pct": round(sum(o["reliance_score_pct"] for o in others) / others_count, 1),
+            "report_start_day": global_start_day,
+            "report_end_day": global_end_day,
+            "day": stamped_day,
+            "bucket_type": "others",
+            "is_top10": False,
+            "rank": None,
+            "others_count": others_count,
+            "consistency_bonus": 0.0,
+        }
+
+        others_entry["adoption_score"] = (
+            sum(o["adoption_score"] for o in others) / others_count
+        )
+        score_scale = max_score if max_score else 1
+        others_entry["adoption_pct"] = round(
+            others_entry["adoption_score"] / score_scale * 100, 1
+        )
+        others_entry["unique_hash"] = generate_unique_hash(
+            others_entry,
+            key_properties=[
+                "organization_slug",
+                "user_login",
+                "report_start_day",
+                "report_end_day",
+                "bucket_type",
+            ],
+        )
+        entries.append(others_entry)
+
+    for entry in entries:
+        entry.pop("_base_score", None)
+    return entries
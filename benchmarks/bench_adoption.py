@@ -0,0 +1,128 @@
+"""
+Benchmark of the adoption leaderboard of adoption.UserAdoptionAccumulator (NumPy
+columns) against the per-user build_user_adoption_leaderboard it replaced
+(benchmarks/adoption_reference.py) on synthetic user metrics. Checks that both
+return the same entries and prints the timings as JSON.
+
+    python benchmarks/bench_adoption.py --users 50000 --days 28
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "cpuad-updater"))
+
+from adoption import UserAdoptionAccumulator
+from adoption_reference import build_user_adoption_leaderboard
+
+
+def synthetic_records(users, days, seed=0):
+    rng = random.Random(seed)
+    for u in range(users):
+        login = f"user-{u}"
+        # Heavier users are active on more days, some users only once
+        active_days = rng.randint(1, days)
+        for day in rng.sample(range(1, days + 1), active_days):
+            generation = rng.randint(0, 60)
+            suggested = rng.randint(0, 400)
+            yield {
+                "user_login": login,
+                "day": f"2025-02-{day:02d}",
+                "report_start_day": "2025-02-01",
+                "report_end_day": f"2025-02-{days:02d}",
+                "user_initiated_interaction_count": rng.randint(0, 40),
+                "code_generation_activity_count": generation,
+                "code_acceptance_activity_count": rng.randint(0, generation),
+                "loc_added_sum": rng.randint(0, suggested),
+                "loc_suggested_to_add_sum": suggested,
+                "used_agent": rng.random() < 0.3,
+                "used_chat": rng.random() < 0.6,
+            }
+
+
+def assert_same_entries(expected, actual):
+    # Exactly equal, floats included: the rounded percentages decide ranks and ties
+    assert len(expected) == len(actual), (len(expected), len(actual))
+    for left, right in zip(expected, actual):
+        assert list(left) == list(right), (list(left), list(right))
+        for key, value in left.items():
+            assert value == right[key], (left["user_login"], key, value, right[key])
+
+
+def check_seeds(seeds, top_n):
+    """Compare both leaderboards on small random populations, where percentile ties are common"""
+    for seed in range(seeds):
+        rng = random.Random(seed)
+        records = list(synthetic_records(rng.randint(1, 60), rng.randint(1, 28), seed=seed))
+        accumulator = UserAdoptionAccumulator()
+        for record in records:
+            accumulator.add(record)
+        try:
+            assert_same_entries(
+                build_user_adoption_leaderboard(records, "bench-org", "Organization", top_n=top_n),
+                accumulator.leaderboard("bench-org", "Organization", top_n=top_n),
+            )
+        except AssertionError as e:
+            raise AssertionError(f"seed {seed}: {e}") from e
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seeds", type=int, default=500, help="small random populations compared first")
+    args = parser.parse_args()
+
+    check_seeds(args.seeds, args.top_n)
+
+    records = list(synthetic_records(args.users, args.days))
+
+    def accumulate():
+        accumulator = UserAdoptionAccumulator()
+        for record in records:
+            accumulator.add(record)
+        return accumulator
+
+    accumulator, accumulate_seconds = timed(accumulate, args.repeat)
+    reference, reference_seconds = timed(
+        lambda: build_user_adoption_leaderboard(records, "bench-org", "Organization", top_n=args.top_n),
+        args.repeat,
+    )
+    entries, leaderboard_seconds = timed(
+        lambda: accumulator.leaderboard("bench-org", "Organization", top_n=args.top_n),
+        args.repeat,
+    )
+    assert_same_entries(reference, entries)
+
+    # Both sides from the records to the entries
+    numpy_seconds = accumulate_seconds + leaderboard_seconds
+    print(json.dumps({
+        "benchmark": "adoption_leaderboard",
+        "users": args.users,
+        "records": len(records),
+        "reference_seconds": round(reference_seconds, 4),
+        "accumulate_seconds": round(accumulate_seconds, 4),
+        "leaderboard_seconds": round(leaderboard_seconds, 4),
+        "numpy_seconds": round(numpy_seconds, 4),
+        "speedup": round(reference_seconds / numpy_seconds, 2),
+        "identical": True,
+        "seeds_identical": args.seeds,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark of the Elasticsearch write path against the in-process fake_es server:
+docs/sec and round-trips per document of ElasticsearchManager.write_to_es and
+write_bulk_to_es, create_user_top_by_day and create_user_summaries, on synthetic
+user metrics (benchmarks/synthetic.py). Latency and errors can be injected to see
+how batching and retries behave. Prints one JSON result (optionally written to --output).
+
+    python benchmarks/bench_es_ingest.py --users 2000 --latency-ms 2 --bulk-error-rate 0.01
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+UPDATER_PATH = os.path.join(BENCHMARKS_PATH, "..", "src", "cpuad-updater")
+sys.path.insert(0, UPDATER_PATH)
+
+from fake_es import FakeElasticsearch
+from synthetic import SyntheticEnterprise
+
+
+def user_metrics_docs(enterprise, calculate_top_values, generate_unique_hash, current_time):
+    """Synthetic users-28-day records enriched the way main.py enriches them"""
+    now = current_time()
+    for record in enterprise.iter_user_records():
+        doc = {
+            **record,
+            **calculate_top_values(record),
+            "organization_slug": enterprise.organization_slug,
+            "slug_type": "Organization",
+            "last_updated_at": now,
+        }
+        doc["unique_hash"] = generate_unique_hash(doc, ["organization_slug", "user_login", "day"])
+        yield doc
+
+
+def measure(fake, stage, fn):
+    """Run fn() -> documents processed, returns its timing and fake_es round-trips"""
+    before = fake.stats()
+    started_at = time.perf_counter()
+    docs = fn()
+    seconds = time.perf_counter() - started_at
+    after = fake.stats()
+    requests = after["requests"] - before["requests"]
+    by_endpoint = {
+        endpoint: count - before["requests_by_endpoint"].get(endpoint, 0)
+        for endpoint, count in after["requests_by_endpoint"].items()
+        if count != before["requests_by_endpoint"].get(endpoint, 0)
+    }
+    return {
+        "stage": stage,
+        "seconds": round(seconds, 4),
+        "docs": docs,
+        "docs_per_second": round(docs / seconds, 1) if seconds else None,
+        "requests": requests,
+        "requests_per_doc": round(requests / docs, 4) if docs else None,
+        "requests_by_endpoint": by_endpoint,
+        "injected_request_errors": after.get("injected_request_errors", 0) - before.get("injected_request_errors", 0),
+        "injected_bulk_errors": after.get("injected_bulk_errors", 0) - before.get("injected_bulk_errors", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--single-docs", type=int, default=500, help="documents written one by one with write_to_es")
+    parser.add_argument("--slices", type=int, default=1, help="PIT slices of create_user_top_by_day")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every fake_es request")
+    parser.add_argument("--request-error-rate", type=float, default=0.0, help="share of requests answered 503")
+    parser.add_argument("--bulk-error-rate", type=float, default=0.0, help="share of bulk items rejected with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the result to this file")
+    args = parser.parse_args()
+
+    fake = FakeElasticsearch(
+        latency=args.latency_ms / 1000,
+        request_error_rate=args.request_error_rate,
+        bulk_error_rate=args.bulk_error_rate,
+        seed=args.seed,
+    ).start()
+
+    # Configuration is read from the environment when the updater modules are
+    # imported, and index mappings are loaded relative to the updater folder
+    state_path = tempfile.mkdtemp(prefix="bench-es-state-")
+    os.environ["ELASTICSEARCH_URL"] = fake.url
+    os.environ["STATE_PATH"] = state_path
+    os.chdir(UPDATER_PATH)
+
+    from config import Indexes, Paras
+    from create_user_summary import create_user_summaries
+    from create_user_top_by_day import create_user_top_by_day
+    from es_manager import ElasticsearchManager
+    from fingerprint_cache import generate_unique_hash
+    from log_utils import current_time
+    from top_values import calculate_top_values
+
+    # Every write logs at INFO
+    logging.getLogger().setLevel(logging.WARNING)
+
+    enterprise = SyntheticEnterprise(teams=1, users=args.users, days=args.days, seed=args.seed)
+    docs = list(user_metrics_docs(enterprise, calculate_top_values, generate_unique_hash, current_time))
+
+    manager = None
+
+    def bootstrap():
+        nonlocal manager
+        manager = ElasticsearchManager()
+        return len(manager.index_names())
+
+    # Creates every index from its mapping file and stores the preserve_fields script
+    stages = [measure(fake, "bootstrap", bootstrap)]
+
+    single = [dict(doc) for doc in docs[: args.single_docs]]
+
+    def write_single():
+        for doc in single:
+            manager.write_to_es("bench_write_to_es", doc)
+        return len(single)
+
+    stages.append(measure(fake, "write_to_es", write_single))
+    def write_bulk():
+        # As main.py writes user metrics, so the second pass finds every fingerprint
+        manager.write_bulk_to_es(Indexes.index_user_metrics, [dict(doc) for doc in docs], skip_unchanged=True)
+        return len(docs)
+
+    stages.append(measure(fake, "write_bulk_to_es", write_bulk))
+    # The same documents again: only the fingerprint lookups are sent
+    stages.append(measure(fake, "write_bulk_to_es_unchanged", write_bulk))
+    stages.append(
+        measure(
+            fake,
+            "create_user_top_by_day",
+            lambda: create_user_top_by_day(
+                source_index=Indexes.index_user_metrics, incremental=False, slices=args.slices
+            ),
+        )
+    )
+    stages.append(
+        measure(
+            fake,
+            "create_user_summaries",
+            lambda: create_user_summaries(source_index=Indexes.index_user_metrics),
+        )
+    )
+    fake.stop()
+
+    result = {
+        "benchmark": "es_ingest",
+        "python": platform.python_version(),
+        "scale": {"users": args.users, "days": args.days, "user_metrics_docs": len(docs)},
+        "fake_es": {
+            "latency_ms": args.latency_ms,
+            "request_error_rate": args.request_error_rate,
+            "bulk_error_rate": args.bulk_error_rate,
+        },
+        "settings": {
+            "es_bulk_chunk_size": Paras.es_bulk_chunk_size,
+            "es_bulk_max_retries": Paras.es_bulk_max_retries,
+            "content_fingerprint_mode": Paras.content_fingerprint_mode,
+        },
+        "stages": stages,
+        "documents": fake.stats()["documents"],
+    }
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+End-to-end benchmark of the processing stages of a run on a synthetic enterprise
+(benchmarks/synthetic.py): metrics conversion, data splitting, NDJSON parsing, top
+values, adoption leaderboard, top-by-day documents and JSON serialization. No GitHub
+or Elasticsearch is involved. Prints one JSON result (optionally written to --output);
+--compare reports the change of every stage against an earlier result.
+
+    python benchmarks/bench_pipeline.py --teams 500 --users 20000 --output before.json
+    python benchmarks/bench_pipeline.py --teams 500 --users 20000 --compare before.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "cpuad-updater"))
+
+from adoption import UserAdoptionAccumulator
+from create_user_top_by_day import build_top_doc
+from data_splitter import DataSplitter
+from metrics_2_usage_convertor import convert_metrics_to_usage
+from ndjson_stream import iter_ndjson_records
+from top_values import calculate_top_values
+
+from synthetic import SyntheticEnterprise
+
+SPLIT_LISTS = ("total", "breakdown", "breakdown_chat", "pr_reviews", "dotcom_chat")
+
+
+class StageTimer:
+    """Accumulates seconds and processed items per stage over many timed blocks"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def time(self, stage, items=0):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            totals = self.stages.setdefault(stage, {"seconds": 0.0, "items": 0})
+            totals["seconds"] += time.perf_counter() - started_at
+            totals["items"] += items
+
+    def count(self, stage, items):
+        self.stages[stage]["items"] += items
+
+    def results(self):
+        return {
+            stage: {
+                "seconds": round(totals["seconds"], 4),
+                "items": totals["items"],
+                "items_per_second": round(totals["items"] / totals["seconds"], 1) if totals["seconds"] else None,
+            }
+            for stage, totals in self.stages.items()
+        }
+
+
+def serialize(docs):
+    return sum(len(json.dumps(doc, ensure_ascii=False)) for doc in docs)
+
+
+def bench_team_metrics(enterprise, timer):
+    """Per team, as main() processes a team's copilot/metrics"""
+    for team in enterprise.teams():
+        metrics = enterprise.team_metrics(team["slug"])
+
+        with timer.time("convert_metrics_to_usage", len(metrics)):
+            usage = convert_metrics_to_usage(metrics)
+
+        splitter = DataSplitter(
+            usage,
+            additional_properties={
+                "organization_slug": enterprise.organization_slug,
+                "team_slug": team["slug"],
+                "position_in_tree": "leaf_team",
+            },
+        )
+        for name in SPLIT_LISTS:
+            get_list = getattr(splitter, f"get_{name}_list")
+            with timer.time(f"split_{name}_list"):
+                docs = get_list()
+            timer.count(f"split_{name}_list", len(docs))
+            with timer.time("serialize_split_docs", len(docs)):
+                serialize(docs)
+
+
+def bench_user_metrics(enterprise, timer, batch_users, chunk_size):
+    """Users in batches, each batch downloaded as one users-28-day NDJSON body"""
+    user_team_lookup = {
+        seat["assignee"]["login"]: (seat["assigning_team"] or {}).get("slug", "no-team")
+        for seat in enterprise.seats()
+    }
+    accumulator = UserAdoptionAccumulator()
+    ndjson_bytes = 0
+
+    for start in range(0, enterprise.user_count, batch_users):
+        body = enterprise.users_28_day_ndjson(start, start + batch_users)
+        ndjson_bytes += len(body)
+        chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+        with timer.time("ndjson_parse"):
+            records = list(iter_ndjson_records(chunks))
+        timer.count("ndjson_parse", len(records))
+
+        with timer.time("calculate_top_values", len(records)):
+            enriched = [
+                {**record, **calculate_top_values(record), "organization_slug": enterprise.organization_slug}
+                for record in records
+            ]
+
+        with timer.time("build_user_adoption_leaderboard", len(records)):
+            for record in records:
+                accumulator.add(record)
+
+        with timer.time("build_top_doc", len(enriched)):
+            top_docs = [build_top_doc(record) for record in enriched]
+
+        with timer.time("serialize_user_docs", len(enriched) + len(top_docs)):
+            serialize(enriched)
+            serialize(top_docs)
+
+    # The leaderboard is scored once, from the counters of every batch
+    with timer.time("build_user_adoption_leaderboard"):
+        accumulator.leaderboard(enterprise.organization_slug, "Organization", user_team_lookup=user_team_lookup)
+    return ndjson_bytes
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(stages, baseline):
+    """Ratio of seconds per stage to the baseline, > 1 is slower"""
+    changes = {}
+    for stage, result in stages.items():
+        before = baseline.get("stages", {}).get(stage)
+        if before and before["seconds"]:
+            changes[stage] = round(result["seconds"] / before["seconds"], 3)
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--editors", type=int, default=4)
+    parser.add_argument("--models", type=int, default=3)
+    parser.add_argument("--languages", type=int, default=10)
+    parser.add_argument("--batch-users", type=int, default=1000, help="users per NDJSON body")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="bytes per downloaded chunk")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the result to this file")
+    parser.add_argument("--compare", help="earlier result to compare the stage timings with")
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        help="with --compare, exit with 1 if a stage got slower than this ratio",
+    )
+    args = parser.parse_args()
+
+    # The pipeline modules log every split at INFO
+    logging.getLogger().setLevel(logging.WARNING)
+
+    enterprise = SyntheticEnterprise(
+        teams=args.teams,
+        users=args.users,
+        days=args.days,
+        editors=args.editors,
+        models=args.models,
+        languages=args.languages,
+        seed=args.seed,
+    )
+    timer = StageTimer()
+    started_at = time.perf_counter()
+    bench_team_metrics(enterprise, timer)
+    ndjson_bytes = bench_user_metrics(enterprise, timer, args.batch_users, args.chunk_size)
+    stages = timer.results()
+
+    result = {
+        "benchmark": "pipeline",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": {
+            "teams": args.teams,
+            "users": args.users,
+            "days": args.days,
+            "editors": args.editors,
+            "models": args.models,
+            "languages": args.languages,
+            "seed": args.seed,
+            "ndjson_bytes": ndjson_bytes,
+        },
+        "wall_seconds": round(time.perf_counter() - started_at, 4),
+        "stage_seconds": round(sum(stage["seconds"] for stage in stages.values()), 4),
+        "stages": stages,
+    }
+
+    slower = []
+    if args.compare:
+        with open(args.compare, "r", encoding="utf8") as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != result["scale"]:
+            print("Warning: the baseline was run at a different scale", file=sys.stderr)
+        result["baseline_commit"] = baseline.get("commit")
+        result["change"] = compare(stages, baseline)
+        if args.max_slowdown:
+            slower = [stage for stage, ratio in result["change"].items() if ratio > args.max_slowdown]
+            result["slower_than_allowed"] = slower
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            f.write(output + "\n")
+    if slower:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+"""
+In-process stand-in for the Elasticsearch HTTP API, to benchmark and regression-test
+the write path without a cluster. Implements the subset this project calls: ping
+and info, indices exists/create/get_mapping/put_mapping, stored scripts, get, index,
+update, mget, _bulk (including the preserve_fields script of write_bulk_to_es),
+search with scroll, point in time + search_after (with slices) and composite
+aggregations. Documents are kept in memory, requests are counted per endpoint.
+
+    with FakeElasticsearch(latency=0.002, bulk_error_rate=0.01) as fake:
+        os.environ["ELASTICSEARCH_URL"] = fake.url
+        ...
+        print(fake.stats())
+"""
+import gzip
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+VERSION = "8.17.2"
+
+
+def _field(doc, name):
+    # Text fields and their .keyword sub-field hold the same value here
+    if name.endswith(".keyword"):
+        name = name[: -len(".keyword")]
+    value = doc
+    for part in name.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _matches(doc, query):
+    if not query or "match_all" in query:
+        return True
+    if "term" in query:
+        ((name, value),) = query["term"].items()
+        return _field(doc, name) == (value["value"] if isinstance(value, dict) else value)
+    if "terms" in query:
+        ((name, values),) = query["terms"].items()
+        return _field(doc, name) in values
+    if "range" in query:
+        ((name, bounds),) = query["range"].items()
+        value = _field(doc, name)
+        if value is None:
+            return False
+        compare = {"gt": value.__gt__, "gte": value.__ge__, "lt": value.__lt__, "lte": value.__le__}
+        return all(compare[op](bound) for op, bound in bounds.items() if op in compare)
+    if "exists" in query:
+        return _field(doc, query["exists"]["field"]) is not None
+    if "bool" in query:
+        clauses = query["bool"]
+        return (
+            all(_matches(doc, q) for q in _as_list(clauses.get("filter")) + _as_list(clauses.get("must")))
+            and not any(_matches(doc, q) for q in _as_list(clauses.get("must_not")))
+            and (not clauses.get("should") or any(_matches(doc, q) for q in _as_list(clauses["should"])))
+        )
+    raise ValueError(f"Unsupported query: {query}")
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _filter_source(source, includes):
+    if includes is None:
+        return source
+    includes = [includes] if isinstance(includes, str) else includes
+    return {name: source[name] for name in includes if name in source}
+
+
+def _error(status, error_type, reason):
+    return status, {"error": {"type": error_type, "reason": reason}, "status": status}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Without it small responses wait for delayed ACKs, ~40ms per request
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if body and self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        url = urlparse(self.path)
+        status, response = self.server.fake.handle(
+            self.command, url.path, {k: v[-1] for k, v in parse_qs(url.query).items()}, body
+        )
+        data = json.dumps(response).encode("utf8") if response is not None else b""
+        self.send_response(status)
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _dispatch
+
+
+class FakeElasticsearch:
+    """
+    latency: seconds added to every request
+    request_error_rate: share of requests answered 503 (retried by the client)
+    bulk_error_rate: share of _bulk items rejected with 429 (retried by streaming_bulk)
+    """
+
+    def __init__(self, latency=0.0, request_error_rate=0.0, bulk_error_rate=0.0, seed=0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.request_error_rate = request_error_rate
+        self.bulk_error_rate = bulk_error_rate
+        self.host = host
+        self.port = port
+        self.indexes = {}
+        self.mappings = {}
+        self.scripts = {}
+        self._pits = {}
+        self._scrolls = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.reset_stats()
+
+    # Server
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-es", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    # Stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._requests = Counter()
+            self._counters = Counter()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": sum(self._requests.values()),
+                "requests_by_endpoint": dict(self._requests),
+                **self._counters,
+                "documents": {name: len(docs) for name, docs in self.indexes.items()},
+            }
+
+    def documents(self, index):
+        with self._lock:
+            return dict(self.indexes.get(index, {}))
+
+    # Requests
+
+    def handle(self, method, path, params, body):
+        if self.latency:
+            time.sleep(self.latency)
+        parts = [unquote(part) for part in path.strip("/").split("/") if part]
+        with self._lock:
+            endpoint = self._endpoint(method, parts)
+            self._requests[endpoint] += 1
+            if self.request_error_rate and self._random.random() < self.request_error_rate:
+                self._counters["injected_request_errors"] += 1
+                return _error(503, "unavailable_shards_exception", "injected")
+            try:
+                return self._route(endpoint, method, parts, params, body)
+            except (KeyError, ValueError) as e:
+                return _error(400, "illegal_argument_exception", str(e))
+
+    @staticmethod
+    def _endpoint(method, parts):
+        if not parts:
+            return "ping" if method == "HEAD" else "info"
+        if parts[-1] == "_bulk":
+            return "bulk"
+        if parts[:2] == ["_search", "scroll"]:
+            return "scroll" if method != "DELETE" else "clear_scroll"
+        if parts[0] == "_search":
+            return "search"
+        if parts[0] == "_pit":
+            return "close_point_in_time"
+        if parts[0] == "_scripts":
+            return "put_script"
+        if len(parts) == 1:
+            return {"HEAD": "indices.exists", "PUT": "indices.create", "DELETE": "indices.delete"}.get(method, "indices.get")
+        action = parts[1]
+        if action == "_mapping":
+            return "indices.get_mapping" if method == "GET" else "indices.put_mapping"
+        if action == "_doc":
+            return {"GET": "get", "HEAD": "exists", "DELETE": "delete"}.get(method, "index")
+        return {
+            "_update": "update",
+            "_mget": "mget",
+            "_search": "search",
+            "_pit": "open_point_in_time",
+            "_refresh": "indices.refresh",
+            "_count": "count",
+        }.get(action, "unsupported")
+
+    def _route(self, endpoint, method, parts, params, body):
+        data = json.loads(body) if body and endpoint != "bulk" else {}
+        if endpoint == "ping":
+            return 200, {}
+        if endpoint == "info":
+            return 200, {"name": "fake-es", "version": {"number": VERSION}, "tagline": "You Know, for Search"}
+        if endpoint == "bulk":
+            return self._bulk(body, parts[0] if len(parts) == 2 else None)
+        if endpoint == "search":
+            return self._search(parts[0] if len(parts) == 2 else None, data, params)
+        if endpoint == "scroll":
+            return self._scroll(data.get("scroll_id") or params.get("scroll_id"))
+        if endpoint == "clear_scroll":
+            for scroll_id in _as_list(data.get("scroll_id")):
+                self._scrolls.pop(scroll_id, None)
+            return 200, {"succeeded": True}
+        if endpoint == "close_point_in_time":
+            self._pits.pop(data.get("id"), None)
+            return 200, {"succeeded": True, "num_freed": 1}
+        if endpoint == "put_script":
+            self.scripts[parts[1]] = data.get("script", data)
+            return 200, {"acknowledged": True}
+
+        index = parts[0]
+        if endpoint == "indices.exists":
+            return (200 if all(name in self.indexes for name in index.split(",")) else 404), None
+        if endpoint == "indices.create":
+            if index in self.indexes:
+                return _error(400, "resource_already_exists_exception", f"index [{index}] already exists")
+            self.indexes[index] = {}
+            self.mappings[index] = dict(data.get("mappings", {}))
+            return 200, {"acknowledged": True, "shards_acknowledged": True, "index": index}
+        if endpoint == "indices.delete":
+            self.indexes.pop(index, None)
+            self.mappings.pop(index, None)
+            return 200, {"acknowledged": True}
+        if endpoint == "indices.get_mapping":
+            if index not in self.indexes:
+                return _error(404, "index_not_found_exception", f"no such index [{index}]")
+            return 200, {index: {"mappings": self.mappings.get(index, {})}}
+        if endpoint == "indices.put_mapping":
+            mapping = self.mappings.setdefault(index, {})
+            mapping.setdefault("properties", {}).update(data.get("properties", {}))
+            if "_meta" in data:
+                mapping["_meta"] = data["_meta"]
+            return 200, {"acknowledged": True}
+        if endpoint == "indices.refresh":
+            return 200, {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+        if endpoint == "open_point_in_time":
+            pit_id = f"pit-{len(self._pits)}-{index}"
+            # A consistent view: later writes are not seen through this PIT
+            self._pits[pit_id] = (index, list(self.indexes.get(index, {}).items()))
+            return 200, {"id": pit_id}
+        if endpoint == "count":
+            docs = self.indexes.get(index, {}).values()
+            return 200, {"count": sum(1 for doc in docs if _matches(doc, data.get("query")))}
+
+        docs = self.indexes.get(index, {})
+        if endpoint == "get":
+            doc_id = parts[2]
+            if doc_id not in docs:
+                return 404, {"_index": index, "_id": doc_id, "found": False}
+            return 200, {"_index": index, "_id": doc_id, "found": True, "_source": docs[doc_id]}
+        if endpoint == "index":
+            doc_id = parts[2]
+            result = "updated" if doc_id in docs else "created"
+            self.indexes.setdefault(index, {})[doc_id] = data
+            return (200 if result == "updated" else 201), {"_index": index, "_id": doc_id, "result": result}
+        if endpoint == "delete":
+            doc_id = parts[2]
+            if docs.pop(doc_id, None) is None:
+                return 404, {"_index": index, "_id": doc_id, "result": "not_found"}
+            return 200, {"_index": index, "_id": doc_id, "result": "deleted"}
+        if endpoint == "update":
+            return self._update(index, parts[2], data)
+        if endpoint == "mget":
+            includes = params.get("_source_includes")
+            includes = includes.split(",") if includes else None
+            return 200, {
+                "docs": [
+                    {"_index": index, "_id": doc_id, "found": True, "_source": _filter_source(docs[doc_id], includes)}
+                    if doc_id in docs
+                    else {"_index": index, "_id": doc_id, "found": False}
+                    for doc_id in data.get("ids", [])
+                ]
+            }
+        return _error(400, "unsupported_operation", f"{method} /{'/'.join(parts)} is not implemented by fake_es")
+
+    def _update(self, index, doc_id, data):
+        """Apply an update body (doc / doc_as_upsert / upsert / preserve_fields script), returns (status, result)"""
+        docs = self.indexes.setdefault(index, {})
+        current = docs.get(doc_id)
+        if current is None:
+            if data.get("doc_as_upsert"):
+                docs[doc_id] = dict(data["doc"])
+            elif "upsert" in data:
+                docs[doc_id] = dict(data["upsert"])
+            else:
+                return _error(404, "document_missing_exception", f"[{doc_id}]: document missing")
+            return 201, {"_index": index, "_id": doc_id, "result": "created"}
+
+        if "doc" in data:
+            current.update(data["doc"])
+        elif "script" in data:
+            params = data["script"].get("params", {})
+            if "doc" not in params or "condition" not in params:
+                return _error(400, "illegal_argument_exception", "only the preserve_fields script is implemented")
+            # Same decision as ElasticsearchManager.preserve_fields_script
+            condition = params["condition"]
+            preserve = all(key in current and current[key] == value for key, value in condition.items())
+            for key, value in params["doc"].items():
+                if preserve and key in condition:
+                    continue
+                current[key] = value
+        return 200, {"_index": index, "_id": doc_id, "result": "updated"}
+
+    def _bulk(self, body, default_index):
+        lines = [json.loads(line) for line in body.decode("utf8").split("\n") if line.strip()]
+        items = []
+        errors = False
+        i = 0
+        while i < len(lines):
+            ((op, meta),) = lines[i].items()
+            source = lines[i + 1] if op != "delete" else None
+            i += 1 if op == "delete" else 2
+            index = meta.get("_index", default_index)
+            doc_id = meta.get("_id") or f"auto-{self._counters['bulk_items']}"
+            self._counters["bulk_items"] += 1
+
+            if self.bulk_error_rate and self._random.random() < self.bulk_error_rate:
+                self._counters["injected_bulk_errors"] += 1
+                status, result = _error(429, "es_rejected_execution_exception", "injected")
+            else:
+                docs = self.indexes.setdefault(index, {})
+                if op == "update":
+                    status, result = self._update(index, doc_id, source)
+                elif op == "delete":
+                    status, result = (200, {"result": "deleted"}) if docs.pop(doc_id, None) is not None else (404, {"result": "not_found"})
+                elif op == "create" and doc_id in docs:
+                    status, result = _error(409, "version_conflict_engine_exception", f"[{doc_id}]: document already exists")
+                else:
+                    status = 200 if doc_id in docs else 201
+                    docs[doc_id] = source
+                    result = {"result": "updated" if status == 200 else "created"}
+
+            item = {"_index": index, "_id": doc_id, "status": status}
+            # A delete of a missing document is not an error
+            if status >= 300 and not (status == 404 and op == "delete"):
+                errors = True
+                item["error"] = result["error"]
+            else:
+                item["result"] = result.get("result")
+            items.append({op: item})
+        return 200, {"took": 1, "errors": errors, "items": items}
+
+    def _search(self, index, data, params):
+        if "pit" in data:
+            return self._search_pit(data)
+        docs = self.indexes.get(index, {})
+        aggregations = data.get("aggs") or data.get("aggregations")
+        if aggregations:
+            return 200, {"hits": {"total": {"value": len(docs)}, "hits": []}, "aggregations": self._aggregate(docs, aggregations)}
+
+        includes = data.get("_source")
+        hits = [
+            {"_index": index, "_id": doc_id, "_source": _filter_source(doc, includes if isinstance(includes, list) else None)}
+            for doc_id, doc in docs.items()
+            if _matches(doc, data.get("query"))
+        ]
+        size = int(data.get("size", params.get("size", 10)))
+        response = {"hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits[:size]}}
+        if "scroll" in params:
+            scroll_id = f"scroll-{self._counters['scrolls']}"
+            self._counters["scrolls"] += 1
+            self._scrolls[scroll_id] = (hits, size, size)
+            response["_scroll_id"] = scroll_id
+        return 200, response
+
+    def _scroll(self, scroll_id):
+        if scroll_id not in self._scrolls:
+            return _error(404, "search_context_missing_exception", f"No search context found for id [{scroll_id}]")
+        hits, position, size = self._scrolls[scroll_id]
+        self._scrolls[scroll_id] = (hits, position + size, size)
+        return 200, {"_scroll_id": scroll_id, "hits": {"total": {"value": len(hits)}, "hits": hits[position : position + size]}}
+
+    def _search_pit(self, data):
+        pit_id = data["pit"]["id"]
+        if pit_id not in self._pits:
+            return _error(404, "search_context_missing_exception", f"No search context found for id [{pit_id}]")
+        index, snapshot = self._pits[pit_id]
+        after = data.get("search_after", [-1])[0]
+        query = data.get("query")
+        slice = data.get("slice")
+        includes = data.get("_source")
+        hits = []
+        # The snapshot position stands in for _shard_doc
+        for position in range(after + 1, len(snapshot)):
+            doc_id, doc = snapshot[position]
+            if slice and zlib.crc32(doc_id.encode("utf8")) % slice["max"] != slice["id"]:
+                continue
+            if not _matches(doc, query):
+                continue
+            hits.append(
+                {
+                    "_index": index,
+                    "_id": doc_id,
+                    "_source": _filter_source(doc, includes if isinstance(includes, list) else None),
+                    "sort": [position],
+                }
+            )
+            if len(hits) >= data.get("size", 10):
+                break
+        return 200, {"pit_id": pit_id, "hits": {"hits": hits}}
+
+    @staticmethod
+    def _aggregate(docs, aggregations):
+        """Composite aggregations over one terms source, with terms sub-aggregations"""
+        results = {}
+        for name, aggregation in aggregations.items():
+            composite = aggregation["composite"]
+            ((source_name, source),) = composite["sources"][0].items()
+            groups = {}
+            for doc in docs.values():
+                key = _field(doc, source["terms"]["field"])
+                if key is not None:
+                    groups.setdefault(key, []).append(doc)
+            keys = sorted(groups)
+            after = composite.get("after", {}).get(source_name)
+            if after is not None:
+                keys = [key for key in keys if key > after]
+            page = keys[: composite.get("size", 10)]
+
+            buckets = []
+            for key in page:
+                bucket = {"key": {source_name: key}, "doc_count": len(groups[key])}
+                for sub_name, sub in aggregation.get("aggs", {}).items():
+                    terms = sub["terms"]
+                    exclude = set(terms.get("exclude", []))
+                    counts = Counter(
+                        value
+                        for value in (_field(doc, terms["field"]) for doc in groups[key])
+                        if value is not None and value not in exclude
+                    )
+                    top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[: terms.get("size", 10)]
+                    bucket[sub_name] = {"buckets": [{"key": value, "doc_count": count} for value, count in top]}
+                buckets.append(bucket)
+
+            results[name] = {"buckets": buckets}
+            if page:
+                results[name]["after_key"] = {source_name: page[-1]}
+        return results
@@ -0,0 +1,295 @@
+"""
+Deterministic synthetic enterprise for benchmarks: a nested team tree, per-team
+copilot/metrics day payloads (editors x models x languages), Copilot seat lists and
+users-28-day report records / NDJSON, at any scale.
+
+    enterprise = SyntheticEnterprise(teams=500, users=20000)
+    for team in enterprise.teams():
+        payload = enterprise.team_metrics(team["slug"])
+"""
+import json
+import random
+from datetime import date, timedelta
+
+EDITORS = ["vscode", "jetbrains", "visualstudio", "neovim", "xcode", "eclipse"]
+MODELS = ["default", "gpt-4o", "claude-sonnet", "gemini-pro", "o3-mini"]
+LANGUAGES = [
+    "python", "typescript", "javascript", "java", "go", "csharp", "cpp", "rust",
+    "ruby", "php", "kotlin", "swift", "scala", "shell", "sql", "yaml", "markdown",
+    "json", "html", "css",
+]
+FEATURES = ["code_completion", "chat_panel_ask_mode", "chat_panel_agent_mode", "agent_edit", "inline_chat"]
+
+
+class SyntheticEnterprise:
+    """
+    Every payload is derived from (seed, what is generated), so the same arguments give
+    the same data in any order and team payloads can be generated one at a time.
+    """
+
+    def __init__(
+        self,
+        teams=100,
+        users=1000,
+        days=28,
+        editors=4,
+        models=3,
+        languages=10,
+        repositories=5,
+        max_depth=4,
+        organization_slug="bench-org",
+        end_day=date(2025, 1, 28),
+        seed=0,
+    ):
+        self.team_count = teams
+        self.user_count = users
+        self.days = [(end_day - timedelta(days=days - 1 - i)).isoformat() for i in range(days)]
+        self.editors = EDITORS[: max(1, min(editors, len(EDITORS)))]
+        self.models = MODELS[: max(1, min(models, len(MODELS)))]
+        self.languages = LANGUAGES[: max(1, min(languages, len(LANGUAGES)))]
+        self.repositories = [f"repo-{i}" for i in range(repositories)]
+        self.max_depth = max_depth
+        self.organization_slug = organization_slug
+        self.seed = seed
+        self._teams = None
+
+    def _random(self, *key):
+        return random.Random(f"{self.seed}:{':'.join(map(str, key))}")
+
+    def teams(self):
+        """GitHub /teams items; each team's parent is an earlier team, at most max_depth levels deep"""
+        if self._teams is None:
+            rng = self._random("teams")
+            teams, depths = [], []
+            for i in range(self.team_count):
+                parents = [j for j in range(i) if depths[j] < self.max_depth]
+                parent_index = rng.choice(parents) if parents and rng.random() < 0.7 else None
+                parent = teams[parent_index] if parent_index is not None else None
+                depths.append(depths[parent_index] + 1 if parent else 1)
+                teams.append(
+                    {
+                        "id": 1000 + i,
+                        "slug": f"team-{i}",
+                        "name": f"Team {i}",
+                        "parent": {"id": parent["id"], "slug": parent["slug"]} if parent else None,
+                    }
+                )
+            self._teams = teams
+        return self._teams
+
+    def team_metrics(self, team_slug):
+        """copilot/metrics response of a team: one entry per day"""
+        rng = self._random("metrics", team_slug)
+        team_users = max(1, self.user_count // max(1, self.team_count))
+        payload = []
+        for day in self.days:
+            engaged = rng.randint(1, team_users)
+
+            def users():
+                return rng.randint(0, engaged)
+
+            payload.append(
+                {
+                    "date": day,
+                    "total_active_users": engaged + rng.randint(0, team_users),
+                    "total_engaged_users": engaged,
+                    "copilot_ide_code_completions": {
+                        "total_engaged_users": users(),
+                        "editors": [
+                            {
+                                "name": editor,
+                                "total_engaged_users": users(),
+                                "models": [
+                                    {
+                                        "name": model,
+                                        "is_custom_model": False,
+                                        "total_engaged_users": users(),
+                                        "languages": [
+                                            self._completion_language(rng, language, users())
+                                            for language in self.languages
+                                        ],
+                                    }
+                                    for model in self.models
+                                ],
+                            }
+                            for editor in self.editors
+                        ],
+                    },
+                    "copilot_ide_chat": {
+                        "total_engaged_users": users(),
+                        "editors": [
+                            {
+                                "name": editor,
+                                "total_engaged_users": users(),
+                                "models": [
+                                    {
+                                        "name": model,
+                                        "is_custom_model": False,
+                                        "total_engaged_users": users(),
+                                        "total_chats": rng.randint(0, 200),
+                                        "total_chat_insertion_events": rng.randint(0, 50),
+                                        "total_chat_copy_events": rng.randint(0, 50),
+                                    }
+                                    for model in self.models
+                                ],
+                            }
+                            for editor in self.editors
+                        ],
+                    },
+                    "copilot_dotcom_chat": {
+                        "total_engaged_users": users(),
+                        "models": [
+                            {
+                                "name": model,
+                                "is_custom_model": False,
+                                "total_engaged_users": users(),
+                                "total_chats": rng.randint(0, 100),
+                            }
+                            for model in self.models
+                        ],
+                    },
+                    "copilot_dotcom_pull_requests": {
+                        "total_engaged_users": users(),
+                        "repositories": [
+                            {
+                                "name": repository,
+                                "total_engaged_users": users(),
+                                "models": [
+                                    {
+                                        "name": model,
+                                        "is_custom_model": False,
+                                        "total_pr_summaries_created": rng.randint(0, 20),
+                                        "total_engaged_users": users(),
+                                    }
+                                    for model in self.models
+                                ],
+                            }
+                            for repository in self.repositories
+                        ],
+                    },
+                }
+            )
+        return payload
+
+    @staticmethod
+    def _completion_language(rng, language, engaged):
+        suggestions = rng.randint(0, 500)
+        lines_suggested = suggestions * rng.randint(1, 4)
+        return {
+            "name": language,
+            "total_engaged_users": engaged,
+            "total_code_suggestions": suggestions,
+            "total_code_acceptances": rng.randint(0, suggestions),
+            "total_code_lines_suggested": lines_suggested,
+            "total_code_lines_accepted": rng.randint(0, lines_suggested),
+        }
+
+    def user_login(self, i):
+        return f"user-{i}"
+
+    def seats(self):
+        """copilot/billing/seats items, users assigned round-robin to the teams"""
+        rng = self._random("seats")
+        teams = self.teams()
+        seats = []
+        for i in range(self.user_count):
+            team = teams[i % len(teams)] if teams else None
+            seats.append(
+                {
+                    "created_at": "2024-06-01T00:00:00Z",
+                    "updated_at": "2024-06-01T00:00:00Z",
+                    "pending_cancellation_date": None,
+                    "last_activity_at": f"{rng.choice(self.days)}T{rng.randint(0, 23):02d}:00:00Z",
+                    "last_activity_editor": f"{rng.choice(self.editors)}/1.0",
+                    "plan_type": "business",
+                    "assignee": {"login": self.user_login(i), "id": 10000 + i, "type": "User"},
+                    "assigning_team": {"id": team["id"], "slug": team["slug"]} if team else None,
+                }
+            )
+        return seats
+
+    def iter_user_records(self, start=0, stop=None):
+        """users-28-day report records of users [start, stop), one per user and active day"""
+        stop = self.user_count if stop is None else min(stop, self.user_count)
+        report_start_day, report_end_day = self.days[0], self.days[-1]
+        for i in range(start, stop):
+            rng = self._random("user", i)
+            login = self.user_login(i)
+            # Heavy users are active most days, light users a few
+            active_days = sorted(rng.sample(self.days, rng.randint(1, len(self.days))))
+            for day in active_days:
+                generation = rng.randint(0, 80)
+                acceptance = rng.randint(0, generation)
+                suggested = generation * rng.randint(1, 6)
+                interactions = rng.randint(0, 40)
+                languages = rng.sample(self.languages, min(3, len(self.languages)))
+                features = rng.sample(FEATURES, 3)
+                model = rng.choice(self.models)
+                yield {
+                    "report_start_day": report_start_day,
+                    "report_end_day": report_end_day,
+                    "day": day,
+                    "enterprise_id": "1",
+                    "user_id": 10000 + i,
+                    "user_login": login,
+                    "user_initiated_interaction_count": interactions,
+                    "code_generation_activity_count": generation,
+                    "code_acceptance_activity_count": acceptance,
+                    "loc_suggested_to_add_sum": suggested,
+                    "loc_suggested_to_delete_sum": rng.randint(0, suggested),
+                    "loc_added_sum": rng.randint(0, suggested),
+                    "loc_deleted_sum": rng.randint(0, suggested // 2),
+                    "used_agent": "agent_edit" in features,
+                    "used_chat": "chat_panel_ask_mode" in features,
+                    "totals_by_ide": [
+                        {
+                            "ide": rng.choice(self.editors),
+                            "user_initiated_interaction_count": interactions,
+                            "code_generation_activity_count": generation,
+                            "code_acceptance_activity_count": acceptance,
+                        }
+                    ],
+                    "totals_by_feature": [
+                        {
+                            "feature": feature,
+                            "user_initiated_interaction_count": rng.randint(0, interactions),
+                            "code_generation_activity_count": rng.randint(0, generation),
+                            "code_acceptance_activity_count": rng.randint(0, acceptance),
+                        }
+                        for feature in features
+                    ],
+                    "totals_by_language_feature": [
+                        {
+                            "language": language,
+                            "feature": features[0],
+                            "code_generation_activity_count": rng.randint(0, generation),
+                            "code_acceptance_activity_count": rng.randint(0, acceptance),
+                        }
+                        for language in languages
+                    ],
+                    "totals_by_language_model": [
+                        {
+                            "language": language,
+                            "model": model,
+                            "code_generation_activity_count": rng.randint(0, generation),
+                            "code_acceptance_activity_count": rng.randint(0, acceptance),
+                        }
+                        for language in languages
+                    ],
+                    "totals_by_model_feature": [
+                        {
+                            "model": model,
+                            "feature": feature,
+                            "user_initiated_interaction_count": rng.randint(0, interactions),
+                            "code_generation_activity_count": rng.randint(0, generation),
+                        }
+                        for feature in features
+                    ],
+                }
+
+    def users_28_day_ndjson(self, start=0, stop=None):
+        """The report download body (NDJSON bytes) for users [start, stop)"""
+        return b"".join(
+            json.dumps(record, separators=(",", ":")).encode("utf8") + b"\n"
+            for record in self.iter_user_records(start, stop)
+        )
@@ -0,0 +1,490 @@
+"""
+User adoption leaderboard shared by main.py and regenerate_adoption.py
+"""
+import math
+from datetime import datetime
+
+import numpy as np
+
+from fingerprint_cache import generate_unique_hash
+
+
+# The only user metrics fields read by UserAdoptionAccumulator.add
+ADOPTION_RECORD_FIELDS = (
+    "user_login",
+    "user_initiated_interaction_count",
+    "code_generation_activity_count",
+    "code_acceptance_activity_count",
+    "loc_added_sum",
+    "loc_suggested_to_add_sum",
+    "used_agent",
+    "used_chat",
+    "day",
+    "report_start_day",
+    "report_end_day",
+)
+
+
+# Slots of the per-user counters list kept by UserAdoptionAccumulator
+(
+    EVENTS_LOGGED,
+    VOLUME,
+    CODE_GENERATION,
+    CODE_ACCEPTANCE,
+    LOC_ADDED,
+    LOC_SUGGESTED,
+    AGENT_USAGE,
+    CHAT_USAGE,
+    DAY_BITS,
+) = range(9)
+
+# Record field added to each counter slot
+_COUNTER_FIELDS = (
+    (VOLUME, "user_initiated_interaction_count"),
+    (CODE_GENERATION, "code_generation_activity_count"),
+    (CODE_ACCEPTANCE, "code_acceptance_activity_count"),
+    (LOC_ADDED, "loc_added_sum"),
+    (LOC_SUGGESTED, "loc_suggested_to_add_sum"),
+)
+
+
+class UserAdoptionAccumulator:
+    """
+    Per-user adoption counters built from user metrics records pushed one at a time,
+    so a leaderboard can be computed without keeping the records themselves.
+
+    Each user is one fixed-slot list of counters (see EVENTS_LOGGED..DAY_BITS), the
+    days a user was active are a bitmap with one bit per distinct day seen by the
+    accumulator: 28 bits for a 28-day report.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.records = 0
+        self.report_start_day = None
+        self.report_end_day = None
+        self._day_bits = {}
+
+    def __len__(self):
+        return len(self.users)
+
+    def _day_bit(self, day):
+        bit = self._day_bits.get(day)
+        if bit is None:
+            bit = self._day_bits[day] = 1 << len(self._day_bits)
+        return bit
+
+    def add(self, record):
+        login = record.get("user_login") or "unknown"
+        counters = self.users.get(login)
+        if counters is None:
+            counters = self.users[login] = [0] * 9
+
+        counters[EVENTS_LOGGED] += 1
+        for slot, field in _COUNTER_FIELDS:
+            value = record.get(field)
+            if value:
+                counters[slot] += value
+        if record.get("used_agent"):
+            counters[AGENT_USAGE] += 1
+        if record.get("used_chat"):
+            counters[CHAT_USAGE] += 1
+        day_val = record.get("day")
+        if day_val:
+            counters[DAY_BITS] |= self._day_bit(day_val)
+
+        self.records += 1
+        self._extend_report_window(record.get("report_start_day"), record.get("report_end_day"))
+
+    def _extend_report_window(self, start_day, end_day):
+        if start_day and (self.report_start_day is None or start_day < self.report_start_day):
+            self.report_start_day = start_day
+        if end_day and (self.report_end_day is None or end_day > self.report_end_day):
+            self.report_end_day = end_day
+
+    def merge(self, other):
+        """Add the counters of another accumulator, e.g. one per scan slice"""
+        # Day bits are numbered per accumulator, translate other's bits to ours
+        translate = [(bit, self._day_bit(day)) for day, bit in other._day_bits.items()]
+        for login, other_counters in other.users.items():
+            counters = self.users.get(login)
+            if counters is None:
+                counters = self.users[login] = [0] * 9
+            for slot in range(DAY_BITS):
+                counters[slot] += other_counters[slot]
+            other_days = other_counters[DAY_BITS]
+            for other_bit, bit in translate:
+                if other_days & other_bit:
+                    counters[DAY_BITS] |= bit
+        self.records += other.records
+        self._extend_report_window(other.report_start_day, other.report_end_day)
+
+    def subset(self, logins):
+        """
+        Accumulator over the given users only, sharing their counters (a read-only
+        view, e.g. the members of one team)
+        """
+        subset = UserAdoptionAccumulator()
+        subset.users = {login: self.users[login] for login in logins if login in self.users}
+        subset.records = sum(counters[EVENTS_LOGGED] for counters in subset.users.values())
+        subset.report_start_day = self.report_start_day
+        subset.report_end_day = self.report_end_day
+        subset._day_bits = self._day_bits
+        return subset
+
+    def user_stats(self):
+        """Yield (user_login, stats dict) with named counters and active_days"""
+        for login, counters in self.users.items():
+            yield login, {
+                "events_logged": counters[EVENTS_LOGGED],
+                "volume": counters[VOLUME],
+                "code_generation": counters[CODE_GENERATION],
+                "code_acceptance": counters[CODE_ACCEPTANCE],
+                "loc_added": counters[LOC_ADDED],
+                "loc_suggested": counters[LOC_SUGGESTED],
+                "agent_usage": counters[AGENT_USAGE],
+                "chat_usage": counters[CHAT_USAGE],
+                "active_days": counters[DAY_BITS].bit_count(),
+            }
+
+    def _range_days(self):
+        # Determine range days for Activity Score: prefer report window, fall back to 28
+        if self.report_start_day and self.report_end_day:
+            try:
+                start_dt = datetime.strptime(self.report_start_day, "%Y-%m-%d")
+                end_dt = datetime.strptime(self.report_end_day, "%Y-%m-%d")
+                return max((end_dt - start_dt).days + 1, 1)
+            except ValueError:
+                return 28
+        return 28
+
+    def leaderboard(self, organization_slug, slug_type, top_n=10, user_team_lookup=None):
+        """
+        Score every user and return the top_n entries plus an "Others" entry.
+        All users are scored at once as NumPy columns.
+        """
+        if not self.users:
+            return []
+
+        global_start_day = self.report_start_day
+        global_end_day = self.report_end_day
+        range_days = self._range_days()
+
+        logins = list(self.users)
+        (events_logged, volume, code_generation, code_acceptance, loc_added,
+         loc_suggested, agent_usage, chat_usage) = np.array(
+            [user[:DAY_BITS] for user in self.users.values()], dtype=np.float64
+        ).T
+        # Day bitmaps can be wider than 64 bits over a long history, count them as Python ints
+        active_days = np.array(
+            [user[DAY_BITS].bit_count() for user in self.users.values()], dtype=np.float64
+        )
+
+        columns = {
+            "volume": volume,
+            "interactions_per_day": _ratio(volume, active_days),
+            "acceptance_rate": _ratio(code_acceptance, code_generation),
+            "average_loc_added": _ratio(loc_added, active_days),
+            "feature_breadth": agent_usage + chat_usage,
+            "accepted_per_active_day": _ratio(code_acceptance, active_days),
+            "chat_per_active_day": _ratio(chat_usage, events_logged),
+            "loc_acceptance_rate": _ratio(loc_added, loc_suggested),
+        }
+        sorted_columns = np.sort(np.vstack(list(columns.values())), axis=1)
+        lower = _percentile_columns(sorted_columns, 5)
+        upper = _percentile_columns(sorted_columns, 95)
+        norm = {
+            key: _robust_scale_columns(values, lower[i], upper[i])
+            for i, (key, values) in enumerate(columns.items())
+        }
+
+        base_score = (
+            0.2 * norm["volume"]
+            + 0.2 * norm["interactions_per_day"]
+            + 0.2 * norm["acceptance_rate"]
+            + 0.2 * norm["average_loc_added"]
+            + 0.2 * norm["feature_breadth"]
+        )
+        activity_score = (
+            0.4 * np.minimum(active_days / range_days, 1.0)
+            + 0.35 * norm["accepted_per_active_day"]
+            + 0.25 * norm["chat_per_active_day"]
+        ) * 100
+        reliance_score = norm["loc_acceptance_rate"] * 100
+
+        max_active_days = active_days.max()
+        if max_active_days:
+            consistency_bonus = np.minimum(0.1 * (active_days / max_active_days), 0.1)
+        else:
+            consistency_bonus = np.zeros_like(active_days)
+        adoption_score = base_score * (1 + consistency_bonus)
+        max_score = float(adoption_score.max())
+
+        # Rounded with Python's round() so ranks and ties match the per-user implementation
+        activity_score_pct = [round(value, 1) for value in activity_score.tolist()]
+        reliance_score_pct = [round(value, 1) for value in reliance_score.tolist()]
+        adoption_pct = (
+            [round(value, 1) for value in (adoption_score / max_score * 100).tolist()]
+            if max_score
+            else [0.0] * len(logins)
+        )
+        # Stable descending order, equal percentages keep insertion order
+        order = np.argsort(-np.array(adoption_pct), kind="stable")
+
+        # Stamp a day for Grafana time filtering: prefer global_end_day, fallback to current UTC day
+        stamped_day = (
+            global_end_day if global_end_day else datetime.utcnow().strftime("%Y-%m-%d")
+        )
+
+        entries = []
+        for rank, i in enumerate(order[:top_n].tolist(), start=1):
+            login = logins[i]
+            counters = self.users[login]
+            entry = {
+                "user_login": login,
+                "organization_slug": organization_slug,
+                "slug_type": slug_type,
+                "assignee_team_slug": (user_team_lookup or {}).get(login, "no-team"),
+                "events_logged": counters[EVENTS_LOGGED],
+                "volume": counters[VOLUME],
+                "code_generation_activity_count": counters[CODE_GENERATION],
+                "code_acceptance_activity_count": counters[CODE_ACCEPTANCE],
+                "loc_added_sum": counters[LOC_ADDED],
+                "loc_suggested_to_add_sum": counters[LOC_SUGGESTED],
+                "average_loc_added": float(columns["average_loc_added"][i]),
+                "accepted_per_active_day": float(columns["accepted_per_active_day"][i]),
+                "chat_per_active_day": float(columns["chat_per_active_day"][i]),
+                "loc_acceptance_rate": float(columns["loc_acceptance_rate"][i]),
+                "interactions_per_day": float(columns["interactions_per_day"][i]),
+                "acceptance_rate": float(columns["acceptance_rate"][i]),
+                "feature_breadth": counters[AGENT_USAGE] + counters[CHAT_USAGE],
+                "agent_usage": counters[AGENT_USAGE],
+                "chat_usage": counters[CHAT_USAGE],
+                "active_days": int(active_days[i]),
+                "report_start_day": global_start_day,
+                "report_end_day": global_end_day,
+                "day": stamped_day,
+                "bucket_type": "user",
+                "is_top10": True,
+                "rank": rank,
+            }
+            entry["unique_hash"] = generate_unique_hash(
+                entry,
+                key_properties=[
+                    "organization_slug",
+                    "user_login",
+                    "report_start_day",
+                    "report_end_day",
+                    "bucket_type",
+                ],
+            )
+            entry["activity_score_pct"] = activity_score_pct[i]
+            entry["reliance_score_pct"] = reliance_score_pct[i]
+            entry["consistency_bonus"] = float(consistency_bonus[i])
+            entry["adoption_score"] = float(adoption_score[i])
+            entry["adoption_pct"] = adoption_pct[i]
+            entries.append(entry)
+
+        others = order[top_n:]
+        if len(others):
+            others_count = len(others)
+
+            # Summed in rank order one value at a time, numpy's pairwise sum can differ
+            # in the last bits and change the rounded percentages
+            def total(values):
+                return float(sum(values[others].tolist()))
+
+            def mean(values):
+                return total(values) / others_count
+
+            others_entry = {
+                "user_login": "Others",
+                "organization_slug": organization_slug,
+                "slug_type": slug_type,
+                "assignee_team_slug": "no-team",
+                "events_logged": int(total(events_logged)),
+                "volume": int(total(volume)),
+                "code_generation_activity_count": int(total(code_generation)),
+                "code_acceptance_activity_count": int(total(code_acceptance)),
+                "loc_added_sum": int(total(loc_added)),
+                "loc_suggested_to_add_sum": int(total(loc_suggested)),
+                "average_loc_added": mean(columns["average_loc_added"]),
+                "accepted_per_active_day": mean(columns["accepted_per_active_day"]),
+                "chat_per_active_day": mean(columns["chat_per_active_day"]),
+                "loc_acceptance_rate": mean(columns["loc_acceptance_rate"]),
+                "interactions_per_day": mean(columns["interactions_per_day"]),
+                "acceptance_rate": mean(columns["acceptance_rate"]),
+                "feature_breadth": mean(columns["feature_breadth"]),
+                "agent_usage": int(total(agent_usage)),
+                "chat_usage": int(total(chat_usage)),
+                "active_days": int(total(active_days)),
+                "activity_score_pct": round(mean(np.array(activity_score_pct)), 1),
+                "reliance_score_pct": round(mean(np.array(reliance_score_pct)), 1),
+                "report_start_day": global_start_day,
+                "report_end_day": global_end_day,
+                "day": stamped_day,
+                "bucket_type": "others",
+                "is_top10": False,
+                "rank": None,
+                "others_count": others_count,
+                "consistency_bonus": 0.0,
+            }
+
+            others_entry["adoption_score"] = mean(adoption_score)
+            score_scale = max_score if max_score else 1
+            others_entry["adoption_pct"] = round(
+                others_entry["adoption_score"] / score_scale * 100, 1
+            )
+            others_entry["unique_hash"] = generate_unique_hash(
+                others_entry,
+                key_properties=[
+                    "organization_slug",
+                    "user_login",
+                    "report_start_day",
+                    "report_end_day",
+                    "bucket_type",
+                ],
+            )
+            entries.append(others_entry)
+
+        return entries
+
+
+def _ratio(numerator, denominator):
+    """numerator / denominator per element, 0.0 where the denominator is 0"""
+    return np.divide(
+        numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0
+    )
+
+
+def _percentile_columns(sorted_rows, percentile):
+    """
+    Percentile of each row of an array sorted along its rows, interpolated between
+    the two closest ranks with the same float operations in the same order as the
+    per-user reference, so the rounded scores are identical
+    """
+    k = (sorted_rows.shape[1] - 1) * (percentile / 100)
+    lower = math.floor(k)
+    upper = math.ceil(k)
+    if lower == upper:
+        return sorted_rows[:, int(k)]
+    return sorted_rows[:, lower] * (upper - k) + sorted_rows[:, upper] * (k - lower)
+
+
+def _robust_scale_columns(values, lower, upper):
+    """Scale a column to [0, 1] between lower and upper, all 1.0 when upper <= lower"""
+    if upper <= lower:
+        return np.ones_like(values)
+    return np.clip((values - lower) / (upper - lower), 0.0, 1.0)
+
+
+def build_user_adoption_leaderboard(metrics_data, organization_slug, slug_type, top_n=10, user_team_lookup=None):
+    if not metrics_data:
+        return []
+
+    accumulator = UserAdoptionAccumulator()
+    for record in metrics_data:
+        accumulator.add(record)
+    return accumulator.leaderboard(
+        organization_slug, slug_type, top_n=top_n, user_team_lookup=user_team_lookup
+    )
+
+
+# Leaderboards adoption_scopes can produce: one per organization, one per
+# assignee_team_slug within an organization, one over all organizations
+ADOPTION_SCOPES = ("organization", "team", "enterprise")
+
+
+class OrganizationAdoption:
+    """Adoption counters of one organization, with what its leaderboard entries are stamped with"""
+
+    def __init__(self, slug_type=None, user_team_lookup=None):
+        self.accumulator = UserAdoptionAccumulator()
+        self.slug_type = slug_type
+        self.user_team_lookup = dict(user_team_lookup or {})
+
+    def add(self, record):
+        self.accumulator.add(record)
+        self.slug_type = self.slug_type or record.get("slug_type")
+        login = record.get("user_login")
+        team = record.get("assignee_team_slug")
+        if login and team and team != "no-team":
+            self.user_team_lookup[login] = team
+
+    def merge(self, other):
+        self.accumulator.merge(other.accumulator)
+        self.slug_type = self.slug_type or other.slug_type
+        self.user_team_lookup.update(other.user_team_lookup)
+
+    def team_members(self):
+        """assignee_team_slug -> logins of the users with metrics, users without a team are left out"""
+        teams = {}
+        for login in self.accumulator.users:
+            team = self.user_team_lookup.get(login, "no-team")
+            if team != "no-team":
+                teams.setdefault(team, []).append(login)
+        return teams
+
+
+def _stamp_scope(entries, adoption_scope, team_slug=None):
+    for entry in entries:
+        if team_slug is not None:
+            entry["assignee_team_slug"] = team_slug
+        if adoption_scope != "organization":
+            # Organization entries keep their original ids, the other scopes rank the
+            # same users again and need ids of their own
+            entry["unique_hash"] = generate_unique_hash(
+                {**entry, "adoption_scope": adoption_scope},
+                key_properties=[
+                    "adoption_scope",
+                    "organization_slug",
+                    "assignee_team_slug",
+                    "user_login",
+                    "report_start_day",
+                    "report_end_day",
+                    "bucket_type",
+                ],
+            )
+        entry["adoption_scope"] = adoption_scope
+        yield entry
+
+
+def iter_scoped_leaderboards(organizations, adoption_scopes=("organization",), top_n=10, enterprise_slug="enterprise"):
+    """
+    Yield the leaderboard entries of every requested scope from per-organization
+    counters ({organization_slug: OrganizationAdoption}) filled in a single pass over
+    the user records. Team leaderboards score a subset of the organization's users
+    on the same counters; the enterprise leaderboard merges every organization and
+    is stamped with organization_slug=enterprise_slug. Each entry carries its
+    adoption_scope.
+    """
+    for organization_slug in sorted(organizations):
+        organization = organizations[organization_slug]
+        slug_type = organization.slug_type or "Organization"
+        if "organization" in adoption_scopes:
+            yield from _stamp_scope(
+                organization.accumulator.leaderboard(
+                    organization_slug, slug_type, top_n=top_n, user_team_lookup=organization.user_team_lookup
+                ),
+                "organization",
+            )
+        if "team" in adoption_scopes:
+            for team_slug, logins in sorted(organization.team_members().items()):
+                yield from _stamp_scope(
+                    organization.accumulator.subset(logins).leaderboard(
+                        organization_slug, slug_type, top_n=top_n, user_team_lookup=organization.user_team_lookup
+                    ),
+                    "team",
+                    team_slug,
+                )
+
+    if "enterprise" in adoption_scopes and organizations:
+        enterprise = OrganizationAdoption("Enterprise")
+        for organization in organizations.values():
+            enterprise.merge(organization)
+        yield from _stamp_scope(
+            enterprise.accumulator.leaderboard(
+                enterprise_slug, "Enterprise", top_n=top_n, user_team_lookup=enterprise.user_team_lookup
+            ),
+            "enterprise",
+        )
@@ -0,0 +1,100 @@
+"""
+Configuration shared by main.py and the maintenance scripts, read from the environment
+"""
+import os
+from log_utils import current_time
+
+
+class Paras:
+
+    @staticmethod
+    def date_str():
+        return current_time()[:10]
+
+    # GitHub
+    github_pat = os.getenv("GITHUB_PAT")
+    organization_slugs = os.getenv("ORGANIZATION_SLUGS")
+
+    # ElasticSearch
+    primary_key = os.getenv("PRIMARY_KEY", "unique_hash")
+    elasticsearch_url = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
+    elasticsearch_user = os.getenv("ELASTICSEARCH_USER", None)
+    elasticsearch_pass = os.getenv("ELASTICSEARCH_PASS", None)
+
+    # ElasticSearch bulk writes, a batch is flushed when either limit is reached
+    es_bulk_chunk_size = int(os.getenv("ES_BULK_CHUNK_SIZE", 500))
+    es_bulk_max_bytes = int(os.getenv("ES_BULK_MAX_BYTES", 10 * 1024 * 1024))
+    es_bulk_max_retries = int(os.getenv("ES_BULK_MAX_RETRIES", 3))
+
+    # Skip writes of documents whose content did not change since the last write:
+    # "mget" compares with the fingerprint stored in Elasticsearch, "local" with a
+    # local fingerprint cache, "off" always writes
+    content_fingerprint_mode = os.getenv("CONTENT_FINGERPRINT_MODE", "local").lower()
+
+    # Number of concurrent requests used to fetch per-team metrics, 1 fetches serially
+    github_max_workers = int(os.getenv("GITHUB_MAX_WORKERS", 1))
+
+    # Stream users-28-day report downloads straight into Elasticsearch instead of
+    # loading whole reports into memory
+    user_metrics_streaming = os.getenv("USER_METRICS_STREAMING", "false").lower() == "true"
+    download_chunk_size = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 64 * 1024))
+
+    # Concurrent report downloads and the memory they may hold before spilling to disk
+    download_workers = int(os.getenv("USER_METRICS_DOWNLOAD_WORKERS", 1))
+    download_memory_budget = int(os.getenv("USER_METRICS_DOWNLOAD_MEMORY_MB", 128)) * 1024 * 1024
+
+    # "record" saves every GitHub API and report download response under
+    # HTTP_RECORDINGS_PATH, "replay" runs from them without network (see http_recorder)
+    http_transport_mode = os.getenv("HTTP_TRANSPORT_MODE", "").strip().lower()
+
+    # Retries for a GitHub request that hit a primary or secondary rate limit
+    github_max_retries = int(os.getenv("GITHUB_MAX_RETRIES", 5))
+
+    # Only write days newer than the per-(org, team, index) watermark, minus
+    # WATERMARK_RECHECK_DAYS for late-arriving corrections
+    incremental_ingest = os.getenv("INCREMENTAL_INGEST", "false").lower() == "true"
+
+    # Archive raw metrics responses once per distinct body, see payload_archive
+    payload_archive = os.getenv("PAYLOAD_ARCHIVE", "false").lower() == "true"
+
+    # Organizations processed concurrently per cycle, on "thread" or "process" workers,
+    # and the seconds after which an organization is given up on (0 = no limit)
+    org_workers = int(os.getenv("ORG_WORKERS", 1))
+    org_worker_mode = os.getenv("ORG_WORKER_MODE", "thread").lower()
+    org_timeout = int(os.getenv("ORG_TIMEOUT_SECONDS", 0))
+
+    # Adoption leaderboards written each run, out of "organization", "team" and
+    # "enterprise" (the latter only by regenerate_adoption.py, which reads every
+    # organization), and the organization_slug enterprise entries are stamped with
+    adoption_scopes = [
+        scope.strip().lower()
+        for scope in os.getenv("ADOPTION_SCOPES", "organization").split(",")
+        if scope.strip()
+    ]
+    adoption_enterprise_slug = os.getenv("ADOPTION_ENTERPRISE_SLUG", "enterprise")
+
+    # Log path
+    log_path = os.getenv("LOG_PATH", "logs")
+
+    @staticmethod
+    def get_log_path():
+        return os.path.join(Paras.log_path, Paras.date_str())
+
+    # Execution interval HOURS
+    execution_interval = int(os.getenv("EXECUTION_INTERVAL", 6))
+
+
+class Indexes:
+    index_seat_info = os.getenv("INDEX_SEAT_INFO", "copilot_seat_info_settings")
+    index_seat_assignments = os.getenv(
+        "INDEX_SEAT_ASSIGNMENTS", "copilot_seat_assignments"
+    )
+    index_name_total = os.getenv("INDEX_NAME_TOTAL", "copilot_usage_total")
+    index_name_breakdown = os.getenv("INDEX_NAME_BREAKDOWN", "copilot_usage_breakdown")
+    index_name_breakdown_chat = os.getenv(
+        "INDEX_NAME_BREAKDOWN_CHAT", "copilot_usage_breakdown_chat"
+    )
+    index_name_pr_reviews = os.getenv("INDEX_NAME_PR_REVIEWS", "copilot_pr_reviews")
+    index_name_dotcom_chat = os.getenv("INDEX_NAME_DOTCOM_CHAT", "copilot_dotcom_chat")
+    index_user_metrics = os.getenv("INDEX_USER_METRICS", "copilot_user_metrics")
+    index_user_adoption = os.getenv("INDEX_USER_ADOPTION", "copilot_user_adoption")
@@ -2,113 +2,142 @@
 Script to create aggregated user summary with overall top_model, top_language, top_feature
 """
 import os
-from elasticsearch import Elasticsearch
-from collections import Counter
 import logging
+from datetime import datetime
+from elasticsearch import BadRequestError
+from elasticsearch.helpers import streaming_bulk
+from es_client import get_es_client
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - [%(levelname)s] - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_es_client():
-    """Initialize Elasticsearch client"""
-    # es_host = os.getenv("ELASTICSEARCH_HOST", "elasticsearch")
-    # es_port = int(os.getenv("ELASTICSEARCH_PORT", "9200"))
-    # es_url = f"http://{es_host}:{es_port}"
-    es_url = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
-    
-    es_user = os.getenv("ELASTICSEARCH_USER")
-    es_password = os.getenv("ELASTICSEARCH_PASS")
-    
-    if es_user and es_password:
-        es = Elasticsearch([es_url], http_auth=(es_user, es_password))
-        logger.info(f"Connecting to Elasticsearch at {es_url} with authentication")
-    else:
-        es = Elasticsearch([es_url])
-        logger.info("Using Elasticsearch without authentication")
-    
-    return es
-
-def create_user_summaries():
-    """Aggregate user metrics and create summary documents"""
-    es = get_es_client()
-    
-    # Get all user metrics
-    query = {
-        "size": 10000,
-        "query": {"match_all": {}}
-    }
-    
-    response = es.search(index="copilot_user_metrics", body=query)
-    
-    # Group by user
-    user_data = {}
-    for hit in response['hits']['hits']:
-        doc = hit['_source']
-        user_login = doc.get('user_login')
-        
-        if user_login not in user_data:
-            user_data[user_login] = {
-                'models': [],
-                'languages': [],
-                'features': [],
-                'organization_slug': doc.get('organization_slug')
-            }
-        
-        if doc.get('top_model'):
-            user_data[user_login]['models'].append(doc['top_model'])
-        if doc.get('top_language'):
-            user_data[user_login]['languages'].append(doc['top_language'])
-        if doc.get('top_feature'):
-            user_data[user_login]['features'].append(doc['top_feature'])
-    
-    # Calculate most frequent values and write to new index
-    summary_index = "copilot_user_metrics_summary"
-    
-    # Create index if it doesn't exist
+DEFAULT_SOURCE_INDEX = os.getenv("INDEX_USER_METRICS", "copilot_user_metrics")
+DEFAULT_SUMMARY_INDEX = os.getenv("INDEX_USER_METRICS_SUMMARY", "copilot_user_metrics_summary")
+
+# Users per composite aggregation page
+PAGE_SIZE = int(os.getenv("USER_SUMMARY_PAGE_SIZE", 1000))
+
+# Indexes known to exist, so they are not checked again on every run
+_ensured_indexes = set()
+
+# Summary field -> source field whose most frequent value is kept.
+# top_* are dynamically mapped text fields, their keyword sub-fields are aggregatable
+TOP_VALUE_FIELDS = {
+    'top_model': 'top_model.keyword',
+    'top_language': 'top_language.keyword',
+    'top_feature': 'top_feature.keyword',
+    'organization_slug': 'organization_slug',
+}
+
+
+def ensure_summary_index(es, summary_index):
+    if summary_index in _ensured_indexes:
+        return
     if not es.indices.exists(index=summary_index):
-        es.indices.create(index=summary_index, body={
-            "mappings": {
-                "properties": {
-                    "user_login": {"type": "keyword"},
-                    "top_model": {"type": "keyword"},
-                    "top_language": {"type": "keyword"},
-                    "top_feature": {"type": "keyword"},
-                    "organization_slug": {"type": "keyword"},
-                    "@timestamp": {"type": "date"}
+        try:
+            es.indices.create(index=summary_index, body={
+                "mappings": {
+                    "properties": {
+                        "user_login": {"type": "keyword"},
+                        "top_model": {"type": "keyword"},
+                        "top_language": {"type": "keyword"},
+                        "top_feature": {"type": "keyword"},
+                        "organization_slug": {"type": "keyword"},
+                        "@timestamp": {"type": "date"}
+                    }
                 }
-            }
-        })
-        logger.info(f"Created index: {summary_index}")
-    
-    # Write summary documents
-    for user_login, data in user_data.items():
-        # Get most common values
-        top_model = Counter(data['models']).most_common(1)[0][0] if data['models'] else 'unknown'
-        top_language = Counter(data['languages']).most_common(1)[0][0] if data['languages'] else 'unknown'
-        top_feature = Counter(data['features']).most_common(1)[0][0] if data['features'] else 'unknown'
-        
-        from datetime import datetime
-        doc = {
-            'user_login': user_login,
-            'top_model': top_model,
-            'top_language': top_language,
-            'top_feature': top_feature,
-            'organization_slug': data['organization_slug'],
-            '@timestamp': datetime.utcnow().isoformat()
+            })
+            logger.info(f"Created index: {summary_index}")
+        except BadRequestError as e:
+            # Created by another organization's worker since the exists check
+            if e.error != "resource_already_exists_exception":
+                raise
+    _ensured_indexes.add(summary_index)
+
+
+def iter_user_buckets(es, source_index, page_size=PAGE_SIZE):
+    """
+    Yield one composite aggregation bucket per user_login, paging with after_key.
+    Each bucket has a size-1 terms sub-aggregation per TOP_VALUE_FIELDS entry holding
+    the most frequent value (highest doc count, ties broken by value).
+    """
+    aggregation = {
+        "composite": {
+            "size": page_size,
+            "sources": [{"user_login": {"terms": {"field": "user_login"}}}],
+        },
+        "aggs": {
+            name: {"terms": {"field": field, "size": 1, "exclude": [""]}}
+            for name, field in TOP_VALUE_FIELDS.items()
+        },
+    }
+    while True:
+        response = es.search(
+            index=source_index, size=0, aggs={"users": aggregation}
+        )
+        users = response.get('aggregations', {}).get('users', {})
+        buckets = users.get('buckets', [])
+        yield from buckets
+        after_key = users.get('after_key')
+        if not buckets or not after_key:
+            return
+        aggregation["composite"]["after"] = after_key
+
+
+def build_summary_doc(bucket, timestamp):
+    def top(name, default):
+        values = bucket.get(name, {}).get('buckets', [])
+        return values[0]['key'] if values else default
+
+    return {
+        'user_login': bucket['key']['user_login'],
+        'top_model': top('top_model', 'unknown'),
+        'top_language': top('top_language', 'unknown'),
+        'top_feature': top('top_feature', 'unknown'),
+        'organization_slug': top('organization_slug', None),
+        '@timestamp': timestamp
+    }
+
+
+def create_user_summaries(source_index=DEFAULT_SOURCE_INDEX, summary_index=DEFAULT_SUMMARY_INDEX):
+    """
+    Aggregate user metrics into one summary document per user with the most frequent
+    top_model/top_language/top_feature over all their user-day records.
+    Aggregation happens in Elasticsearch, so every record is counted however many
+    there are, and summaries are written through the bulk API.
+    """
+    es = get_es_client()
+    ensure_summary_index(es, summary_index)
+
+    timestamp = datetime.utcnow().isoformat()
+    actions = (
+        {
+            "_op_type": "index",
+            "_index": summary_index,
+            # Use user_login as document ID to enable updates
+            "_id": doc['user_login'],
+            "_source": doc,
         }
-        
-        # Use user_login as document ID to enable updates
-        es.index(index=summary_index, id=user_login, body=doc)
-        logger.info(f"Updated summary for user: {user_login}")
-    
-    logger.info(f"Created/updated {len(user_data)} user summary documents")
-    return len(user_data)
+        for doc in (
+            build_summary_doc(bucket, timestamp)
+            for bucket in iter_user_buckets(es, source_index)
+        )
+    )
+
+    written, failed = 0, 0
+    for ok, item in streaming_bulk(
+        es, actions, chunk_size=PAGE_SIZE, raise_on_error=False, raise_on_exception=False
+    ):
+        if ok:
+            written += 1
+        else:
+            failed += 1
+            logger.error(f"Failed to write user summary: {item}")
+
+    logger.info(f"Created/updated {written} user summary documents, {failed} failed")
+    return written
+
 
 if __name__ == "__main__":
     count = create_user_summaries()
     logger.info(f"Total user summaries created: {count}")
-    
-    logger.info(f"Created/updated {len(user_data)} user summaries")
-
-if __name__ == "__main__":
-    create_user_summaries()
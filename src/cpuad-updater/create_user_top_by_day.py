@@ -11,17 +11,26 @@ We compute an internal activity score to select the top item:
     score = code_generation_activity_count + user_initiated_interaction_count + code_acceptance_activity_count
 
 But we do NOT persist the score in the destination document (only the labels).
+
+Incremental mode (the default) only reads source docs whose @timestamp (UTC) is
+newer than the checkpoint kept in the dest index mapping _meta, so each run costs
+time proportional to what changed since the previous one. A dest index without a
+checkpoint (new, or re-created after a mapping change) gets a full rebuild.
 """
 
 from __future__ import annotations
 
 import os
 import logging
+from datetime import datetime, timedelta, timezone
 from typing import Any, Iterable
 
-from elasticsearch import Elasticsearch
+from elasticsearch import BadRequestError, Elasticsearch
 from elasticsearch.helpers import bulk
 
+from es_client import get_es_client
+from es_scan import iter_pit_hits, map_slices, point_in_time
+
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - [%(levelname)s] - %(message)s")
 logger = logging.getLogger(__name__)
@@ -30,47 +39,54 @@ logger = logging.getLogger(__name__)
 DEFAULT_SOURCE_INDEX = os.getenv("INDEX_USER_METRICS", "copilot_user_metrics")
 DEFAULT_DEST_INDEX = os.getenv("INDEX_USER_METRICS_TOP_BY_DAY", "copilot_user_metrics_top_by_day")
 
+INCREMENTAL = os.getenv("TOP_BY_DAY_INCREMENTAL", "true").lower() == "true"
+PAGE_SIZE = int(os.getenv("TOP_BY_DAY_PAGE_SIZE", 1000))
 
-def get_es_client() -> Elasticsearch:
-    # es_host = os.getenv("ELASTICSEARCH_HOST", "elasticsearch")
-    # es_port = int(os.getenv("ELASTICSEARCH_PORT", "9200"))
-    # es_url = f"http://{es_host}:{es_port}"
-    es_url = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
-
-    es_user = os.getenv("ELASTICSEARCH_USER")
-    es_password = os.getenv("ELASTICSEARCH_PASS")
+# Source docs updated up to this long before the checkpoint are read again: a
+# writer stamps @timestamp when it generates a bulk batch, so docs of a batch still
+# in flight (or not yet refreshed) can become visible after a newer checkpoint
+CHECKPOINT_OVERLAP = timedelta(minutes=int(os.getenv("TOP_BY_DAY_CHECKPOINT_OVERLAP_MINUTES", 10)))
 
-    if es_user and es_password:
-        logger.info(f"Connecting to Elasticsearch at {es_url} with authentication")
-        return Elasticsearch([es_url], basic_auth=(es_user, es_password))
+# _meta key of the checkpoint, the newest source @timestamp processed as UTC ISO 8601.
+# last_updated_at is local time and cannot be compared across DST or TZ changes
+CHECKPOINT_META_KEY = "source_timestamp_checkpoint"
 
-    logger.info(f"Connecting to Elasticsearch at {es_url} without authentication")
-    return Elasticsearch([es_url])
+# Indexes known to exist, so they are not checked again on every run
+_ensured_indexes: set[str] = set()
 
 
 def ensure_dest_index(es: Elasticsearch, index_name: str) -> None:
+    if index_name in _ensured_indexes:
+        return
     if es.indices.exists(index=index_name):
+        _ensured_indexes.add(index_name)
         return
 
-    es.indices.create(
-        index=index_name,
-        body={
-            "mappings": {
-                "properties": {
-                    "day": {"type": "date"},
-                    "user_login": {"type": "keyword"},
-                    "organization_slug": {"type": "keyword"},
-                    "enterprise_id": {"type": "keyword"},
-                    "top_ide": {"type": "keyword"},
-                    "top_feature": {"type": "keyword"},
-                    "top_language_feature": {"type": "keyword"},
-                    "top_language_model": {"type": "keyword"},
-                    "top_model_feature": {"type": "keyword"},
+    try:
+        es.indices.create(
+            index=index_name,
+            body={
+                "mappings": {
+                    "properties": {
+                        "day": {"type": "date"},
+                        "user_login": {"type": "keyword"},
+                        "organization_slug": {"type": "keyword"},
+                        "enterprise_id": {"type": "keyword"},
+                        "top_ide": {"type": "keyword"},
+                        "top_feature": {"type": "keyword"},
+                        "top_language_feature": {"type": "keyword"},
+                        "top_language_model": {"type": "keyword"},
+                        "top_model_feature": {"type": "keyword"},
+                    }
                 }
-            }
-        },
-    )
-    logger.info(f"Created index: {index_name}")
+            },
+        )
+        logger.info(f"Created index: {index_name}")
+    except BadRequestError as e:
+        # Created by another organization's worker since the exists check
+        if e.error != "resource_already_exists_exception":
+            raise
+    _ensured_indexes.add(index_name)
 
 
 def _safe_int(value: Any) -> int:
@@ -140,58 +156,111 @@ def build_top_doc(source_doc: dict[str, Any]) -> dict[str, Any] | None:
     }
 
 
-def create_user_top_by_day(source_index: str = DEFAULT_SOURCE_INDEX, dest_index: str = DEFAULT_DEST_INDEX) -> int:
-    es = get_es_client()
-    ensure_dest_index(es, dest_index)
-
-    query = {
-        "sort": [{"day": "asc"}],
-        "query": {"match_all": {}},
-    }
-
-    # Use a scroll to handle larger datasets.
-    page_size = 500
-    resp = es.search(index=source_index, body={**query, "size": page_size}, scroll="2m")
-    scroll_id = resp.get("_scroll_id")
-    hits = resp.get("hits", {}).get("hits", [])
+def parse_timestamp(value: str | None) -> datetime | None:
+    """@timestamp as an aware UTC datetime; timestamps without offset are UTC, as in Elasticsearch"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
 
-    total_written = 0
 
-    def flush(actions: list[dict[str, Any]]) -> int:
-        if not actions:
-            return 0
-        ok, _ = bulk(es, actions, raise_on_error=False, request_timeout=60)
-        return int(ok)
+def read_checkpoint(es: Elasticsearch, dest_index: str) -> datetime | None:
+    mapping = es.indices.get_mapping(index=dest_index)
+    meta = mapping.get(dest_index, {}).get("mappings", {}).get("_meta", {})
+    return parse_timestamp(meta.get(CHECKPOINT_META_KEY))
 
-    actions: list[dict[str, Any]] = []
 
-    while hits:
-        for hit in hits:
-            source_doc = hit.get("_source", {})
-            doc = build_top_doc(source_doc)
-            if doc is None:
-                continue
-            doc_id = f"{doc.get('user_login')}|{doc.get('day')}"
-            actions.append({"_op_type": "index", "_index": dest_index, "_id": doc_id, "_source": doc})
+def write_checkpoint(es: Elasticsearch, dest_index: str, checkpoint: datetime) -> None:
+    # Kept with the data it describes: re-creating the dest index drops it too
+    es.indices.put_mapping(index=dest_index, meta={CHECKPOINT_META_KEY: checkpoint.isoformat()})
 
-            if len(actions) >= 2000:
-                total_written += flush(actions)
-                actions = []
 
-        resp = es.scroll(scroll_id=scroll_id, scroll="2m")
-        scroll_id = resp.get("_scroll_id")
-        hits = resp.get("hits", {}).get("hits", [])
+def changed_since_query(checkpoint: datetime | None) -> dict[str, Any]:
+    if not checkpoint:
+        return {"match_all": {}}
+    lower = checkpoint - CHECKPOINT_OVERLAP
+    return {"range": {"@timestamp": {"gt": lower.isoformat()}}}
 
-    if actions:
-        total_written += flush(actions)
 
-    try:
-        if scroll_id:
-            es.clear_scroll(scroll_id=scroll_id)
-    except Exception:
-        pass
+def create_user_top_by_day(
+    source_index: str = DEFAULT_SOURCE_INDEX,
+    dest_index: str = DEFAULT_DEST_INDEX,
+    incremental: bool | None = None,
+    slices: int | None = None,
+) -> int:
+    """
+    Build top-by-day docs from source_index into dest_index. With slices > 1
+    (SCAN_SLICES by default) the source is read as that many PIT slices on
+    threads, each slice building and bulk flushing its own docs: the searches
+    and bulk requests overlap, build_top_doc itself still uses one core.
+    """
+    es = get_es_client()
+    ensure_dest_index(es, dest_index)
 
-    logger.info(f"Created/updated {total_written} top-by-day docs in {dest_index}")
+    if incremental is None:
+        incremental = INCREMENTAL
+    checkpoint = read_checkpoint(es, dest_index) if incremental else None
+    if checkpoint:
+        logger.info(f"Updating {dest_index} from {source_index} docs updated since {checkpoint}")
+    else:
+        logger.info(f"Rebuilding {dest_index} from all {source_index} docs")
+    query = changed_since_query(checkpoint)
+
+    with point_in_time(es, source_index) as pit:
+
+        def process_slice(slice: dict[str, int] | None) -> tuple[int, int, datetime | None]:
+            written = 0
+            failed = 0
+            newest_seen = checkpoint
+
+            def flush(actions: list[dict[str, Any]]) -> int:
+                nonlocal failed
+                if not actions:
+                    return 0
+                ok, errors = bulk(es, actions, raise_on_error=False, request_timeout=60)
+                failed += len(errors)
+                return int(ok)
+
+            actions: list[dict[str, Any]] = []
+
+            for hit in iter_pit_hits(es, source_index, query=query, page_size=PAGE_SIZE, slice=slice, pit=pit):
+                source_doc = hit.get("_source", {})
+                timestamp = parse_timestamp(source_doc.get("@timestamp"))
+                if timestamp and (newest_seen is None or timestamp > newest_seen):
+                    newest_seen = timestamp
+                doc = build_top_doc(source_doc)
+                if doc is None:
+                    continue
+                doc_id = f"{doc.get('user_login')}|{doc.get('day')}"
+                actions.append({"_op_type": "index", "_index": dest_index, "_id": doc_id, "_source": doc})
+
+                if len(actions) >= 2000:
+                    written += flush(actions)
+                    actions = []
+
+            if actions:
+                written += flush(actions)
+            return written, failed, newest_seen
+
+        results = map_slices(process_slice, slices)
+
+    total_written = sum(result[0] for result in results)
+    total_failed = sum(result[1] for result in results)
+    newest_seen = max((result[2] for result in results if result[2]), default=None)
+
+    # Failed docs are retried on the next run by not moving the checkpoint
+    if incremental and newest_seen and newest_seen != checkpoint and not total_failed:
+        write_checkpoint(es, dest_index, newest_seen)
+
+    logger.info(
+        f"Created/updated {total_written} top-by-day docs in {dest_index} "
+        f"with {len(results)} slice(s), {total_failed} failed"
+    )
     return total_written
 
 
@@ -0,0 +1,190 @@
+"""
+Splits the per-day Copilot usage of a team into the documents of the usage indexes
+(total, breakdown, breakdown chat, PR reviews, dotcom chat)
+"""
+import logging
+
+from fingerprint_cache import generate_unique_hash
+from watermark_store import is_newer
+
+logger = logging.getLogger(__name__)
+
+
+class DataSplitter:
+    def __init__(self, data, additional_properties={}, since_day=None):
+        # since_day: only days after it are emitted, see WatermarkStore.since
+        self.data = [entry for entry in data if is_newer(entry.get("day"), since_day)]
+        if since_day:
+            logger.info(
+                f"Emitting {len(self.data)} of {len(data)} days newer than watermark cutoff {since_day}"
+            )
+        self.additional_properties = additional_properties
+        self.correction_for_0 = 0
+
+    def get_total_list(self):
+        total_list = []
+        logger.info("Generating total list from data")
+        for entry in self.data:
+            total_data = entry.copy()
+            total_data.pop("breakdown", None)
+            total_data.pop("breakdown_chat", None)
+            total_data.pop("pr_reviews", None)
+            total_data.pop("dotcom_chat", None)
+            total_data = total_data | self.additional_properties
+            total_data["unique_hash"] = generate_unique_hash(
+                total_data, key_properties=["organization_slug", "team_slug", "day"]
+            )
+
+            # If the denominator value is 0, it is corrected to a uniform value
+            total_data["total_suggestions_count"] = (
+                self.correction_for_0
+                if total_data["total_suggestions_count"] == 0
+                else total_data["total_suggestions_count"]
+            )
+            total_data["total_lines_suggested"] = (
+                self.correction_for_0
+                if total_data["total_lines_suggested"] == 0
+                else total_data["total_lines_suggested"]
+            )
+            total_data["total_chat_turns"] = (
+                self.correction_for_0
+                if total_data["total_chat_turns"] == 0
+                else total_data["total_chat_turns"]
+            )
+
+            total_list.append(total_data)
+        return total_list
+
+    def get_breakdown_list(self):
+        breakdown_list = []
+        logger.info("Generating breakdown list from data")
+        for entry in self.data:
+            day = entry.get("day")
+            for breakdown_entry in entry.get("breakdown", []):
+                breakdown_entry_with_day = breakdown_entry.copy()
+                breakdown_entry_with_day["day"] = day
+                breakdown_entry_with_day = (
+                    breakdown_entry_with_day | self.additional_properties
+                )
+
+                # # Normalize editor and language values to lowercase
+                # breakdown_entry_with_day['editor'] = breakdown_entry_with_day.get('editor', '').lower()
+                # breakdown_entry_with_day['language'] = breakdown_entry_with_day.get('language', '').lower()
+
+                # # Unify `json` and `json with comments` to `json`
+                # if breakdown_entry_with_day['language'] == 'json with comments':
+                #     breakdown_entry_with_day['language'] = 'json'
+
+                breakdown_entry_with_day["unique_hash"] = generate_unique_hash(
+                    breakdown_entry_with_day,
+                    key_properties=[
+                        "organization_slug",
+                        "team_slug",
+                        "day",
+                        "language",
+                        "editor",
+                        "model",
+                    ],
+                )
+
+                # If the denominator value is 0, it is corrected to a uniform value
+                breakdown_entry_with_day["suggestions_count"] = (
+                    self.correction_for_0
+                    if breakdown_entry_with_day["suggestions_count"] == 0
+                    else breakdown_entry_with_day["suggestions_count"]
+                )
+                breakdown_entry_with_day["lines_suggested"] = (
+                    self.correction_for_0
+                    if breakdown_entry_with_day["lines_suggested"] == 0
+                    else breakdown_entry_with_day["lines_suggested"]
+                )
+
+                breakdown_list.append(breakdown_entry_with_day)
+        return breakdown_list
+
+    def get_breakdown_chat_list(self):
+        breakdown_chat_list = []
+        logger.info("Generating breakdown chat list from data")
+        for entry in self.data:
+            day = entry.get("day")
+            for breakdown_chat_entry in entry.get("breakdown_chat", []):
+                breakdown_chat_entry_with_day = breakdown_chat_entry.copy()
+                breakdown_chat_entry_with_day["day"] = day
+                breakdown_chat_entry_with_day = (
+                    breakdown_chat_entry_with_day | self.additional_properties
+                )
+
+                breakdown_chat_entry_with_day["unique_hash"] = generate_unique_hash(
+                    breakdown_chat_entry_with_day,
+                    key_properties=[
+                        "organization_slug",
+                        "team_slug",
+                        "day",
+                        "editor",
+                        "model",
+                    ],
+                )
+
+                # If the denominator value is 0, it is corrected to a uniform value
+                breakdown_chat_entry_with_day["chat_turns"] = (
+                    self.correction_for_0
+                    if breakdown_chat_entry_with_day["chat_turns"] == 0
+                    else breakdown_chat_entry_with_day["chat_turns"]
+                )
+
+                breakdown_chat_list.append(breakdown_chat_entry_with_day)
+        return breakdown_chat_list
+
+    def get_pr_reviews_list(self):
+        pr_reviews_list = []
+        logger.info("Generating PR reviews list from data")
+        for entry in self.data:
+            day = entry.get("day")
+            for pr_entry in entry.get("pr_reviews", []):
+                pr_entry_with_day = pr_entry.copy()
+                pr_entry_with_day["day"] = day
+                pr_entry_with_day = pr_entry_with_day | self.additional_properties
+
+                pr_entry_with_day["unique_hash"] = generate_unique_hash(
+                    pr_entry_with_day,
+                    key_properties=[
+                        "organization_slug",
+                        "team_slug",
+                        "day",
+                        "repository",
+                        "model",
+                    ],
+                )
+
+                pr_reviews_list.append(pr_entry_with_day)
+        return pr_reviews_list
+
+    def get_dotcom_chat_list(self):
+        dotcom_chat_list = []
+        logger.info("Generating dotcom chat list from data")
+        for entry in self.data:
+            day = entry.get("day")
+            for chat_entry in entry.get("dotcom_chat", []):
+                chat_entry_with_day = chat_entry.copy()
+                chat_entry_with_day["day"] = day
+                chat_entry_with_day = chat_entry_with_day | self.additional_properties
+
+                chat_entry_with_day["unique_hash"] = generate_unique_hash(
+                    chat_entry_with_day,
+                    key_properties=[
+                        "organization_slug",
+                        "team_slug",
+                        "day",
+                        "model",
+                    ],
+                )
+
+                # If the denominator value is 0, it is corrected to a uniform value
+                chat_entry_with_day["chat_turns"] = (
+                    self.correction_for_0
+                    if chat_entry_with_day["chat_turns"] == 0
+                    else chat_entry_with_day["chat_turns"]
+                )
+
+                dotcom_chat_list.append(chat_entry_with_day)
+        return dotcom_chat_list
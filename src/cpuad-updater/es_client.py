@@ -0,0 +1,54 @@
+"""
+Process-wide Elasticsearch client registry shared by main.py, create_user_summary
+and create_user_top_by_day
+"""
+import os
+import logging
+import threading
+
+from elasticsearch import Elasticsearch
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_es_client(url=None, user=None, password=None):
+    """
+    Return the shared Elasticsearch client for url (ELASTICSEARCH_URL by default).
+    Clients are created once per process: a forked worker builds its own instead of
+    reusing the parent's pooled connections.
+
+    Tuning:
+      ES_CONNECTIONS_PER_NODE  pooled connections per node (default 10)
+      ES_REQUEST_TIMEOUT       seconds (default 60)
+      ES_MAX_RETRIES           retries on connection errors and timeouts (default 3)
+      ES_HTTP_COMPRESS         gzip request bodies (default false)
+    """
+    url = url or os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
+    user = user or os.getenv("ELASTICSEARCH_USER")
+    password = password or os.getenv("ELASTICSEARCH_PASS")
+
+    key = (os.getpid(), url, user)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            return client
+
+        options = {
+            "hosts": url,
+            "connections_per_node": int(os.getenv("ES_CONNECTIONS_PER_NODE", 10)),
+            "request_timeout": float(os.getenv("ES_REQUEST_TIMEOUT", 60)),
+            "max_retries": int(os.getenv("ES_MAX_RETRIES", 3)),
+            "retry_on_timeout": True,
+            "http_compress": os.getenv("ES_HTTP_COMPRESS", "false").lower() == "true",
+        }
+        if user and password:
+            logger.info(f"Connecting to Elasticsearch at {url} with authentication")
+            options["basic_auth"] = (user, password)
+        else:
+            logger.info(f"Connecting to Elasticsearch at {url} without authentication")
+        client = Elasticsearch(**options)
+        _clients[key] = client
+        return client
@@ -0,0 +1,324 @@
+"""
+ElasticsearchManager: index bootstrap and the document writers main.py uses
+(write_to_es for single documents, write_bulk_to_es for the _bulk API)
+"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from elasticsearch import NotFoundError
+from elasticsearch.helpers import streaming_bulk
+
+import run_stats
+from config import Paras, Indexes
+from es_client import get_es_client
+from fingerprint_cache import FingerprintCache, content_fingerprint
+from log_utils import current_time
+
+logger = logging.getLogger(__name__)
+
+
+class ElasticsearchManager:
+    # Stored painless script used by write_bulk_to_es(update_condition=...).
+    # Same decision as write_to_es: when every field in params.condition already holds
+    # the given value in the indexed document, those fields are preserved and all other
+    # fields are overwritten from params.doc; otherwise params.doc is applied as-is.
+    preserve_fields_script_id = "cpuad_preserve_fields"
+    preserve_fields_script = """
+        boolean preserve = true;
+        for (def key : params.condition.keySet()) {
+            if (!ctx._source.containsKey(key) || ctx._source[key] != params.condition[key]) {
+                preserve = false;
+                break;
+            }
+        }
+        for (def key : params.doc.keySet()) {
+            if (preserve && params.condition.containsKey(key)) {
+                continue;
+            }
+            ctx._source[key] = params.doc[key];
+        }
+    """
+
+    def __init__(self, primary_key=Paras.primary_key):
+        self.primary_key = primary_key
+        self.fingerprint_cache = FingerprintCache()
+        # Indexes created by this process that no bulk write has completed on yet:
+        # none of their documents can have a stored fingerprint to look up
+        self._new_indexes = set()
+        self.bootstrap_state_path = os.path.join(
+            os.getenv("STATE_PATH", "state"), "es_bootstrap.json"
+        )
+        self.bootstrap()
+
+    @property
+    def es(self):
+        # Looked up on each use, so a forked worker process gets its own connections
+        return get_es_client(
+            Paras.elasticsearch_url, Paras.elasticsearch_user, Paras.elasticsearch_pass
+        )
+
+    def wait_until_available(self):
+        # try ping for 1 minute
+        for i in range(30):
+            if self.es.ping():
+                logger.info("Elasticsearch is up and running")
+                break
+            else:
+                logger.warning("Elasticsearch is not responding, retrying...")
+                time.sleep(5)
+
+    def mapping_version(self):
+        """Hash of the index names, mapping files and stored script this code expects"""
+        digest = hashlib.sha256(self.preserve_fields_script.encode())
+        for index_name in sorted(self.index_names()):
+            digest.update(index_name.encode())
+            mapping_file = f"mapping/{index_name}_mapping.json"
+            if os.path.exists(mapping_file):
+                with open(mapping_file, "rb") as f:
+                    digest.update(f.read())
+        return digest.hexdigest()
+
+    @staticmethod
+    def index_names():
+        return [
+            Indexes.__dict__[name] for name in Indexes.__dict__ if name.startswith("index_")
+        ]
+
+    def bootstrap(self):
+        """
+        Make sure the indexes and the stored script exist. The full
+        check_and_create_indexes only runs when the mapping version differs from the
+        one last bootstrapped on this cluster (kept in STATE_PATH/es_bootstrap.json)
+        or an index is missing; otherwise this costs one ping and one exists request.
+        """
+        self.wait_until_available()
+        version = self.mapping_version()
+        state = {}
+        if os.path.exists(self.bootstrap_state_path):
+            with open(self.bootstrap_state_path, "r", encoding="utf8") as f:
+                state = json.load(f)
+        if state.get(Paras.elasticsearch_url) == version and self.es.indices.exists(
+            index=self.index_names()
+        ):
+            logger.info(f"Elasticsearch indexes up to date, mapping version {version[:12]}")
+            return
+
+        self.check_and_create_indexes()
+        state[Paras.elasticsearch_url] = version
+        os.makedirs(os.path.dirname(self.bootstrap_state_path) or ".", exist_ok=True)
+        with open(self.bootstrap_state_path, "w", encoding="utf8") as f:
+            json.dump(state, f, indent=4)
+        logger.info(f"Elasticsearch bootstrap done, mapping version {version[:12]}")
+
+    # Check if all indexes in the indexes are present, and if they don't, they are created based on the files in the mapping folder
+    def check_and_create_indexes(self):
+        for index_name in self.index_names():
+            if not self.es.indices.exists(index=index_name):
+                mapping_file = f"mapping/{index_name}_mapping.json"
+                with open(mapping_file, "r") as f:
+                    mapping = json.load(f)
+                self.es.indices.create(index=index_name, body=mapping)
+                logger.info(f"Created index: {index_name}")
+                # Fingerprints recorded for a deleted index would skip writing its documents
+                self.fingerprint_cache.clear(index_name)
+                self._new_indexes.add(index_name)
+            else:
+                logger.info(f"Index already exists: {index_name}")
+                self._add_new_fields(index_name)
+
+        self.es.put_script(
+            id=self.preserve_fields_script_id,
+            script={"lang": "painless", "source": self.preserve_fields_script},
+        )
+        logger.info(f"Stored script: {self.preserve_fields_script_id}")
+
+    def _add_new_fields(self, index_name):
+        """Map fields added to the mapping file since the index was created"""
+        mapping_file = f"mapping/{index_name}_mapping.json"
+        if not os.path.exists(mapping_file):
+            return
+        with open(mapping_file, "r") as f:
+            properties = json.load(f).get("mappings", {}).get("properties", {})
+        try:
+            self.es.indices.put_mapping(index=index_name, properties=properties)
+        except Exception as e:
+            logger.warning(f"Could not update the mapping of {index_name}: {e}")
+
+    def write_to_es(self, index_name, data, update_condition=None):
+        last_updated_at = current_time()
+        data["last_updated_at"] = last_updated_at
+        # Add @timestamp for Grafana time-based filtering (ISO 8601 format, UTC)
+        data["@timestamp"] = datetime.now(timezone.utc).isoformat()
+        doc_id = data.get(self.primary_key)
+        logger.info(f"Writing data to Elasticsearch index: {index_name}")
+        try:
+            # Get existing document
+            existing_doc = self.es.get(index=index_name, id=doc_id)
+
+            # Check update condition if provided
+            if update_condition:
+                should_preserve_fields = True
+                for field, value in update_condition.items():
+                    if (
+                        field not in existing_doc["_source"]
+                        or existing_doc["_source"][field] != value
+                    ):
+                        should_preserve_fields = False
+                        break
+
+                if should_preserve_fields:
+                    # Preserve fields listed in update_condition by copying their values from existing document
+                    for field in update_condition.keys():
+                        if field in existing_doc["_source"]:
+                            data[field] = existing_doc["_source"][field]
+                    logger.info(
+                        f"[partial update] to [{index_name}]: {doc_id} - preserving fields: {list(update_condition.keys())}"
+                    )
+
+            # Always update document, possibly with some preserved fields
+            self.es.update(index=index_name, id=doc_id, doc=data)
+            logger.info(f"[updated] to [{index_name}]: {data}")
+        except NotFoundError:
+            self.es.index(index=index_name, id=doc_id, document=data)
+            logger.info(f"[created] to [{index_name}]: {data}")
+        run_stats.record("documents_written")
+
+    def write_bulk_to_es(self, index_name, datas, update_condition=None, skip_unchanged=False):
+        """
+        Upsert documents into index_name through the _bulk API.
+        Each document is sent as an update with doc_as_upsert, keyed on primary_key,
+        so the result is the same as calling write_to_es for every document.
+        With update_condition, the preserve decision of write_to_es is made server side
+        by the stored preserve_fields_script instead of reading each document first.
+        With skip_unchanged, documents whose content_fingerprint matches the one last
+        written are not sent (see Paras.content_fingerprint_mode).
+        Returns a (written, failed) tuple, skipped documents are counted in run_stats.
+        """
+        skip_unchanged = skip_unchanged and Paras.content_fingerprint_mode in ("mget", "local")
+        pending_fingerprints = {}
+
+        def generate_actions():
+            datas_iter = iter(datas)
+            while True:
+                batch = list(itertools.islice(datas_iter, Paras.es_bulk_chunk_size))
+                if not batch:
+                    return
+                if skip_unchanged:
+                    batch = self._drop_unchanged(index_name, batch, pending_fingerprints)
+                yield from generate_batch_actions(batch)
+
+        def generate_batch_actions(batch):
+            # Stamped when the batch is sent, a long stream is not written all at once
+            last_updated_at = current_time()
+            # Add @timestamp for Grafana time-based filtering (ISO 8601 format, UTC)
+            timestamp = datetime.now(timezone.utc).isoformat()
+            for data in batch:
+                data["last_updated_at"] = last_updated_at
+                data["@timestamp"] = timestamp
+                if update_condition:
+                    yield {
+                        "_op_type": "update",
+                        "_index": index_name,
+                        "_id": data.get(self.primary_key),
+                        "script": {
+                            "id": self.preserve_fields_script_id,
+                            "params": {"doc": data, "condition": update_condition},
+                        },
+                        "upsert": data,
+                    }
+                    continue
+                yield {
+                    "_op_type": "update",
+                    "_index": index_name,
+                    "_id": data.get(self.primary_key),
+                    "doc": data,
+                    "doc_as_upsert": True,
+                }
+
+        written, failed = 0, 0
+        for ok, item in streaming_bulk(
+            self.es,
+            generate_actions(),
+            chunk_size=Paras.es_bulk_chunk_size,
+            max_chunk_bytes=Paras.es_bulk_max_bytes,
+            max_retries=Paras.es_bulk_max_retries,
+            raise_on_error=False,
+            raise_on_exception=False,
+        ):
+            if ok:
+                written += 1
+                if Paras.content_fingerprint_mode == "local" and pending_fingerprints:
+                    doc_id = item.get("update", {}).get("_id")
+                    if doc_id in pending_fingerprints:
+                        self.fingerprint_cache.put(
+                            index_name, doc_id, pending_fingerprints.pop(doc_id)
+                        )
+            else:
+                failed += 1
+                logger.error(f"[bulk failed] to [{index_name}]: {item}")
+
+        self._new_indexes.discard(index_name)
+        run_stats.record("documents_written", written)
+        run_stats.record("documents_failed", failed)
+        logger.info(
+            f"[bulk] to [{index_name}]: {written} written, {failed} failed"
+        )
+        return written, failed
+
+    def _drop_unchanged(self, index_name, batch, pending_fingerprints):
+        for data in batch:
+            data["content_fingerprint"] = content_fingerprint(data)
+        doc_ids = [data.get(self.primary_key) for data in batch]
+
+        if Paras.content_fingerprint_mode == "mget" and index_name in self._new_indexes:
+            # First load of an index created by this process, no round-trip needed
+            existing = {}
+        elif Paras.content_fingerprint_mode == "mget":
+            try:
+                response = self.es.mget(
+                    index=index_name, ids=doc_ids, source_includes=["content_fingerprint"]
+                )
+                existing = {
+                    doc["_id"]: doc.get("_source", {}).get("content_fingerprint")
+                    for doc in response.get("docs", [])
+                    if doc.get("found")
+                }
+            except Exception as e:
+                logger.warning(f"Fingerprint lookup failed for [{index_name}], writing all: {e}")
+                existing = {}
+        else:
+            existing = self.fingerprint_cache.get_many(index_name, doc_ids)
+
+        changed = []
+        for data in batch:
+            doc_id = data.get(self.primary_key)
+            if existing.get(doc_id) == data["content_fingerprint"]:
+                continue
+            if Paras.content_fingerprint_mode == "local":
+                pending_fingerprints[doc_id] = data["content_fingerprint"]
+            changed.append(data)
+
+        skipped = len(batch) - len(changed)
+        if skipped:
+            run_stats.record("documents_skipped", skipped)
+            logger.info(f"[unchanged] to [{index_name}]: skipped {skipped} of {len(batch)}")
+        return changed
+
+
+_es_manager = None
+_es_manager_lock = threading.Lock()
+
+
+def get_es_manager():
+    """The ElasticsearchManager shared by all organizations, bootstrapped on first use"""
+    global _es_manager
+    with _es_manager_lock:
+        if _es_manager is None:
+            _es_manager = ElasticsearchManager()
+        return _es_manager
@@ -0,0 +1,82 @@
+"""
+Point-in-time + search_after scans, replacing the scroll API for full index reads.
+A scan can be split into slices that are read concurrently from the same PIT.
+"""
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Number of slices full index scans are split into, each read by its own worker
+SCAN_SLICES = int(os.getenv("SCAN_SLICES", 1))
+
+
+@contextmanager
+def point_in_time(es, index, keep_alive="2m"):
+    """Open a PIT on index, yields a {"id": ...} dict shared by the slices reading it"""
+    pit = {"id": es.open_point_in_time(index=index, keep_alive=keep_alive)["id"]}
+    try:
+        yield pit
+    finally:
+        try:
+            es.close_point_in_time(id=pit["id"])
+        except Exception as e:
+            logger.warning(f"Failed to close point in time on {index}: {e}")
+
+
+def iter_pit_hits(es, index, query=None, page_size=1000, keep_alive="2m", source=None, slice=None, pit=None):
+    """
+    Yield every hit of query (match_all by default) in index from a consistent
+    point-in-time view, paging with search_after on _shard_doc.
+    slice={"id": i, "max": n} restricts the scan to one of n disjoint slices, so
+    n scans of the same pit (see point_in_time) can read the index in parallel.
+    Without pit, one is opened for this scan and closed at the end.
+    source limits the returned _source fields (list of field names).
+    """
+    if pit is None:
+        with point_in_time(es, index, keep_alive) as pit:
+            yield from iter_pit_hits(es, index, query, page_size, keep_alive, source, slice, pit)
+        return
+
+    search_after = None
+    while True:
+        body = {
+            "size": page_size,
+            "query": query or {"match_all": {}},
+            "pit": {"id": pit["id"], "keep_alive": keep_alive},
+            "sort": [{"_shard_doc": "asc"}],
+            "track_total_hits": False,
+        }
+        if search_after is not None:
+            body["search_after"] = search_after
+        if slice is not None:
+            body["slice"] = slice
+        if source is not None:
+            body["_source"] = source
+        response = es.search(body=body)
+        # The PIT id may change between requests, always continue with the latest
+        pit["id"] = response.get("pit_id", pit["id"])
+        hits = response.get("hits", {}).get("hits", [])
+        if not hits:
+            return
+        yield from hits
+        search_after = hits[-1]["sort"]
+
+
+def map_slices(fn, slices=None):
+    """
+    Call fn(slice) for each of `slices` slices ({"id": i, "max": slices}) on its own
+    thread and return the results in slice order; fn(None) inline for a single slice.
+
+    Only the I/O is parallel: the Elasticsearch searches and bulk writes of the slices
+    overlap, but the Python work of fn (building documents, counting) holds the GIL and
+    runs on one core at a time. Slices are not forked into processes because the
+    callers run inside organization worker threads, where a fork could copy held locks.
+    """
+    slices = SCAN_SLICES if slices is None else slices
+    if slices <= 1:
+        return [fn(None)]
+    with ThreadPoolExecutor(max_workers=slices) as executor:
+        return list(executor.map(fn, [{"id": i, "max": slices} for i in range(slices)]))
@@ -0,0 +1,112 @@
+"""
+Document hashes: unique_hash document ids, and content fingerprints used to skip
+Elasticsearch writes of unchanged documents
+"""
+import fcntl
+import hashlib
+import json
+import os
+import threading
+
+# Fields that change on every write without the document content changing
+VOLATILE_FIELDS = ("last_updated_at", "@timestamp", "content_fingerprint")
+
+
+def generate_unique_hash(data, key_properties=[]):
+    key_elements = []
+    for key_property in key_properties:
+        value = data.get(key_property)
+        key_elements.append(str(value) if value is not None else "")
+    key_string = "-".join(key_elements)
+    unique_hash = hashlib.sha256(key_string.encode()).hexdigest()
+    return unique_hash
+
+
+def content_fingerprint(doc, volatile_fields=VOLATILE_FIELDS):
+    stable = {k: v for k, v in doc.items() if k not in volatile_fields}
+    payload = json.dumps(stable, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class FingerprintCache:
+    """
+    Local record of the fingerprint last written for each document, one JSON file
+    per index under STATE_PATH/fingerprints. Indexes are loaded on first use.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(os.getenv("STATE_PATH", "state"), "fingerprints")
+        self.path = path
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._dirty = {}  # index name -> {doc id: fingerprint} not saved yet
+
+    def _file(self, index_name):
+        return os.path.join(self.path, f"{index_name}.json")
+
+    def _load(self, index_name):
+        if index_name not in self._indexes:
+            fingerprints = {}
+            if os.path.exists(self._file(index_name)):
+                with open(self._file(index_name), "r", encoding="utf8") as f:
+                    fingerprints = json.load(f)
+            # Fingerprints put but not saved yet are newer than the file
+            self._indexes[index_name] = {**fingerprints, **self._dirty.get(index_name, {})}
+        return self._indexes[index_name]
+
+    def reload(self):
+        """
+        Forget the loaded indexes so they are read from disk again on next use, e.g. in
+        a forked worker, to see the fingerprints other worker processes saved since
+        """
+        with self._lock:
+            self._indexes = {}
+
+    def get_many(self, index_name, doc_ids):
+        with self._lock:
+            fingerprints = self._load(index_name)
+            return {doc_id: fingerprints.get(doc_id) for doc_id in doc_ids}
+
+    def put(self, index_name, doc_id, fingerprint):
+        with self._lock:
+            self._load(index_name)[doc_id] = fingerprint
+            self._dirty.setdefault(index_name, {})[doc_id] = fingerprint
+
+    def clear(self, index_name):
+        """
+        Forget every fingerprint of an index, e.g. when the index was (re)created and
+        none of the documents they were recorded for exist anymore
+        """
+        with self._lock:
+            # Loaded again from disk on next use, so forked workers see what others saved
+            self._indexes.pop(index_name, None)
+            self._dirty.pop(index_name, None)
+            os.makedirs(self.path, exist_ok=True)
+            with open(f"{self._file(index_name)}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                if os.path.exists(self._file(index_name)):
+                    os.remove(self._file(index_name))
+
+    def save(self):
+        """
+        Write the fingerprints put since the last save into their index files, merged
+        with what other caches (other organizations, other processes) saved meanwhile
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        os.makedirs(self.path, exist_ok=True)
+        for index_name, updates in dirty.items():
+            with open(f"{self._file(index_name)}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                fingerprints = {}
+                if os.path.exists(self._file(index_name)):
+                    with open(self._file(index_name), "r", encoding="utf8") as f:
+                        fingerprints = json.load(f)
+                fingerprints.update(updates)
+                tmp_file = f"{self._file(index_name)}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_file, "w", encoding="utf8") as f:
+                    json.dump(fingerprints, f)
+                os.replace(tmp_file, self._file(index_name))
+            with self._lock:
+                self._indexes[index_name] = {**fingerprints, **self._dirty.get(index_name, {})}
@@ -0,0 +1,134 @@
+"""
+Persistent on-disk cache of GitHub API responses for ETag / If-None-Match revalidation
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class HttpCache:
+    """
+    Stores the body, Link header and validators (ETag, Last-Modified) of successful
+    responses, one file per URL. get() returns the cached entry so the caller can send
+    If-None-Match / If-Modified-Since and replay the body on 304 Not Modified.
+    The total size is capped at max_bytes, least recently used entries are evicted first.
+    """
+
+    def __init__(self, cache_path=None, max_bytes=None):
+        if cache_path is None:
+            cache_path = os.getenv("HTTP_CACHE_PATH", "cache/http")
+        if max_bytes is None:
+            max_bytes = int(os.getenv("HTTP_CACHE_MAX_MB", 256)) * 1024 * 1024
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        self.reload()
+
+    def reload(self):
+        """
+        Rebuild the entry index from the cache folder, e.g. in a forked worker, to see
+        the entries stored by other worker processes since this cache was created
+        """
+        os.makedirs(self.cache_path, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.cache_path):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[: -len(".json")], stat.st_size))
+        entries = OrderedDict((key, size) for _, key, size in sorted(files))
+        with self._lock:
+            self._entries = entries
+            self._total_bytes = sum(entries.values())
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.cache_path, f"{key}.json")
+
+    def get(self, url):
+        key = self._key(url)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._file(key), "r", encoding="utf8") as f:
+                entry = json.load(f)
+            os.utime(self._file(key))
+        except (OSError, ValueError):
+            self._discard(key)
+            return None
+        return entry if entry.get("url") == url else None
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record_hit(self, hit):
+        with self._lock:
+            self._stats["hits" if hit else "misses"] += 1
+
+    def put(self, url, response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        key = self._key(url)
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "link": response.headers.get("Link"),
+            "body": response.text,
+        }
+        tmp_file = f"{self._file(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_file, "w", encoding="utf8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        size = os.path.getsize(tmp_file)
+        os.replace(tmp_file, self._file(key))
+
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._stats["stores"] += 1
+            evicted = []
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                self._stats["evictions"] += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._file(old_key))
+            except OSError:
+                pass
+
+    def _discard(self, key):
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
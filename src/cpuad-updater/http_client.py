@@ -0,0 +1,83 @@
+"""
+Pooled keep-alive HTTP sessions shared by all GitHub API and report download requests
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import run_stats
+
+
+class HttpClient:
+    """
+    Thin wrapper around a requests.Session with a sized connection pool,
+    default timeouts and a single set of headers.
+    The session is shared between threads; stats() reports how many requests
+    were sent and how many TCP/TLS connections had to be opened for them.
+    adapter replaces the pooled HTTPAdapter, e.g. to record or replay (see http_recorder).
+    """
+
+    def __init__(self, headers=None, pool_size=None, connect_timeout=None, read_timeout=None, adapter=None):
+        if pool_size is None:
+            pool_size = int(os.getenv("HTTP_POOL_SIZE", 10))
+        if connect_timeout is None:
+            connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", 10))
+        if read_timeout is None:
+            read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", 60))
+
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        self.session.headers.update(headers or {})
+
+        self._adapter = adapter or HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._requests_sent = 0
+
+        # A forked worker process must not share the parent's pooled sockets
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        if hasattr(self._adapter, "poolmanager"):
+            self._adapter.poolmanager.clear()
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self._requests_sent += 1
+        run_stats.record("http_requests")
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        # urllib3 keeps per-host counters on each connection pool
+        connections_opened = 0
+        pool_requests = 0
+        pools = self._adapter.poolmanager.pools if hasattr(self._adapter, "poolmanager") else {}
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections_opened += pool.num_connections
+            pool_requests += pool.num_requests
+        with self._lock:
+            requests_sent = self._requests_sent
+        return {
+            "requests_sent": requests_sent,
+            "connections_opened": connections_opened,
+            "connections_reused": max(pool_requests - connections_opened, 0),
+        }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,163 @@
+"""
+Record and replay transport adapters for HttpClient: HTTP_TRANSPORT_MODE=record saves
+every response (GitHub API, report downloads) under HTTP_RECORDINGS_PATH, replay
+serves them from there without any network access
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+# Describe the body as sent on the wire, recorded bodies are stored decoded
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+# A replay is not paced by the rate limit budget of the recording
+_REPLAY_DROPPED_HEADERS = {"retry-after"}
+
+
+def recording_key(method, url, body=None):
+    digest = hashlib.sha256(f"{method.upper()} {url}".encode("utf8"))
+    if body:
+        digest.update(body if isinstance(body, bytes) else body.encode("utf8"))
+    return digest.hexdigest()
+
+
+def _request_key(request):
+    return recording_key(request.method, request.url, request.body)
+
+
+class _RecordingBody:
+    """
+    Stands in for the urllib3 response body: everything read is also written to a
+    temporary file, which becomes the recording once the body was read to the end
+    """
+
+    def __init__(self, raw, recordings_path, key, metadata):
+        self._raw = raw
+        self._recordings_path = recordings_path
+        self._key = key
+        self._metadata = metadata
+        fd, self._tmp_path = tempfile.mkstemp(dir=recordings_path, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    def read(self, amt=None, decode_content=True, **kwargs):
+        data = self._raw.read(amt, decode_content=True)
+        if self._file is not None:
+            self._file.write(data)
+            if not data or amt is None:
+                self._finish()
+        return data
+
+    def stream(self, amt=2**16, decode_content=None):
+        while True:
+            data = self.read(amt)
+            if not data:
+                return
+            yield data
+
+    def _finish(self):
+        self._file.close()
+        self._file = None
+        base = os.path.join(self._recordings_path, self._key)
+        os.replace(self._tmp_path, f"{base}.body")
+        fd, tmp_path = tempfile.mkstemp(dir=self._recordings_path, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf8") as f:
+            json.dump(self._metadata, f, indent=2)
+        os.replace(tmp_path, f"{base}.json")
+
+    def close(self):
+        # Closed before the end of the body, nothing usable was recorded
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self._tmp_path)
+        self._raw.close()
+
+    def release_conn(self):
+        self._raw.release_conn()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that saves each response as <key>.json (status, headers) and <key>.body"""
+
+    def __init__(self, recordings_path, **kwargs):
+        super().__init__(**kwargs)
+        self.recordings_path = recordings_path
+        os.makedirs(recordings_path, exist_ok=True)
+
+    def build_response(self, req, resp):
+        response = super().build_response(req, resp)
+        metadata = {
+            "method": req.method,
+            "url": req.url,
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in _DROPPED_HEADERS
+            },
+        }
+        response.raw = _RecordingBody(resp, self.recordings_path, _request_key(req), metadata)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Serves recorded responses, a request that was not recorded gets a 404"""
+
+    def __init__(self, recordings_path):
+        super().__init__()
+        self.recordings_path = recordings_path
+        self.misses = 0
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        base = os.path.join(self.recordings_path, _request_key(request))
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        try:
+            with open(f"{base}.json", "r", encoding="utf8") as f:
+                metadata = json.load(f)
+            response.raw = open(f"{base}.body", "rb")
+        except FileNotFoundError:
+            self.misses += 1
+            logger.warning(f"No recorded response for {request.method} {request.url}")
+            metadata = {"status_code": 404, "reason": "Not Recorded", "headers": {}}
+            response._content = b'{"message": "Not recorded"}'
+        response.status_code = metadata["status_code"]
+        response.reason = metadata.get("reason")
+        response.headers = CaseInsensitiveDict(
+            {
+                name: value
+                for name, value in metadata["headers"].items()
+                if name.lower() not in _REPLAY_DROPPED_HEADERS
+                and not name.lower().startswith("x-ratelimit-")
+            }
+        )
+        response.encoding = get_encoding_from_headers(response.headers)
+        return response
+
+    def close(self):
+        pass
+
+
+def transport_adapter(mode, pool_size=10, recordings_path=None):
+    """Adapter for HttpClient in HTTP_TRANSPORT_MODE mode ("record" or "replay"), None otherwise"""
+    if recordings_path is None:
+        recordings_path = os.getenv("HTTP_RECORDINGS_PATH", "recordings")
+    if mode == "record":
+        return RecordingAdapter(recordings_path, pool_connections=pool_size, pool_maxsize=pool_size)
+    if mode == "replay":
+        return ReplayAdapter(recordings_path)
+    return None
@@ -1,17 +1,35 @@
 import json
+import functools
 import requests
 import os
-import hashlib
-import math
-from elasticsearch import Elasticsearch, NotFoundError
 from datetime import datetime, timedelta
 from log_utils import configure_logger, current_time
 import time
 from metrics_2_usage_convertor import convert_metrics_to_usage
 import traceback
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 from zoneinfo import ZoneInfo
 from create_user_summary import create_user_summaries
 from create_user_top_by_day import create_user_top_by_day
+from http_client import HttpClient
+from http_cache import HttpCache
+from http_recorder import transport_adapter
+from ndjson_stream import ReportParseError, iter_ndjson_records
+from watermark_store import WatermarkStore, is_newer
+from fingerprint_cache import generate_unique_hash
+from config import Paras, Indexes
+from adoption import OrganizationAdoption, iter_scoped_leaderboards
+from rate_limiter import RateLimitScheduler, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from org_pool import run_organizations
+from snapshot_writer import get_snapshot_writer
+from data_splitter import DataSplitter
+from top_values import calculate_top_values
+from payload_archive import PayloadArchive
+from es_manager import get_es_manager
+import run_stats
 
 
 def get_utc_offset():
@@ -28,103 +46,6 @@ def get_utc_offset():
     return offset_str
 
 
-def calculate_top_values(user_data):
-    """Calculate top model, language, and feature from user metrics data"""
-    
-    # Initialize counters
-    model_counts = {}
-    language_counts = {}
-    feature_counts = {}
-    
-    # Extract from totals_by_language_model
-    for entry in user_data.get('totals_by_language_model', []):
-        language = entry.get('language', 'unknown')
-        model = entry.get('model', 'unknown')
-        activity_count = entry.get('code_generation_activity_count', 0)
-        
-        language_counts[language] = language_counts.get(language, 0) + activity_count
-        model_counts[model] = model_counts.get(model, 0) + activity_count
-    
-    # Extract from totals_by_feature
-    for entry in user_data.get('totals_by_feature', []):
-        feature = entry.get('feature', 'unknown')
-        activity_count = entry.get('code_generation_activity_count', 0) + entry.get('user_initiated_interaction_count', 0)
-        
-        feature_counts[feature] = feature_counts.get(feature, 0) + activity_count
-    
-    # Extract from totals_by_language_feature (additional language data)
-    for entry in user_data.get('totals_by_language_feature', []):
-        language = entry.get('language', 'unknown')
-        activity_count = entry.get('code_generation_activity_count', 0)
-        
-        language_counts[language] = language_counts.get(language, 0) + activity_count
-    
-    # Find top values (most used)
-    top_model = max(model_counts.items(), key=lambda x: x[1])[0] if model_counts else 'unknown'
-    top_language = max(language_counts.items(), key=lambda x: x[1])[0] if language_counts else 'unknown'
-    top_feature = max(feature_counts.items(), key=lambda x: x[1])[0] if feature_counts else 'unknown'
-    
-    # Map feature names to more user-friendly names
-    feature_mapping = {
-        'chat_panel_ask_mode': 'Chat',
-        'chat_panel_agent_mode': 'Agent',
-        'agent_edit': 'Agent',
-        'code_completion': 'Code Completion',
-        'inline_chat': 'Inline Chat'
-    }
-    
-    top_feature = feature_mapping.get(top_feature, top_feature)
-    
-    return {
-        'top_model': top_model,
-        'top_language': top_language, 
-        'top_feature': top_feature
-    }
-
-
-class Paras:
-
-    @staticmethod
-    def date_str():
-        return current_time()[:10]
-
-    # GitHub
-    github_pat = os.getenv("GITHUB_PAT")
-    organization_slugs = os.getenv("ORGANIZATION_SLUGS")
-
-    # ElasticSearch
-    primary_key = os.getenv("PRIMARY_KEY", "unique_hash")
-    elasticsearch_url = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
-    elasticsearch_user = os.getenv("ELASTICSEARCH_USER", None)
-    elasticsearch_pass = os.getenv("ELASTICSEARCH_PASS", None)
-
-    # Log path
-    log_path = os.getenv("LOG_PATH", "logs")
-
-    @staticmethod
-    def get_log_path():
-        return os.path.join(Paras.log_path, Paras.date_str())
-
-    # Execution interval HOURS
-    execution_interval = int(os.getenv("EXECUTION_INTERVAL", 6))
-
-
-class Indexes:
-    index_seat_info = os.getenv("INDEX_SEAT_INFO", "copilot_seat_info_settings")
-    index_seat_assignments = os.getenv(
-        "INDEX_SEAT_ASSIGNMENTS", "copilot_seat_assignments"
-    )
-    index_name_total = os.getenv("INDEX_NAME_TOTAL", "copilot_usage_total")
-    index_name_breakdown = os.getenv("INDEX_NAME_BREAKDOWN", "copilot_usage_breakdown")
-    index_name_breakdown_chat = os.getenv(
-        "INDEX_NAME_BREAKDOWN_CHAT", "copilot_usage_breakdown_chat"
-    )
-    index_name_pr_reviews = os.getenv("INDEX_NAME_PR_REVIEWS", "copilot_pr_reviews")
-    index_name_dotcom_chat = os.getenv("INDEX_NAME_DOTCOM_CHAT", "copilot_dotcom_chat")
-    index_user_metrics = os.getenv("INDEX_USER_METRICS", "copilot_user_metrics")
-    index_user_adoption = os.getenv("INDEX_USER_ADOPTION", "copilot_user_adoption")
-
-
 logger = configure_logger(log_path=Paras.log_path)
 logger.info("-----------------Starting-----------------")
 
@@ -139,387 +60,179 @@ if not Paras.organization_slugs:
     exit(1)
 
 
-def github_api_request_handler(url, error_return_value=[]):
-    logger.info(f"Requesting URL: {url}")
-    headers = {
+# Shared pooled sessions: one for the GitHub API, one without credentials for report
+# downloads (do NOT send the Authorization header to Azure Blob Storage).
+# HTTP_TRANSPORT_MODE=record saves every response they receive, replay serves the
+# saved responses instead of calling GitHub
+github_pool_size = max(int(os.getenv("HTTP_POOL_SIZE", 10)), Paras.github_max_workers)
+github_client = HttpClient(
+    headers={
         "Accept": "application/vnd.github+json",
         "Authorization": f"Bearer {Paras.github_pat}",
         "X-GitHub-Api-Version": "2022-11-28",
-    }
-    
+    },
+    pool_size=github_pool_size,
+    adapter=transport_adapter(Paras.http_transport_mode, github_pool_size),
+)
+download_pool_size = max(int(os.getenv("HTTP_POOL_SIZE", 10)), Paras.download_workers)
+download_client = HttpClient(
+    headers={"Accept": "application/json"},
+    pool_size=download_pool_size,
+    adapter=transport_adapter(Paras.http_transport_mode, download_pool_size),
+)
+
+# Shared by all GitHub fetchers, paces requests against the rate limit budget.
+# Replayed responses are served as fast as they are asked for
+if Paras.http_transport_mode == "replay":
+    github_rate_limiter = RateLimitScheduler(requests_per_second=1e9, burst=10**9)
+else:
+    github_rate_limiter = RateLimitScheduler()
+
+# Conditional request (ETag) cache for GitHub API responses, HTTP_CACHE_MAX_MB=0 disables it.
+# Not used when recording or replaying, a 304 would leave nothing to record
+github_http_cache = (
+    HttpCache()
+    if int(os.getenv("HTTP_CACHE_MAX_MB", 256)) > 0 and not Paras.http_transport_mode
+    else None
+)
+
+# Debug snapshots of intermediate payloads, written by a background thread
+snapshots = get_snapshot_writer()
+
+# Content-addressed archive of raw metrics responses, only used when PAYLOAD_ARCHIVE=true
+payload_archive = PayloadArchive() if Paras.payload_archive else None
+
+# Ingest watermarks, only used in incremental mode
+watermark_store = WatermarkStore() if Paras.incremental_ingest else None
+
+
+def github_api_request(url, priority=PRIORITY_NORMAL):
+    """
+    GET a GitHub API url, returns a (data, links) tuple where links is the parsed
+    Link header ({rel: url}), data is None when the request failed
+    """
+    logger.info(f"Requesting URL: {url}")
+
     try:
-        response = requests.get(url, headers=headers)
-        logger.info(f"Response status code: {response.status_code}")
+        cached = github_http_cache.get(url) if github_http_cache else None
+        for attempt in range(Paras.github_max_retries + 1):
+            github_rate_limiter.acquire(priority)
+            response = github_client.get(
+                url, headers=HttpCache.conditional_headers(cached)
+            )
+            github_rate_limiter.update_from_headers(response.headers)
+            logger.info(f"Response status code: {response.status_code}")
+            if attempt == Paras.github_max_retries or not github_rate_limiter.is_rate_limited(response):
+                break
+            delay = github_rate_limiter.backoff(response, attempt)
+            logger.warning(
+                f"Rate limited (HTTP {response.status_code}) for URL: {url}, retrying in {delay:.1f}s "
+                f"(attempt {attempt + 1}/{Paras.github_max_retries})"
+            )
+
+        # 304 Not Modified does not count against the rate limit, replay the cached body
+        if response.status_code == 304 and cached:
+            github_http_cache.record_hit(True)
+            logger.info(f"Not modified, using cached response for: {url}")
+            return json.loads(cached["body"]), _parse_links(cached.get("link"))
         
         if response.status_code != 200:
             logger.error(f"HTTP {response.status_code} error for URL: {url}")
             logger.error(f"Response text: {response.text}")
-            return error_return_value
+            return None, {}
         
         data = response.json()
         logger.info(f"Successfully received data from: {url}")
         
         if isinstance(data, dict) and data.get("status", "200") != "200":
             logger.error(f"Request failed reason: {data}")
-            return error_return_value
-        return data
+            return None, {}
+
+        if github_http_cache:
+            github_http_cache.record_hit(False)
+            github_http_cache.put(url, response)
+        return data, _parse_links(response.headers.get("Link"))
         
     except requests.exceptions.RequestException as e:
         logger.error(f"Request exception for URL {url}: {e}")
-        return error_return_value
+        return None, {}
     except json.JSONDecodeError as e:
         logger.error(f"JSON decode error for URL {url}: {e}")
-        return error_return_value
-
-
-def dict_save_to_json_file(
-    data, file_name, logs_path=Paras.get_log_path(), save_to_json=True
-):
-    if not data:
-        logger.warning(f"No data to save for {file_name}")
-        return
-    if save_to_json:
-        if not os.path.exists(logs_path):
-            os.makedirs(logs_path)
-        with open(
-            f"{logs_path}/{file_name}_{Paras.date_str()}.json", "w", encoding="utf8"
-        ) as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        logger.info(f"Data saved to {logs_path}/{file_name}_{Paras.date_str()}.json")
-
-
-def generate_unique_hash(data, key_properties=[]):
-    key_elements = []
-    for key_property in key_properties:
-        value = data.get(key_property)
-        key_elements.append(str(value) if value is not None else "")
-    key_string = "-".join(key_elements)
-    unique_hash = hashlib.sha256(key_string.encode()).hexdigest()
-    return unique_hash
-
-
-def _compute_percentile(sorted_values, percentile):
-    if not sorted_values:
-        return 0.0
-    k = (len(sorted_values) - 1) * (percentile / 100)
-    lower = math.floor(k)
-    upper = math.ceil(k)
-    if lower == upper:
-        return float(sorted_values[int(k)])
-    lower_value = sorted_values[lower]
-    upper_value = sorted_values[upper]
-    weight_upper = k - lower
-    weight_lower = upper - k
-    return float(lower_value) * weight_lower + float(upper_value) * weight_upper
-
-
-def _robust_scale(value, lower, upper):
-    if upper <= lower:
-        return 1.0
-    return max(0.0, min(1.0, (value - lower) / (upper - lower)))
-
-
-def build_user_adoption_leaderboard(metrics_data, organization_slug, slug_type, top_n=10, user_team_lookup=None):
-    if not metrics_data:
-        return []
-
-    grouped = {}
-    report_start_days = set()
-    report_end_days = set()
-
-    for record in metrics_data:
-        login = record.get("user_login") or "unknown"
-        entry = grouped.setdefault(login, {
-            "events_logged": 0,
-            "volume": 0,
-            "code_generation": 0,
-            "code_acceptance": 0,
-            "loc_added": 0,
-            "loc_suggested": 0,
-            "agent_usage": 0,
-            "chat_usage": 0,
-            "days": set(),
-        })
-
-        entry["events_logged"] += 1
-        entry["volume"] += record.get("user_initiated_interaction_count", 0)
-        entry["code_generation"] += record.get("code_generation_activity_count", 0)
-        entry["code_acceptance"] += record.get("code_acceptance_activity_count", 0)
-        entry["loc_added"] += record.get("loc_added_sum", 0)
-        entry["loc_suggested"] += record.get("loc_suggested_to_add_sum", 0)
-        if record.get("used_agent"):
-            entry["agent_usage"] += 1
-        if record.get("used_chat"):
-            entry["chat_usage"] += 1
-        day_val = record.get("day")
-        if day_val:
-            entry["days"].add(day_val)
-
-        start_day = record.get("report_start_day")
-        if start_day:
-            report_start_days.add(start_day)
-        end_day = record.get("report_end_day")
-        if end_day:
-            report_end_days.add(end_day)
-
-    global_start_day = min(report_start_days) if report_start_days else None
-    global_end_day = max(report_end_days) if report_end_days else None
-
-    # Determine range days for Activity Score: prefer report window, fall back to 28
-    if global_start_day and global_end_day:
-        try:
-            start_dt = datetime.strptime(global_start_day, "%Y-%m-%d")
-            end_dt = datetime.strptime(global_end_day, "%Y-%m-%d")
-            range_days = max((end_dt - start_dt).days + 1, 1)
-        except ValueError:
-            range_days = 28
-    else:
-        range_days = 28
+        return None, {}
 
-    summaries = []
-    for login, stats in grouped.items():
-        active_days = len(stats["days"])
-        interaction_per_day = (
-            stats["volume"] / active_days if active_days else 0.0
-        )
-        accepted_per_active_day = (
-            stats["code_acceptance"] / active_days if active_days else 0.0
-        )
-        # Chat engagement rate: fraction of activity records where chat was used.
-        # user_initiated_interaction_count (volume) tracks all user-initiated prompts but
-        # equals interaction_per_day; use chat_usage / events_logged as a distinct signal.
-        chat_per_active_day = (
-            stats["chat_usage"] / stats["events_logged"] if stats["events_logged"] else 0.0
-        )
-        acceptance_rate = (
-            stats["code_acceptance"] / stats["code_generation"]
-            if stats["code_generation"]
-            else 0.0
-        )
-        average_loc_added = (
-            stats["loc_added"] / active_days if active_days else 0.0
-        )
-        # Reliance proxy: fraction of suggested lines the user accepted (0.0-1.0)
-        loc_acceptance_rate = (
-            stats["loc_added"] / stats["loc_suggested"]
-            if stats["loc_suggested"]
-            else 0.0
-        )
-        feature_breadth = stats["agent_usage"] + stats["chat_usage"]
 
-        # Stamp a day for Grafana time filtering: prefer global_end_day, fallback to current UTC day
-        stamped_day = (
-            global_end_day if global_end_day else datetime.utcnow().strftime("%Y-%m-%d")
-        )
+def _parse_links(link_header):
+    if not link_header:
+        return {}
+    return {
+        link["rel"]: link["url"]
+        for link in requests.utils.parse_header_links(link_header)
+        if "rel" in link and "url" in link
+    }
 
-        summary = {
-            "user_login": login,
-            "organization_slug": organization_slug,
-            "slug_type": slug_type,
-            "assignee_team_slug": (user_team_lookup or {}).get(login, "no-team"),
-            "events_logged": stats["events_logged"],
-            "volume": stats["volume"],
-            "code_generation_activity_count": stats["code_generation"],
-            "code_acceptance_activity_count": stats["code_acceptance"],
-            "loc_added_sum": stats["loc_added"],
-            "loc_suggested_to_add_sum": stats["loc_suggested"],
-            "average_loc_added": average_loc_added,
-            "accepted_per_active_day": accepted_per_active_day,
-            "chat_per_active_day": chat_per_active_day,
-            "loc_acceptance_rate": loc_acceptance_rate,
-            "interactions_per_day": interaction_per_day,
-            "acceptance_rate": acceptance_rate,
-            "feature_breadth": feature_breadth,
-            "agent_usage": stats["agent_usage"],
-            "chat_usage": stats["chat_usage"],
-            "active_days": active_days,
-            "report_start_day": global_start_day,
-            "report_end_day": global_end_day,
-            "day": stamped_day,
-            "bucket_type": "user",
-            "is_top10": False,
-            "rank": None,
-        }
 
-        summary["unique_hash"] = generate_unique_hash(
-            summary,
-            key_properties=[
-                "organization_slug",
-                "user_login",
-                "report_start_day",
-                "report_end_day",
-                "bucket_type",
-            ],
-        )
+def github_api_request_handler(url, error_return_value=[], priority=PRIORITY_NORMAL):
+    data, _ = github_api_request(url, priority=priority)
+    return error_return_value if data is None else data
 
-        summaries.append(summary)
 
-    if not summaries:
-        return []
+def _url_with_query(url, **params):
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    query.update({k: [str(v)] for k, v in params.items()})
+    return urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
 
-    signals = {
-        "volume": [entry["volume"] for entry in summaries],
-        "interactions_per_day": [entry["interactions_per_day"] for entry in summaries],
-        "acceptance_rate": [entry["acceptance_rate"] for entry in summaries],
-        "average_loc_added": [entry["average_loc_added"] for entry in summaries],
-        "feature_breadth": [entry["feature_breadth"] for entry in summaries],
-        "accepted_per_active_day": [entry["accepted_per_active_day"] for entry in summaries],
-        "chat_per_active_day": [entry["chat_per_active_day"] for entry in summaries],
-        "loc_acceptance_rate": [entry["loc_acceptance_rate"] for entry in summaries],
-    }
 
-    bounds = {}
-    for key, values in signals.items():
-        sorted_values = sorted(values)
-        lower = _compute_percentile(sorted_values, 5)
-        upper = _compute_percentile(sorted_values, 95)
-        bounds[key] = (lower, upper)
-
-    for entry in summaries:
-        norm_volume = _robust_scale(entry["volume"], *bounds["volume"])
-        norm_interactions = _robust_scale(
-            entry["interactions_per_day"], *bounds["interactions_per_day"]
-        )
-        norm_acceptance = _robust_scale(
-            entry["acceptance_rate"], *bounds["acceptance_rate"]
-        )
-        norm_loc_added = _robust_scale(
-            entry["average_loc_added"], *bounds["average_loc_added"]
-        )
-        norm_feature = _robust_scale(
-            entry["feature_breadth"], *bounds["feature_breadth"]
-        )
-
-        base_score = (
-            0.2 * norm_volume
-            + 0.2 * norm_interactions
-            + 0.2 * norm_acceptance
-            + 0.2 * norm_loc_added
-            + 0.2 * norm_feature
-        )
-        entry["_base_score"] = base_score
-
-        # A) Activity Score (0-100): active days + suggestions accepted/day + chat prompts/day
-        active_days_component = min(entry["active_days"] / range_days, 1.0)
-        accepted_component = _robust_scale(
-            entry["accepted_per_active_day"], *bounds["accepted_per_active_day"]
-        )
-        chat_component = _robust_scale(
-            entry["chat_per_active_day"], *bounds["chat_per_active_day"]
-        )
-        activity_score_pct = round(
-            (0.4 * active_days_component + 0.35 * accepted_component + 0.25 * chat_component) * 100,
-            1,
-        )
-        entry["activity_score_pct"] = activity_score_pct
-
-        # B) Reliance Score proxy (0-100): fraction of Copilot-suggested lines accepted
-        # Note: True reliance = Copilot lines accepted / total lines added (git data not available).
-        # Proxy uses loc_added / loc_suggested (line acceptance rate of Copilot suggestions).
-        reliance_score_pct = round(
-            _robust_scale(entry["loc_acceptance_rate"], *bounds["loc_acceptance_rate"]) * 100,
-            1,
-        )
-        entry["reliance_score_pct"] = reliance_score_pct
-
-    max_active_days = max(entry["active_days"] for entry in summaries)
-    for entry in summaries:
-        bonus = 0.1 * (entry["active_days"] / max_active_days) if max_active_days else 0.0
-        bonus = min(bonus, 0.1)
-        entry["consistency_bonus"] = bonus
-        entry["adoption_score"] = entry["_base_score"] * (1 + bonus)
-
-    max_score = max(entry["adoption_score"] for entry in summaries)
-    for entry in summaries:
-        entry["adoption_pct"] = (
-            round(entry["adoption_score"] / max_score * 100, 1)
-            if max_score
-            else 0.0
-        )
+def github_paginate(url, items_key=None, per_page=100, priority=PRIORITY_NORMAL):
+    """
+    Generator over the pages of a paginated GitHub endpoint, in page order.
+    Each page is the list of items (data[items_key] when items_key is set).
+    When the first response has a Link rel="last", the remaining pages are known
+    and fetched concurrently with GITHUB_MAX_WORKERS, otherwise rel="next" is followed.
+    """
+    data, links = github_api_request(
+        _url_with_query(url, per_page=per_page), priority=priority
+    )
+    if data is None:
+        return
+    yield data.get(items_key, []) if items_key else data
+
+    if "last" in links:
+        last_page = int(parse_qs(urlparse(links["last"]).query).get("page", ["1"])[0])
+        page_urls = [
+            _url_with_query(links["last"], page=page) for page in range(2, last_page + 1)
+        ]
+        if not page_urls:
+            return
+        workers = max(1, min(Paras.github_max_workers, len(page_urls)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for page_url, (data, _) in zip(
+                page_urls,
+                executor.map(
+                    run_stats.bind(lambda u: github_api_request(u, priority=priority)),
+                    page_urls,
+                ),
+            ):
+                if data is None:
+                    logger.error(f"Skipping failed page: {page_url}")
+                    continue
+                yield data.get(items_key, []) if items_key else data
+        return
 
-    summaries.sort(key=lambda e: e["adoption_pct"], reverse=True)
-    leaderboard = summaries[:top_n]
-    for rank, entry in enumerate(leaderboard, start=1):
-        entry["rank"] = rank
-        entry["is_top10"] = True
-
-    entries = []
-    for entry in leaderboard:
-        entry["bucket_type"] = "user"
-        entries.append(entry)
-
-    others = summaries[top_n:]
-    if others:
-        others_count = len(others)
-        # Stamp a day for Grafana time filtering: prefer global_end_day, fallback to current UTC day
-        stamped_day = (
-            global_end_day if global_end_day else datetime.utcnow().strftime("%Y-%m-%d")
-        )
+    next_url = links.get("next")
+    while next_url:
+        data, links = github_api_request(next_url, priority=priority)
+        if data is None:
+            return
+        yield data.get(items_key, []) if items_key else data
+        next_url = links.get("next")
 
-        others_entry = {
-            "user_login": "Others",
-            "organization_slug": organization_slug,
-            "slug_type": slug_type,
-            "assignee_team_slug": "no-team",
-            "events_logged": sum(o["events_logged"] for o in others),
-            "volume": sum(o["volume"] for o in others),
-            "code_generation_activity_count": sum(
-                o["code_generation_activity_count"] for o in others
-            ),
-            "code_acceptance_activity_count": sum(
-                o["code_acceptance_activity_count"] for o in others
-            ),
-            "loc_added_sum": sum(o["loc_added_sum"] for o in others),
-            "loc_suggested_to_add_sum": sum(
-                o["loc_suggested_to_add_sum"] for o in others
-            ),
-            "average_loc_added": sum(o["average_loc_added"] for o in others) / others_count,
-            "accepted_per_active_day": sum(o["accepted_per_active_day"] for o in others) / others_count,
-            "chat_per_active_day": sum(o["chat_per_active_day"] for o in others) / others_count,
-            "loc_acceptance_rate": sum(o["loc_acceptance_rate"] for o in others) / others_count,
-            "interactions_per_day": sum(
-                o["interactions_per_day"] for o in others
-            )
-            / others_count,
-            "acceptance_rate": sum(o["acceptance_rate"] for o in others) / others_count,
-            "feature_breadth": sum(o["feature_breadth"] for o in others) / others_count,
-            "agent_usage": sum(o["agent_usage"] for o in others),
-            "chat_usage": sum(o["chat_usage"] for o in others),
-            "active_days": sum(o["active_days"] for o in others),
-            "activity_score_pct": round(sum(o["activity_score_pct"] for o in others) / others_count, 1),
-            "reliance_score_pct": round(sum(o["reliance_score_pct"] for o in others) / others_count, 1),
-            "report_start_day": global_start_day,
-            "report_end_day": global_end_day,
-            "day": stamped_day,
-            "bucket_type": "others",
-            "is_top10": False,
-            "rank": None,
-            "others_count": others_count,
-            "consistency_bonus": 0.0,
-        }
 
-        others_entry["adoption_score"] = (
-            sum(o["adoption_score"] for o in others) / others_count
-        )
-        score_scale = max_score if max_score else 1
-        others_entry["adoption_pct"] = round(
-            others_entry["adoption_score"] / score_scale * 100, 1
-        )
-        others_entry["unique_hash"] = generate_unique_hash(
-            others_entry,
-            key_properties=[
-                "organization_slug",
-                "user_login",
-                "report_start_day",
-                "report_end_day",
-                "bucket_type",
-            ],
-        )
-        entries.append(others_entry)
+def save_snapshot(stage, data, file_name, save_to_json=True, sample_key=None):
+    """Queue a debug snapshot of data, written in the background (see snapshot_writer)"""
+    if save_to_json:
+        snapshots.save(stage, file_name, data, sample_key=sample_key)
 
-    for entry in entries:
-        entry.pop("_base_score", None)
-    return entries
 
 def assign_position_in_tree(nodes):
     # Create a dictionary with node id as key and node data as value
@@ -619,7 +332,8 @@ class GitHubEnterpriseManager:
         logger.info(
             f"Fetching all organizations for enterprise: {self.enterprise_slug}"
         )
-        response = requests.post(self.url, json={"query": query}, headers=self.headers)
+        github_rate_limiter.acquire(PRIORITY_HIGH)
+        response = github_client.post(self.url, json={"query": query})
 
         # Check response status code
         if response.status_code == 200:
@@ -635,7 +349,8 @@ class GitHubEnterpriseManager:
                 .get("nodes", [])
             )
 
-            dict_save_to_json_file(
+            save_snapshot(
+                "organizations",
                 all_orgs,
                 f"{self.enterprise_slug}_all_organizations",
                 save_to_json=save_to_json,
@@ -650,10 +365,15 @@ class GitHubEnterpriseManager:
 
 class GitHubOrganizationManager:
 
-    def __init__(self, organization_slug, save_to_json=True, is_standalone=False):
+    def __init__(self, organization_slug, save_to_json=True, is_standalone=False, archive_run=None):
         self.slug_type = "Standalone" if is_standalone else "Organization"
         self.api_type = "enterprises" if is_standalone else "orgs"
         self.organization_slug = organization_slug
+        # Raw metrics responses are archived to this run's manifest (see payload_archive)
+        self.archive_run = archive_run
+        # Report download links of the last iter_copilot_user_metrics() that failed to
+        # download or parse; their days are missing from the records it yielded
+        self.failed_report_links = 0
         self.teams = self._fetch_all_teams(save_to_json=save_to_json)
         self.utc_offset = get_utc_offset()
         logger.info(
@@ -719,28 +439,87 @@ class GitHubOrganizationManager:
         logger.info(
             f"Fetching Copilot usages for {self.slug_type}: {self.organization_slug}, team: {team_slug}"
         )
-        for _team_slug, position_in_tree_and_url in urls.items():
+
+        def fetch_team_usage(_team_slug, position_in_tree_and_url):
             position_in_tree, url = position_in_tree_and_url
-            data = github_api_request_handler(url, error_return_value={})
-            dict_save_to_json_file(
-                data,
-                f"{self.organization_slug}_{_team_slug}_copilot_metrics",
-                save_to_json=save_to_json,
+            started_at = time.perf_counter()
+            data = github_api_request_handler(
+                url, error_return_value=None, priority=PRIORITY_LOW
             )
+            latency = time.perf_counter() - started_at
+            failed = data is None
+            if failed:
+                data = {}
+            if self.archive_run:
+                # The archive replaces the "metrics" snapshot: it keeps each distinct
+                # raw response once, the snapshot would write all of them every cycle
+                if not failed:
+                    self.archive_run.record(
+                        f"team_{usage_or_metrics}",
+                        data,
+                        team_slug=_team_slug,
+                        position_in_tree=position_in_tree,
+                        url=url,
+                    )
+            else:
+                save_snapshot(
+                    "metrics",
+                    data,
+                    f"{self.organization_slug}_{_team_slug}_copilot_metrics",
+                    save_to_json=save_to_json,
+                    sample_key=_team_slug,
+                )
             data = convert_metrics_to_usage(data)
-            dict_save_to_json_file(
+            save_snapshot(
+                "usage",
                 data,
                 f"{self.organization_slug}_{_team_slug}_copilot_usage",
                 save_to_json=save_to_json,
+                sample_key=_team_slug,
             )
-            datas[_team_slug] = {
-                "position_in_tree": position_in_tree,
-                "copilot_usage_data": data,
-            }
             logger.info(f"Fetched Copilot usage for team: {_team_slug}")
+            return (
+                _team_slug,
+                {
+                    "position_in_tree": position_in_tree,
+                    "copilot_usage_data": data,
+                },
+                latency,
+                failed,
+            )
+
+        # Results are collected in the order of urls, so the output does not depend on
+        # which request finishes first
+        workers = max(1, min(Paras.github_max_workers, len(urls)))
+        started_at = time.perf_counter()
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(
+                    executor.map(run_stats.bind(fetch_team_usage), urls.keys(), urls.values())
+                )
+        else:
+            results = [fetch_team_usage(k, v) for k, v in urls.items()]
+        elapsed = time.perf_counter() - started_at
+
+        latencies = sorted(result[2] for result in results)
+        error_count = sum(1 for result in results if result[3])
+        for _team_slug, team_data, _, _ in results:
+            datas[_team_slug] = team_data
+
+        if latencies:
+            logger.info(
+                f"Fetched {len(latencies)} Copilot {usage_or_metrics} requests for {self.slug_type}: {self.organization_slug} "
+                f"with {workers} worker(s) in {elapsed:.2f}s, "
+                f"throughput: {len(latencies) / elapsed if elapsed else 0.0:.2f} req/s, "
+                f"latency avg: {sum(latencies) / len(latencies):.3f}s, "
+                f"p95: {latencies[int((len(latencies) - 1) * 0.95)]:.3f}s, "
+                f"max: {latencies[-1]:.3f}s, errors: {error_count}, "
+                f"rate limit: {github_rate_limiter.status()}"
+            )
 
         if team_slug == "all":
-            dict_save_to_json_file(
+            save_snapshot(
+                "usage",
                 datas,
                 f"{self.organization_slug}_all_teams_copilot_usage",
                 save_to_json=save_to_json,
@@ -807,7 +586,8 @@ class GitHubOrganizationManager:
             data, key_properties=["organization_slug", "day"]
         )
 
-        dict_save_to_json_file(
+        save_snapshot(
+            "seats",
             data,
             f"{self.organization_slug}_seat_info_settings",
             save_to_json=save_to_json,
@@ -820,7 +600,9 @@ class GitHubOrganizationManager:
     def get_seat_info_settings(self, save_to_json=True):
         # only for organization
         url = f"https://api.github.com/{self.api_type}/{self.organization_slug}/copilot/billing"
-        data = github_api_request_handler(url, error_return_value={})
+        data = github_api_request_handler(
+            url, error_return_value={}, priority=PRIORITY_HIGH
+        )
         if not data:
             return data
         # sample
@@ -868,7 +650,8 @@ class GitHubOrganizationManager:
             data, key_properties=["organization_slug", "day"]
         )
 
-        dict_save_to_json_file(
+        save_snapshot(
+            "seats",
             data,
             f"{self.organization_slug}_seat_info_settings",
             save_to_json=save_to_json,
@@ -881,15 +664,8 @@ class GitHubOrganizationManager:
     def get_seat_assignments(self, save_to_json=True):
         url = f"https://api.github.com/{self.api_type}/{self.organization_slug}/copilot/billing/seats"
         datas = []
-        page = 1
-        per_page = 50
-        while True:
-            paginated_url = f"{url}?page={page}&per_page={per_page}"
-            data = github_api_request_handler(paginated_url, error_return_value={})
-            seats = data.get("seats", [])
+        for seats in github_paginate(url, items_key="seats"):
             logger.info(f"Current page seats count: {len(seats)}")
-            if not seats:
-                break
             for seat in seats:
                 if not seat.get("assignee"):
                     continue
@@ -945,9 +721,9 @@ class GitHubOrganizationManager:
                     seat["is_active_today"] = 0
                 seat["days_since_last_activity"] = days_since_last_activity
                 datas.append(seat)
-            page += 1
 
-        dict_save_to_json_file(
+        save_snapshot(
+            "seats",
             datas,
             f"{self.organization_slug}_seat_assignments",
             save_to_json=save_to_json,
@@ -962,30 +738,14 @@ class GitHubOrganizationManager:
 
         url = f"https://api.github.com/{self.api_type}/{self.organization_slug}/teams"
         teams = []
-        page = 1
-        per_page = 50
-        while True:
-            paginated_url = f"{url}?page={page}&per_page={per_page}"
-            page_teams = github_api_request_handler(
-                paginated_url, error_return_value=[]
-            )
+        for page_teams in github_paginate(url):
             logger.info(f"Current page teams count: {len(page_teams)}")
-            # if credential is expired, the return value is:
-            # {'message': 'Bad credentials', 'documentation_url': 'https://docs.github.com/rest', 'status': '401'}
-            if isinstance(page_teams, dict) and page_teams.get("status") == "401":
-                logger.error(
-                    f"Bad credentials for {self.slug_type}: {self.organization_slug}"
-                )
-                return []
-            if not page_teams:
-                break
             teams.extend(page_teams)
-            page += 1
 
         teams = self._add_fullpath_slug(teams)
         teams = assign_position_in_tree(teams)
-        dict_save_to_json_file(
-            teams, f"{self.organization_slug}_all_teams", save_to_json=save_to_json
+        save_snapshot(
+            "teams", teams, f"{self.organization_slug}_all_teams", save_to_json=save_to_json
         )
         logger.info(
             f"Fetching all teams for {self.slug_type}: {self.organization_slug}"
@@ -1002,54 +762,39 @@ class GitHubOrganizationManager:
         # If a local metrics file is provided (for troubleshooting/demo), use it directly
         local_path = os.getenv("LOCAL_USER_METRICS_FILE")
         if local_path and os.path.exists(local_path):
-            logger.info(f"Using LOCAL_USER_METRICS_FILE instead of download links: {local_path}")
-            records = []
-            try:
-                with open(local_path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        try:
-                            rec = json.loads(line)
-                        except json.JSONDecodeError as e:
-                            logger.error(f"Failed to parse line as JSON, skipping. Error: {e}")
-                            continue
-
-                        rec["organization_slug"] = self.organization_slug
-                        rec["slug_type"] = self.slug_type
-                        rec["last_updated_at"] = current_time()
-                        rec["utc_offset"] = self.utc_offset
-
-                        hash_properties = ["organization_slug", "user_login", "day"]
-                        if "user_login" in rec and "day" in rec:
-                            rec["unique_hash"] = generate_unique_hash(rec, hash_properties)
-                        else:
-                            fallback_properties = [
-                                "organization_slug",
-                                "last_updated_at",
-                            ]
-                            rec["unique_hash"] = generate_unique_hash(
-                                rec, fallback_properties
-                            )
-
-                        records.append(rec)
-                logger.info(
-                    f"Loaded {len(records)} user metrics records from LOCAL_USER_METRICS_FILE"
-                )
-            except Exception as e:
-                logger.error(
-                    f"Error reading LOCAL_USER_METRICS_FILE {local_path}: {e}"
-                )
-                records = []
-
-            dict_save_to_json_file(
+            records = list(self._iter_local_user_metrics(local_path))
+            save_snapshot(
+                "user_metrics",
                 records,
                 f"{self.organization_slug}_copilot_user_metrics_local",
                 save_to_json=save_to_json,
             )
             return records
 
+        processed_data = list(self.iter_copilot_user_metrics())
+
+        # Save to JSON file for debugging/inspection
+        save_snapshot(
+            "user_metrics",
+            processed_data,
+            f"{self.organization_slug}_copilot_user_metrics",
+            save_to_json=save_to_json
+        )
+        
+        logger.info(f"Processed {len(processed_data)} total user metrics records for {self.slug_type}: {self.organization_slug}")
+        return processed_data
+
+    def iter_copilot_user_metrics(self):
+        """
+        Streaming variant of get_copilot_user_metrics: yields enriched user metrics records
+        one at a time while the report downloads are parsed, without holding them in memory
+        """
+        self.failed_report_links = 0
+        local_path = os.getenv("LOCAL_USER_METRICS_FILE")
+        if local_path and os.path.exists(local_path):
+            yield from self._iter_local_user_metrics(local_path)
+            return
+
         url = f"https://api.github.com/{self.api_type}/{self.organization_slug}/copilot/metrics/reports/users-28-day/latest"
         
         logger.info(f"Fetching user metrics download links from: {url}")
@@ -1057,152 +802,202 @@ class GitHubOrganizationManager:
         
         if not api_response or 'download_links' not in api_response:
             logger.warning("No download links received from user metrics API")
-            return []
+            return
         
         download_links = api_response.get('download_links', [])
         logger.info(f"Found {len(download_links)} download links for user metrics")
         
-        processed_data = []
         current_time_str = current_time()
         
-        # Process each download link to get the actual user metrics data
-        for i, download_link in enumerate(download_links, 1):
+        # Process each download link to get the actual user metrics data, in link order
+        for i, chunks in self._iter_report_downloads(download_links):
             try:
-                logger.info(f"Downloading user metrics data from link {i}/{len(download_links)}")
+                # NDJSON is parsed line by line, gzip content is decompressed on the fly
+                record_count = 0
+                for user_data in iter_ndjson_records(chunks):
+                    if isinstance(user_data, dict):
+                        record_count += 1
+                        yield self._enrich_user_metrics_record(
+                            user_data, current_time_str, i
+                        )
+
+                if not record_count:
+                    logger.warning(f"No data received from download link {i}")
+                    continue
+                logger.info(f"Processed {record_count} user records from download link {i}")
                 
-                # Download JSON data from the link with better error handling
+            except ReportParseError as parse_error:
+                # The readable records were yielded, the rest of the report is missing
+                logger.error(
+                    f"Download link {i} is incomplete after {record_count} user records: {parse_error}"
+                )
+                self.failed_report_links += 1
+                continue
+            except requests.exceptions.RequestException as req_error:
+                logger.error(f"Request error for download link {i}: {req_error}")
+                self.failed_report_links += 1
+                continue
+            except Exception as e:
+                logger.error(f"Error processing download link {i}: {str(e)}")
+                self.failed_report_links += 1
+                continue
+
+    def _iter_report_downloads(self, download_links):
+        """
+        Yield (download_link_index, chunks) for each report download link, in link order,
+        chunks being an iterable over the response body bytes.
+        With USER_METRICS_DOWNLOAD_WORKERS > 1 the following links are downloaded
+        concurrently while the current one is parsed. At most that many downloads are in
+        flight, each spooled to a temporary file that keeps at most
+        USER_METRICS_DOWNLOAD_MEMORY_MB / workers in memory before spilling to disk.
+        """
+        workers = max(1, min(Paras.download_workers, len(download_links)))
+        if workers == 1:
+            for i, download_link in enumerate(download_links, 1):
+                logger.info(f"Downloading user metrics data from link {i}/{len(download_links)}")
                 try:
-                    logger.info(f"Requesting download link: {download_link}")
                     # Do NOT send Authorization header to Azure Blob Storage
-                    headers = {
-                        "Accept": "application/json"
-                    }
-                    response = requests.get(download_link, headers=headers)
-                    
-                    logger.info(f"Download link {i} response status: {response.status_code}")
-                    logger.info(f"Download link {i} response headers: {dict(response.headers)}")
-                    logger.info(f"Download link {i} response content length: {len(response.content)}")
-                    
-                    if response.status_code != 200:
-                        logger.error(f"Download link {i} failed with status {response.status_code}: {response.text}")
-                        continue
-                    
-                    if not response.content:
-                        logger.warning(f"Download link {i} returned empty content")
-                        continue
-                    
-                    # Try to parse as JSON (handle NDJSON line-by-line)
-                    try:
-                        user_metrics_response = response.json()
-                    except json.JSONDecodeError as json_error:
-                        # Likely NDJSON (newline-delimited JSON), parse line-by-line
-                        logger.info(f"Download link {i} appears to be NDJSON, parsing line-by-line")
-                        user_metrics_response = []
-                        for line in response.text.splitlines():
-                            line = line.strip()
-                            if not line:
-                                continue
-                            try:
-                                user_metrics_response.append(json.loads(line))
-                            except json.JSONDecodeError as line_error:
-                                logger.error(f"Failed to parse NDJSON line: {line_error}")
-                                continue
-                        if not user_metrics_response:
-                            logger.error(f"Download link {i} returned non-parseable content. Original error: {json_error}")
-                            logger.error(f"Response content preview (first 500 chars): {response.text[:500]}")
+                    with download_client.get(download_link, stream=True) as response:
+                        if not self._check_download_response(i, response):
+                            self.failed_report_links += 1
                             continue
-                    
+                        yield i, response.iter_content(chunk_size=Paras.download_chunk_size)
                 except requests.exceptions.RequestException as req_error:
                     logger.error(f"Request error for download link {i}: {req_error}")
-                    continue
-                
-                if not user_metrics_response:
-                    logger.warning(f"No data received from download link {i}")
-                    continue
-                
-                logger.info(f"Download link {i} response type: {type(user_metrics_response)}")
-                
-                # Handle different response types and format JSON properly
-                if isinstance(user_metrics_response, list):
-                    # If it's already an array, use it directly
-                    user_metrics_data = user_metrics_response
-                    logger.info(f"Download link {i} returned array with {len(user_metrics_data)} items")
-                elif isinstance(user_metrics_response, dict):
-                    # If it's a dict, wrap it in an array
-                    user_metrics_data = [user_metrics_response]
-                    logger.info(f"Download link {i} returned single object, wrapped in array")
+                    self.failed_report_links += 1
+            return
+
+        spool_max_bytes = Paras.download_memory_budget // workers
+        links = enumerate(download_links, 1)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+
+            def submit_next():
+                for i, download_link in links:
+                    logger.info(f"Downloading user metrics data from link {i}/{len(download_links)}")
+                    pending.append(
+                        (
+                            i,
+                            executor.submit(
+                                run_stats.bind(self._download_to_spool),
+                                i,
+                                download_link,
+                                spool_max_bytes,
+                            ),
+                        )
+                    )
+                    return
+
+            for _ in range(workers):
+                submit_next()
+            while pending:
+                i, future = pending.popleft()
+                try:
+                    spool = future.result()
+                except requests.exceptions.RequestException as req_error:
+                    logger.error(f"Request error for download link {i}: {req_error}")
+                    spool = None
+                except Exception as e:
+                    logger.error(f"Error downloading link {i}: {str(e)}")
+                    spool = None
+                if spool is None:
+                    # Failed requests and non-200 responses alike
+                    self.failed_report_links += 1
                 else:
-                    # If it's neither dict nor list, try to format it
-                    logger.warning(f"Download link {i} returned unexpected type: {type(user_metrics_response)}")
-                    try:
-                        # Try to convert to string and parse again
-                        response_str = str(user_metrics_response)
-                        logger.info(f"Attempting to format response as JSON: {response_str[:200]}...")
-                        
-                        # If it looks like it might be JSON data, try to format it
-                        if response_str.strip().startswith('{') or response_str.strip().startswith('['):
-                            formatted_data = json.loads(response_str)
-                            if isinstance(formatted_data, list):
-                                user_metrics_data = formatted_data
-                            elif isinstance(formatted_data, dict):
-                                user_metrics_data = [formatted_data]
-                            else:
-                                logger.error(f"Formatted data is neither dict nor list: {type(formatted_data)}")
-                                continue
-                        else:
-                            logger.error(f"Response does not appear to be JSON format")
-                            continue
-                    except Exception as format_error:
-                        logger.error(f"Failed to format response from download link {i}: {format_error}")
-                        continue
-                
-                # Process each user metrics record
-                for user_data in user_metrics_data:
-                    if isinstance(user_data, dict):
-                        # Calculate top values from nested data
-                        top_values = calculate_top_values(user_data)
-                        
-                        # Add organizational context and metadata
-                        enriched_user_data = {
-                            **user_data,
-                            **top_values,  # Add calculated top values
-                            'organization_slug': self.organization_slug,
-                            'slug_type': self.slug_type,
-                            'last_updated_at': current_time_str,
-                            'utc_offset': self.utc_offset,
-                            'download_link_index': i
-                        }
-                        
-                        # Generate unique hash for deduplication (user + day combination)
-                        hash_properties = ['organization_slug', 'user_login', 'day']
-                        if 'user_login' in enriched_user_data and 'day' in enriched_user_data:
-                            enriched_user_data['unique_hash'] = generate_unique_hash(
-                                enriched_user_data, hash_properties
-                            )
-                        else:
-                            # Fallback hash if expected fields are missing
-                            fallback_properties = ['organization_slug', 'last_updated_at', 'download_link_index']
-                            enriched_user_data['unique_hash'] = generate_unique_hash(
-                                enriched_user_data, fallback_properties
-                            )
-                        
-                        processed_data.append(enriched_user_data)
-                
-                logger.info(f"Processed {len(user_metrics_data)} user records from download link {i}")
-                
-            except Exception as e:
-                logger.error(f"Error processing download link {i}: {str(e)}")
-                continue
+                    with spool:
+                        yield i, iter(lambda: spool.read(Paras.download_chunk_size), b"")
+                submit_next()
+
+    def _download_to_spool(self, i, download_link, spool_max_bytes):
+        # Do NOT send Authorization header to Azure Blob Storage
+        with download_client.get(download_link, stream=True) as response:
+            if not self._check_download_response(i, response):
+                return None
+            spool = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes)
+            for chunk in response.iter_content(chunk_size=Paras.download_chunk_size):
+                spool.write(chunk)
+        spool.seek(0)
+        logger.info(f"Downloaded link {i}")
+        return spool
+
+    def _check_download_response(self, i, response):
+        logger.info(f"Download link {i} response status: {response.status_code}")
+        logger.info(f"Download link {i} response headers: {dict(response.headers)}")
+        if response.status_code != 200:
+            logger.error(f"Download link {i} failed with status {response.status_code}: {response.text}")
+            return False
+        return True
+
+    def _enrich_user_metrics_record(self, user_data, current_time_str, download_link_index):
+        # Calculate top values from nested data
+        top_values = calculate_top_values(user_data)
         
-        # Save to JSON file for debugging/inspection
-        dict_save_to_json_file(
-            processed_data,
-            f"{self.organization_slug}_copilot_user_metrics",
-            save_to_json=save_to_json
-        )
+        # Add organizational context and metadata
+        enriched_user_data = {
+            **user_data,
+            **top_values,  # Add calculated top values
+            'organization_slug': self.organization_slug,
+            'slug_type': self.slug_type,
+            'last_updated_at': current_time_str,
+            'utc_offset': self.utc_offset,
+            'download_link_index': download_link_index
+        }
         
-        logger.info(f"Processed {len(processed_data)} total user metrics records for {self.slug_type}: {self.organization_slug}")
-        return processed_data
+        # Generate unique hash for deduplication (user + day combination)
+        hash_properties = ['organization_slug', 'user_login', 'day']
+        if 'user_login' in enriched_user_data and 'day' in enriched_user_data:
+            enriched_user_data['unique_hash'] = generate_unique_hash(
+                enriched_user_data, hash_properties
+            )
+        else:
+            # Fallback hash if expected fields are missing
+            fallback_properties = ['organization_slug', 'last_updated_at', 'download_link_index']
+            enriched_user_data['unique_hash'] = generate_unique_hash(
+                enriched_user_data, fallback_properties
+            )
+        return enriched_user_data
+
+    def _iter_local_user_metrics(self, local_path):
+        logger.info(f"Using LOCAL_USER_METRICS_FILE instead of download links: {local_path}")
+        record_count = 0
+        try:
+            with open(local_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        logger.error(f"Failed to parse line as JSON, skipping. Error: {e}")
+                        continue
+
+                    rec["organization_slug"] = self.organization_slug
+                    rec["slug_type"] = self.slug_type
+                    rec["last_updated_at"] = current_time()
+                    rec["utc_offset"] = self.utc_offset
+
+                    hash_properties = ["organization_slug", "user_login", "day"]
+                    if "user_login" in rec and "day" in rec:
+                        rec["unique_hash"] = generate_unique_hash(rec, hash_properties)
+                    else:
+                        fallback_properties = [
+                            "organization_slug",
+                            "last_updated_at",
+                        ]
+                        rec["unique_hash"] = generate_unique_hash(
+                            rec, fallback_properties
+                        )
+
+                    record_count += 1
+                    yield rec
+            logger.info(
+                f"Loaded {record_count} user metrics records from LOCAL_USER_METRICS_FILE"
+            )
+        except Exception as e:
+            logger.error(
+                f"Error reading LOCAL_USER_METRICS_FILE {local_path}: {e}"
+            )
 
     def _add_fullpath_slug(self, teams):
         id_to_team = {team["id"]: team for team in teams}
@@ -1222,268 +1017,9 @@ class GitHubOrganizationManager:
         return teams
 
 
-class DataSplitter:
-    def __init__(self, data, additional_properties={}):
-        self.data = data
-        self.additional_properties = additional_properties
-        self.correction_for_0 = 0
-
-    def get_total_list(self):
-        total_list = []
-        logger.info("Generating total list from data")
-        for entry in self.data:
-            total_data = entry.copy()
-            total_data.pop("breakdown", None)
-            total_data.pop("breakdown_chat", None)
-            total_data.pop("pr_reviews", None)
-            total_data.pop("dotcom_chat", None)
-            total_data = total_data | self.additional_properties
-            total_data["unique_hash"] = generate_unique_hash(
-                total_data, key_properties=["organization_slug", "team_slug", "day"]
-            )
-
-            # If the denominator value is 0, it is corrected to a uniform value
-            total_data["total_suggestions_count"] = (
-                self.correction_for_0
-                if total_data["total_suggestions_count"] == 0
-                else total_data["total_suggestions_count"]
-            )
-            total_data["total_lines_suggested"] = (
-                self.correction_for_0
-                if total_data["total_lines_suggested"] == 0
-                else total_data["total_lines_suggested"]
-            )
-            total_data["total_chat_turns"] = (
-                self.correction_for_0
-                if total_data["total_chat_turns"] == 0
-                else total_data["total_chat_turns"]
-            )
-
-            total_list.append(total_data)
-        return total_list
-
-    def get_breakdown_list(self):
-        breakdown_list = []
-        logger.info("Generating breakdown list from data")
-        for entry in self.data:
-            day = entry.get("day")
-            for breakdown_entry in entry.get("breakdown", []):
-                breakdown_entry_with_day = breakdown_entry.copy()
-                breakdown_entry_with_day["day"] = day
-                breakdown_entry_with_day = (
-                    breakdown_entry_with_day | self.additional_properties
-                )
-
-                # # Normalize editor and language values to lowercase
-                # breakdown_entry_with_day['editor'] = breakdown_entry_with_day.get('editor', '').lower()
-                # breakdown_entry_with_day['language'] = breakdown_entry_with_day.get('language', '').lower()
-
-                # # Unify `json` and `json with comments` to `json`
-                # if breakdown_entry_with_day['language'] == 'json with comments':
-                #     breakdown_entry_with_day['language'] = 'json'
-
-                breakdown_entry_with_day["unique_hash"] = generate_unique_hash(
-                    breakdown_entry_with_day,
-                    key_properties=[
-                        "organization_slug",
-                        "team_slug",
-                        "day",
-                        "language",
-                        "editor",
-                        "model",
-                    ],
-                )
-
-                # If the denominator value is 0, it is corrected to a uniform value
-                breakdown_entry_with_day["suggestions_count"] = (
-                    self.correction_for_0
-                    if breakdown_entry_with_day["suggestions_count"] == 0
-                    else breakdown_entry_with_day["suggestions_count"]
-                )
-                breakdown_entry_with_day["lines_suggested"] = (
-                    self.correction_for_0
-                    if breakdown_entry_with_day["lines_suggested"] == 0
-                    else breakdown_entry_with_day["lines_suggested"]
-                )
-
-                breakdown_list.append(breakdown_entry_with_day)
-        return breakdown_list
-
-    def get_breakdown_chat_list(self):
-        breakdown_chat_list = []
-        logger.info("Generating breakdown chat list from data")
-        for entry in self.data:
-            day = entry.get("day")
-            for breakdown_chat_entry in entry.get("breakdown_chat", []):
-                breakdown_chat_entry_with_day = breakdown_chat_entry.copy()
-                breakdown_chat_entry_with_day["day"] = day
-                breakdown_chat_entry_with_day = (
-                    breakdown_chat_entry_with_day | self.additional_properties
-                )
-
-                breakdown_chat_entry_with_day["unique_hash"] = generate_unique_hash(
-                    breakdown_chat_entry_with_day,
-                    key_properties=[
-                        "organization_slug",
-                        "team_slug",
-                        "day",
-                        "editor",
-                        "model",
-                    ],
-                )
-
-                # If the denominator value is 0, it is corrected to a uniform value
-                breakdown_chat_entry_with_day["chat_turns"] = (
-                    self.correction_for_0
-                    if breakdown_chat_entry_with_day["chat_turns"] == 0
-                    else breakdown_chat_entry_with_day["chat_turns"]
-                )
-
-                breakdown_chat_list.append(breakdown_chat_entry_with_day)
-        return breakdown_chat_list
-
-    def get_pr_reviews_list(self):
-        pr_reviews_list = []
-        logger.info("Generating PR reviews list from data")
-        for entry in self.data:
-            day = entry.get("day")
-            for pr_entry in entry.get("pr_reviews", []):
-                pr_entry_with_day = pr_entry.copy()
-                pr_entry_with_day["day"] = day
-                pr_entry_with_day = pr_entry_with_day | self.additional_properties
-
-                pr_entry_with_day["unique_hash"] = generate_unique_hash(
-                    pr_entry_with_day,
-                    key_properties=[
-                        "organization_slug",
-                        "team_slug",
-                        "day",
-                        "repository",
-                        "model",
-                    ],
-                )
-
-                pr_reviews_list.append(pr_entry_with_day)
-        return pr_reviews_list
-
-    def get_dotcom_chat_list(self):
-        dotcom_chat_list = []
-        logger.info("Generating dotcom chat list from data")
-        for entry in self.data:
-            day = entry.get("day")
-            for chat_entry in entry.get("dotcom_chat", []):
-                chat_entry_with_day = chat_entry.copy()
-                chat_entry_with_day["day"] = day
-                chat_entry_with_day = chat_entry_with_day | self.additional_properties
-
-                chat_entry_with_day["unique_hash"] = generate_unique_hash(
-                    chat_entry_with_day,
-                    key_properties=[
-                        "organization_slug",
-                        "team_slug",
-                        "day",
-                        "model",
-                    ],
-                )
-
-                # If the denominator value is 0, it is corrected to a uniform value
-                chat_entry_with_day["chat_turns"] = (
-                    self.correction_for_0
-                    if chat_entry_with_day["chat_turns"] == 0
-                    else chat_entry_with_day["chat_turns"]
-                )
-
-                dotcom_chat_list.append(chat_entry_with_day)
-        return dotcom_chat_list
-
-
-# --- ElasticsearchManager class definition ---
-class ElasticsearchManager:
-    def __init__(self, primary_key=Paras.primary_key):
-        self.primary_key = primary_key
-        if Paras.elasticsearch_user is None or Paras.elasticsearch_pass is None:
-            logger.info("Using Elasticsearch without authentication")
-            self.es = Elasticsearch(
-                hosts=Paras.elasticsearch_url,
-                max_retries=3,
-                retry_on_timeout=True,
-                request_timeout=60,
-            )
-        else:
-            logger.info("Using basic authentication for Elasticsearch")
-            self.es = Elasticsearch(
-                hosts=Paras.elasticsearch_url,
-                basic_auth=(Paras.elasticsearch_user, Paras.elasticsearch_pass),
-                max_retries=3,
-                retry_on_timeout=True,
-                request_timeout=60,
-            )
-
-        self.check_and_create_indexes()
-
-    # Check if all indexes in the indexes are present, and if they don't, they are created based on the files in the mapping folder
-    def check_and_create_indexes(self):
-        # try ping for 1 minute
-        for i in range(30):
-            if self.es.ping():
-                logger.info("Elasticsearch is up and running")
-                break
-            else:
-                logger.warning("Elasticsearch is not responding, retrying...")
-                time.sleep(5)
-
-        for index_name in Indexes.__dict__:
-            if index_name.startswith("index_"):
-                index_name = Indexes.__dict__[index_name]
-                if not self.es.indices.exists(index=index_name):
-                    mapping_file = f"mapping/{index_name}_mapping.json"
-                    with open(mapping_file, "r") as f:
-                        mapping = json.load(f)
-                    self.es.indices.create(index=index_name, body=mapping)
-                    logger.info(f"Created index: {index_name}")
-                else:
-                    logger.info(f"Index already exists: {index_name}")
-
-    def write_to_es(self, index_name, data, update_condition=None):
-        last_updated_at = current_time()
-        data["last_updated_at"] = last_updated_at
-        # Add @timestamp for Grafana time-based filtering (ISO 8601 format)
-        data["@timestamp"] = datetime.now().isoformat()
-        doc_id = data.get(self.primary_key)
-        logger.info(f"Writing data to Elasticsearch index: {index_name}")
-        try:
-            # Get existing document
-            existing_doc = self.es.get(index=index_name, id=doc_id)
-
-            # Check update condition if provided
-            if update_condition:
-                should_preserve_fields = True
-                for field, value in update_condition.items():
-                    if (
-                        field not in existing_doc["_source"]
-                        or existing_doc["_source"][field] != value
-                    ):
-                        should_preserve_fields = False
-                        break
-
-                if should_preserve_fields:
-                    # Preserve fields listed in update_condition by copying their values from existing document
-                    for field in update_condition.keys():
-                        if field in existing_doc["_source"]:
-                            data[field] = existing_doc["_source"][field]
-                    logger.info(
-                        f"[partial update] to [{index_name}]: {doc_id} - preserving fields: {list(update_condition.keys())}"
-                    )
-
-            # Always update document, possibly with some preserved fields
-            self.es.update(index=index_name, id=doc_id, doc=data)
-            logger.info(f"[updated] to [{index_name}]: {data}")
-        except NotFoundError:
-            self.es.index(index=index_name, id=doc_id, document=data)
-            logger.info(f"[created] to [{index_name}]: {data}")
-
-
 def main(organization_slug):
+    """Process one organization, returns its run counters for the end-of-cycle report"""
+    stats = run_stats.start_run(organization_slug)
     logger.info(
         "=========================================================================================================="
     )
@@ -1498,9 +1034,11 @@ def main(organization_slug):
 
     logger.info(f"Starting data processing for {slug_type}: {organization_slug}")
     github_org_manager = GitHubOrganizationManager(
-        organization_slug, is_standalone=is_standalone
+        organization_slug,
+        is_standalone=is_standalone,
+        archive_run=payload_archive.start_run(organization_slug) if payload_archive else None,
     )
-    es_manager = ElasticsearchManager()
+    es_manager = get_es_manager()
 
     # Process seat info and settings
     logger.info(
@@ -1529,12 +1067,11 @@ def main(organization_slug):
             f"No Copilot seat assignments found for {slug_type}: {organization_slug}"
         )
     else:
-        for seat_assignment in data_seat_assignments:
-            es_manager.write_to_es(
-                Indexes.index_seat_assignments,
-                seat_assignment,
-                update_condition={"is_active_today": 1},
-            )
+        es_manager.write_bulk_to_es(
+            Indexes.index_seat_assignments,
+            data_seat_assignments,
+            update_condition={"is_active_today": 1},
+        )
         logger.info(f"Data processing completed for {slug_type}: {organization_slug}")
 
     # Build a lookup of user_login -> assignee_team_slug for enriching user metrics
@@ -1551,38 +1088,93 @@ def main(organization_slug):
     logger.info(
         f"Processing Copilot user metrics for {slug_type}: {organization_slug}"
     )
+    user_metrics_since = (
+        watermark_store.since(organization_slug, "all", Indexes.index_user_metrics)
+        if watermark_store
+        else None
+    )
+
+    def user_metrics_complete(failed):
+        # Days of a failed report link are not behind the watermark yet, moving it
+        # would make the next runs skip them
+        if github_org_manager.failed_report_links:
+            logger.warning(
+                f"{github_org_manager.failed_report_links} user metrics report links failed, "
+                f"keeping the {Indexes.index_user_metrics} watermark of {organization_slug}"
+            )
+            return False
+        return not failed
+
     try:
-        logger.info("Calling get_copilot_user_metrics()...")
-        user_metrics_data = github_org_manager.get_copilot_user_metrics()
-        logger.info(f"get_copilot_user_metrics() returned: {type(user_metrics_data)} with {len(user_metrics_data) if user_metrics_data else 0} items")
-        
-        if not user_metrics_data:
+        # Adoption counters are pushed one record at a time, the leaderboard is
+        # computed from them without holding on to the records
+        adoption = OrganizationAdoption(slug_type, user_team_lookup)
+        if Paras.user_metrics_streaming:
+            # Records go straight from the download stream into bulk batches and the
+            # adoption counters, none of them is kept in memory
+            written_days = set()
+
+            def stream_user_metrics():
+                for user_metric in github_org_manager.iter_copilot_user_metrics():
+                    user_metric["assignee_team_slug"] = user_team_lookup.get(user_metric.get("user_login"), "no-team")
+                    adoption.add(user_metric)
+                    if is_newer(user_metric.get("day"), user_metrics_since):
+                        written_days.add(user_metric.get("day"))
+                        yield user_metric
+
+            logger.info("Streaming user metrics to Elasticsearch...")
+            _, failed = es_manager.write_bulk_to_es(
+                Indexes.index_user_metrics, stream_user_metrics(), skip_unchanged=True
+            )
+            if watermark_store and user_metrics_complete(failed):
+                watermark_store.update(
+                    organization_slug, "all", Indexes.index_user_metrics, written_days
+                )
+        else:
+            logger.info("Calling get_copilot_user_metrics()...")
+            user_metrics_data = github_org_manager.get_copilot_user_metrics()
+            logger.info(f"get_copilot_user_metrics() returned: {type(user_metrics_data)} with {len(user_metrics_data) if user_metrics_data else 0} items")
+            if user_metrics_data:
+                # Enrich each user metric record with assignee_team_slug from seat assignments
+                for user_metric in user_metrics_data:
+                    user_metric["assignee_team_slug"] = user_team_lookup.get(user_metric.get("user_login"), "no-team")
+                    adoption.add(user_metric)
+                logger.info(f"Enriched {len(user_metrics_data)} user metrics records with team info")
+                user_metrics_to_write = [
+                    user_metric
+                    for user_metric in user_metrics_data
+                    if is_newer(user_metric.get("day"), user_metrics_since)
+                ]
+                logger.info(f"Writing {len(user_metrics_to_write)} user metrics to Elasticsearch...")
+                _, failed = es_manager.write_bulk_to_es(
+                    Indexes.index_user_metrics, user_metrics_to_write, skip_unchanged=True
+                )
+                if watermark_store and user_metrics_complete(failed):
+                    watermark_store.update(
+                        organization_slug,
+                        "all",
+                        Indexes.index_user_metrics,
+                        [user_metric.get("day") for user_metric in user_metrics_to_write],
+                    )
+
+        if not adoption.accumulator.records:
             logger.warning(
                 f"No Copilot user metrics found for {slug_type}: {organization_slug}"
             )
         else:
-            # Enrich each user metric record with assignee_team_slug from seat assignments
-            for user_metric in user_metrics_data:
-                user_metric["assignee_team_slug"] = user_team_lookup.get(user_metric.get("user_login"), "no-team")
-            logger.info(f"Enriched {len(user_metrics_data)} user metrics records with team info")
-            logger.info(f"Writing {len(user_metrics_data)} user metrics to Elasticsearch...")
-            for user_metric in user_metrics_data:
-                es_manager.write_to_es(Indexes.index_user_metrics, user_metric)
-            adoption_entries = build_user_adoption_leaderboard(
-                user_metrics_data, organization_slug, slug_type, user_team_lookup=user_team_lookup
+            # Every scope is scored from the same counters and written through one bulk
+            # stream; the enterprise scope needs every organization, see regenerate_adoption.py
+            adoption_scopes = [scope for scope in Paras.adoption_scopes if scope != "enterprise"]
+            logger.info(
+                f"Writing adoption leaderboard entries to Elasticsearch, scopes: {', '.join(adoption_scopes)}..."
             )
-            if adoption_entries:
-                logger.info(
-                    f"Writing {len(adoption_entries)} adoption leaderboard entries to Elasticsearch..."
-                )
-                for adoption_entry in adoption_entries:
-                    es_manager.write_to_es(
-                        Indexes.index_user_adoption, adoption_entry
-                    )
-            logger.info(f"Successfully processed {len(user_metrics_data)} user metrics records for {slug_type}: {organization_slug}")
+            es_manager.write_bulk_to_es(
+                Indexes.index_user_adoption,
+                iter_scoped_leaderboards({organization_slug: adoption}, adoption_scopes),
+            )
+            logger.info(f"Successfully processed {adoption.accumulator.records} user metrics records for {slug_type}: {organization_slug}")
     except Exception as e:
         logger.error(f"Failed to process user metrics for {slug_type} {organization_slug}: {e}")
-        import traceback
         logger.error(f"Full traceback: {traceback.format_exc()}")
 
     # Create user summaries with aggregated top_model/language/feature
@@ -1621,6 +1213,22 @@ def main(organization_slug):
             logger.warning(f"No Copilot usage data found for team: {team_slug}")
             continue
 
+        usage_indexes = [
+            Indexes.index_name_total,
+            Indexes.index_name_breakdown,
+            Indexes.index_name_breakdown_chat,
+            Indexes.index_name_pr_reviews,
+            Indexes.index_name_dotcom_chat,
+        ]
+        since_day = None
+        if watermark_store:
+            cutoffs = [
+                watermark_store.since(organization_slug, team_slug, index_name)
+                for index_name in usage_indexes
+            ]
+            # The least advanced index decides which days are emitted
+            since_day = None if None in cutoffs else min(cutoffs)
+
         data_splitter = DataSplitter(
             data,
             additional_properties={
@@ -1628,45 +1236,99 @@ def main(organization_slug):
                 "team_slug": team_slug,
                 "position_in_tree": position_in_tree,
             },
+            since_day=since_day,
         )
 
         # get total_list, breakdown_list, breakdown_chat_list, pr_reviews_list,
         # dotcom_chat_list from data_splitter and save to json file
         total_list = data_splitter.get_total_list()
-        dict_save_to_json_file(total_list, f"{team_slug}_total_list")
+        save_snapshot("split", total_list, f"{team_slug}_total_list", sample_key=team_slug)
 
         breakdown_list = data_splitter.get_breakdown_list()
-        dict_save_to_json_file(breakdown_list, f"{team_slug}_breakdown_list")
+        save_snapshot("split", breakdown_list, f"{team_slug}_breakdown_list", sample_key=team_slug)
 
         breakdown_chat_list = data_splitter.get_breakdown_chat_list()
-        dict_save_to_json_file(breakdown_chat_list, f"{team_slug}_breakdown_chat_list")
+        save_snapshot("split", breakdown_chat_list, f"{team_slug}_breakdown_chat_list", sample_key=team_slug)
 
         pr_reviews_list = data_splitter.get_pr_reviews_list()
-        dict_save_to_json_file(pr_reviews_list, f"{team_slug}_pr_reviews_list")
+        save_snapshot("split", pr_reviews_list, f"{team_slug}_pr_reviews_list", sample_key=team_slug)
 
         dotcom_chat_list = data_splitter.get_dotcom_chat_list()
-        dict_save_to_json_file(dotcom_chat_list, f"{team_slug}_dotcom_chat_list")
+        save_snapshot("split", dotcom_chat_list, f"{team_slug}_dotcom_chat_list", sample_key=team_slug)
 
         # Write to ES
-        for total_data in total_list:
-            es_manager.write_to_es(Indexes.index_name_total, total_data)
-
-        for breakdown_data in breakdown_list:
-            es_manager.write_to_es(Indexes.index_name_breakdown, breakdown_data)
-
-        for breakdown_chat_data in breakdown_chat_list:
-            es_manager.write_to_es(
-                Indexes.index_name_breakdown_chat, breakdown_chat_data
-            )
-
-        for pr_review_data in pr_reviews_list:
-            es_manager.write_to_es(Indexes.index_name_pr_reviews, pr_review_data)
-
-        for dotcom_chat_data in dotcom_chat_list:
-            es_manager.write_to_es(Indexes.index_name_dotcom_chat, dotcom_chat_data)
+        for index_name, datas in zip(
+            usage_indexes,
+            [total_list, breakdown_list, breakdown_chat_list, pr_reviews_list, dotcom_chat_list],
+        ):
+            _, failed = es_manager.write_bulk_to_es(index_name, datas, skip_unchanged=True)
+            if watermark_store and not failed:
+                watermark_store.update(
+                    organization_slug,
+                    team_slug,
+                    index_name,
+                    [entry.get("day") for entry in data_splitter.data],
+                )
 
         logger.info(f"Data processing completed for team: {team_slug}")
 
+    logger.info(f"GitHub HTTP connection stats: {github_client.stats()}")
+    logger.info(f"Download HTTP connection stats: {download_client.stats()}")
+    logger.info(f"GitHub rate limit scheduler status: {github_rate_limiter.status()}")
+    if github_http_cache:
+        logger.info(f"GitHub HTTP cache stats: {github_http_cache.stats()}")
+    if payload_archive:
+        logger.info(f"Payload archive stats: {payload_archive.stats()}")
+    if watermark_store:
+        watermark_store.save()
+    es_manager.fingerprint_cache.save()
+    # Ingest is done, let the snapshots still queued reach disk before a forked
+    # worker exits
+    snapshots.flush(timeout=60)
+    logger.info(f"Snapshot writer status: {snapshots.status()}")
+    report = stats.snapshot()
+    logger.info(
+        f"Elasticsearch write summary for {slug_type}: {organization_slug}: "
+        f"{report.get('documents_written', 0)} written, "
+        f"{report.get('documents_skipped', 0)} skipped, "
+        f"{report.get('documents_failed', 0)} failed"
+    )
+    return report
+
+
+def reload_worker_state(workers):
+    """
+    Run in each forked organization worker (ORG_WORKER_MODE=process). The parent's
+    caches only hold what was on disk when it started, the workers of previous cycles
+    persisted more since; the GitHub rate limit is split between concurrent workers.
+    """
+    github_rate_limiter.share(workers)
+    if github_http_cache:
+        github_http_cache.reload()
+    if watermark_store:
+        watermark_store.reload()
+    get_es_manager().fingerprint_cache.reload()
+
+
+def log_cycle_report(reports):
+    logger.info("-----------------Cycle Report-----------------")
+    for report in reports:
+        logger.info(
+            f"{report['organization']}: {report['status']} in {report['duration_seconds']:.1f}s, "
+            f"{report.get('http_requests', 0)} requests, "
+            f"{report.get('documents_written', 0)} documents written, "
+            f"{report.get('documents_skipped', 0)} skipped, "
+            f"{report.get('documents_failed', 0)} failed"
+        )
+        if report.get("error"):
+            logger.error(f"{report['organization']}: {report['error']}")
+    ok_count = sum(1 for report in reports if report["status"] == "ok")
+    logger.info(
+        f"{ok_count}/{len(reports)} organizations succeeded, "
+        f"{sum(report.get('http_requests', 0) for report in reports)} requests, "
+        f"{sum(report.get('documents_written', 0) for report in reports)} documents written"
+    )
+
 
 if __name__ == "__main__":
     import os
@@ -1677,15 +1339,36 @@ if __name__ == "__main__":
     
     logger.info(f"Starting Copilot metrics collector with {execution_interval_hours}h interval")
     
+    es_manager = None
     while True:
         try:
+            # Index bootstrap happens once, later cycles only verify it (one ping and
+            # one exists request unless the mappings changed or an index is missing)
+            if es_manager is None:
+                es_manager = get_es_manager()
+            else:
+                es_manager.bootstrap()
+
             logger.info(
                 f"Starting data processing for organizations: {Paras.organization_slugs}"
             )
             # Split Paras.organization_slugs and process each organization, remember to remove spaces after splitting
-            organization_slugs = Paras.organization_slugs.split(",")
-            for organization_slug in organization_slugs:
-                main(organization_slug.strip())
+            organization_slugs = [slug.strip() for slug in Paras.organization_slugs.split(",")]
+            # Each organization runs isolated: a failure or timeout only loses that
+            # organization's cycle
+            reports = run_organizations(
+                organization_slugs,
+                main,
+                workers=Paras.org_workers,
+                mode=Paras.org_worker_mode,
+                timeout=Paras.org_timeout,
+                initializer=functools.partial(
+                    reload_worker_state, min(Paras.org_workers, len(organization_slugs))
+                ),
+            )
+            log_cycle_report(reports)
+            if payload_archive:
+                payload_archive.prune()
             
             logger.info("-----------------Finished Successfully-----------------")
             logger.info(f"Sleeping for {execution_interval_hours} hour(s) until next run...")
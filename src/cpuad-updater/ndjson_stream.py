@@ -0,0 +1,134 @@
+"""
+Streaming parser for user metrics report downloads (NDJSON, optionally gzip compressed)
+"""
+import json
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+UTF8_BOM = b"\xef\xbb\xbf"
+
+
+class ReportParseError(ValueError):
+    """Part of a report could not be read, raised once every readable record was yielded"""
+
+
+def iter_ndjson_records(chunks):
+    """
+    Yield JSON values from an iterable of byte chunks, e.g. response.iter_content().
+
+    NDJSON is parsed line by line, so memory does not depend on the payload size.
+    Gzip payloads are detected by their magic bytes and decompressed on the fly,
+    including payloads made of several concatenated gzip members.
+    A payload that is a single JSON document (an array, or an object spread over
+    several lines) cannot be parsed line by line; it is buffered and its items yielded.
+
+    Lines that are not valid JSON are logged and skipped. Once the payload is consumed,
+    ReportParseError is raised if any line was skipped, the gzip stream was truncated
+    or the JSON document could not be parsed, so callers know records are missing.
+    """
+    decompressor = None
+    head = b""
+    buffer = b""
+    buffered_document = False
+    first_line = True
+    start_checked = False
+    truncated = False
+    bad_lines = 0
+
+    def decompress(data):
+        nonlocal decompressor
+        output = []
+        while data:
+            if decompressor.eof:
+                # Concatenated gzip members, each one is decompressed in turn
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            output.append(decompressor.decompress(data))
+            data = decompressor.unused_data if decompressor.eof else b""
+        return b"".join(output)
+
+    def decoded(chunks):
+        nonlocal decompressor, head, truncated
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if decompressor is None and head is not None:
+                head += chunk
+                if len(head) < len(GZIP_MAGIC):
+                    continue
+                chunk, head = head, None
+                if chunk.startswith(GZIP_MAGIC):
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            yield decompress(chunk) if decompressor else chunk
+        if head:
+            yield head
+        if decompressor:
+            yield decompressor.flush()
+            truncated = not decompressor.eof
+
+    def parse_lines(lines, log_errors=True):
+        nonlocal bad_lines
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                if log_errors:
+                    logger.error(f"Failed to parse NDJSON line: {e}")
+                bad_lines += 1
+
+    for chunk in decoded(chunks):
+        buffer += chunk
+        if not start_checked:
+            if len(buffer) < len(UTF8_BOM) and UTF8_BOM.startswith(buffer):
+                continue
+            if buffer.startswith(UTF8_BOM):
+                buffer = buffer[len(UTF8_BOM):]
+            start_checked = True
+        if buffered_document:
+            continue
+        if first_line and buffer.lstrip()[:1] == b"[":
+            buffered_document = True
+            continue
+        *lines, buffer = buffer.split(b"\n")
+        if first_line:
+            for index, line in enumerate(lines):
+                if not line.strip():
+                    continue
+                if line.strip() == b"{":
+                    # Pretty printed object, keep everything for a single json.loads at the end
+                    buffered_document = True
+                    buffer = b"\n".join(lines[index:] + [buffer])
+                    lines = []
+                else:
+                    lines = lines[index:]
+                    first_line = False
+                break
+            else:
+                lines = []
+        yield from parse_lines(lines)
+
+    if buffered_document:
+        try:
+            document = json.loads(buffer)
+        except json.JSONDecodeError as e:
+            # Maybe NDJSON after all, behind a broken first line: keep the lines that parse
+            logger.error(f"Failed to parse JSON document, reading it as NDJSON: {e}")
+            yield from parse_lines(buffer.split(b"\n"), log_errors=False)
+            logger.error(f"{bad_lines} lines of the JSON document could not be parsed")
+        else:
+            if isinstance(document, list):
+                yield from document
+            else:
+                yield document
+    else:
+        yield from parse_lines([buffer])
+
+    if truncated:
+        logger.error("Gzip payload ended inside a compressed stream, the report is truncated")
+        raise ReportParseError("gzip payload is truncated")
+    if bad_lines:
+        raise ReportParseError(f"{bad_lines} NDJSON lines could not be parsed")
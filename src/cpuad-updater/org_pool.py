@@ -0,0 +1,152 @@
+"""
+Runs the per-organization ingest of one cycle on a pool of worker threads or processes
+"""
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+
+import run_stats
+
+# organization slug -> (thread, started_at) of "thread" mode runs given up on after a
+# timeout, which may still be running in the background
+_abandoned_threads = {}
+
+
+def _run_one(target, key, organization_slug, results, initializer=None):
+    started_at = time.monotonic()
+    try:
+        if initializer:
+            initializer()
+        report = {**(target(organization_slug) or {}), "status": "ok"}
+    except BaseException as e:
+        # Keep what was counted before the failure
+        stats = run_stats.current()
+        report = {
+            **(stats.snapshot() if stats else {}),
+            "status": "error",
+            "error": f"{e!r}\n{traceback.format_exc()}",
+        }
+    report["duration_seconds"] = round(time.monotonic() - started_at, 3)
+    results.put((key, report))
+
+
+def run_organizations(
+    organization_slugs, target, workers=1, mode="thread", timeout=None, poll_interval=1.0, initializer=None
+):
+    """
+    Call target(organization_slug) for every slug, at most `workers` at a time, and
+    return one report per slug, in slug order.
+
+    Each organization is isolated: an exception only fails its own report
+    (status "error"), and an organization running longer than `timeout` seconds is
+    given up on (status "timeout") while the others keep going. In "process" mode
+    the worker is a forked process that is terminated on timeout or reported as
+    "crashed" if it dies; in "thread" mode a timed out thread cannot be stopped, it
+    is left running in the background and its result is discarded, and the
+    organization is skipped (status "still_running") by the next calls until that
+    thread has finished, so two runs of one organization never overlap.
+    target should return a dict, which is merged into the report.
+    In "process" mode initializer() is called in each forked worker before target, to
+    reload the state that other workers persisted since the parent loaded it.
+    """
+    if mode == "process":
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+
+        def start(key, organization_slug):
+            worker = context.Process(
+                target=_run_one,
+                args=(target, key, organization_slug, results, initializer),
+                name=f"org-{organization_slug}",
+                daemon=True,
+            )
+            worker.start()
+            return worker
+
+    else:
+        results = queue.Queue()
+
+        def start(key, organization_slug):
+            worker = threading.Thread(
+                target=_run_one,
+                args=(target, key, organization_slug, results),
+                name=f"org-{organization_slug}",
+                daemon=True,
+            )
+            worker.start()
+            return worker
+
+    workers = max(1, workers)
+    pending = deque()
+    running = {}  # key -> (worker, started_at)
+    reports = {}
+
+    for key, organization_slug in enumerate(organization_slugs):
+        abandoned = _abandoned_threads.get(organization_slug)
+        if abandoned is None:
+            pending.append((key, organization_slug))
+        elif not abandoned[0].is_alive():
+            del _abandoned_threads[organization_slug]
+            pending.append((key, organization_slug))
+        else:
+            reports[key] = {
+                "status": "still_running",
+                "duration_seconds": round(time.monotonic() - abandoned[1], 3),
+                "error": "the run that timed out in a previous cycle has not finished, skipped",
+            }
+
+    def collect(block):
+        try:
+            key, report = results.get(timeout=poll_interval) if block else results.get_nowait()
+        except queue.Empty:
+            return False
+        if key in running:
+            worker, _ = running.pop(key)
+            worker.join()
+            reports[key] = report
+        return True
+
+    while pending or running:
+        while pending and len(running) < workers:
+            key, organization_slug = pending.popleft()
+            running[key] = (start(key, organization_slug), time.monotonic())
+
+        collect(block=True)
+        while collect(block=False):
+            pass
+
+        now = time.monotonic()
+        for key, (worker, started_at) in list(running.items()):
+            if timeout and now - started_at > timeout:
+                if mode == "process":
+                    worker.terminate()
+                    worker.join()
+                else:
+                    _abandoned_threads[organization_slugs[key]] = (worker, started_at)
+                running.pop(key)
+                reports[key] = {
+                    "status": "timeout",
+                    "duration_seconds": round(now - started_at, 3),
+                    "error": f"did not finish within {timeout}s",
+                }
+            elif not worker.is_alive():
+                # The result may have been queued after the last collect
+                while collect(block=False):
+                    pass
+                if key not in running:
+                    continue
+                # Exited without a result (killed, out of memory, ...)
+                running.pop(key)
+                reports[key] = {
+                    "status": "crashed",
+                    "duration_seconds": round(now - started_at, 3),
+                    "error": f"worker exited with code {getattr(worker, 'exitcode', None)}",
+                }
+
+    return [
+        {"organization": organization_slug, **reports[key]}
+        for key, organization_slug in enumerate(organization_slugs)
+    ]
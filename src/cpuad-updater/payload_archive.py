@@ -0,0 +1,218 @@
+"""
+Content-addressed archive of raw GitHub payloads. Bodies are stored once as blobs
+named by their sha256, each run appends lines to its own manifest pointing at the
+blobs it fetched, so an unchanged payload only costs a manifest line. Archived runs
+can be replayed through convert_metrics_to_usage and DataSplitter without GitHub.
+
+    python payload_archive.py                 list the archived runs
+    python payload_archive.py <run_id>        replay a run, print the split document counts
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from data_splitter import DataSplitter
+from log_utils import current_time
+from metrics_2_usage_convertor import convert_metrics_to_usage
+
+logger = logging.getLogger(__name__)
+
+
+class PayloadArchive:
+    """
+    PAYLOAD_ARCHIVE_PATH/blobs/<2 hex>/<sha256>.json.gz holds each distinct body,
+    PAYLOAD_ARCHIVE_PATH/manifests/<run_id>.ndjson one line per archived payload:
+    {"kind": ..., "sha256": ..., "at": ..., <metadata>}.
+    """
+
+    def __init__(self, path=None, retention_days=None):
+        if path is None:
+            path = os.getenv("PAYLOAD_ARCHIVE_PATH", "archive")
+        if retention_days is None:
+            retention_days = int(os.getenv("PAYLOAD_ARCHIVE_RETENTION_DAYS", 0))
+        self.path = path
+        self.retention_days = retention_days
+        self.blobs_path = os.path.join(path, "blobs")
+        self.manifests_path = os.path.join(path, "manifests")
+        self._lock = threading.Lock()
+        self._known = set()
+        self._stats = {"blobs_written": 0, "blobs_reused": 0}
+        os.makedirs(self.blobs_path, exist_ok=True)
+        os.makedirs(self.manifests_path, exist_ok=True)
+
+    @staticmethod
+    def _encode(body):
+        return json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf8")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blobs_path, digest[:2], f"{digest}.json.gz")
+
+    def put(self, body):
+        """Store a JSON body unless a blob with the same content exists, returns its sha256"""
+        data = self._encode(body)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            known = digest in self._known
+        if known or os.path.exists(path):
+            # Touched so retention keeps blobs that are still being fetched
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            with self._lock:
+                self._known.add(digest)
+                self._stats["blobs_reused"] += 1
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(gzip.compress(data, mtime=0))
+        # Atomic, a concurrent writer of the same blob writes the same bytes
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._known.add(digest)
+            self._stats["blobs_written"] += 1
+        return digest
+
+    def get(self, digest):
+        with gzip.open(self._blob_path(digest), "rb") as f:
+            return json.loads(f.read())
+
+    def start_run(self, organization_slug):
+        run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{re.sub(r'[^A-Za-z0-9_.-]', '_', organization_slug)}"
+        return ArchiveRun(self, run_id, organization_slug)
+
+    def runs(self):
+        """Archived run ids, oldest first"""
+        return sorted(
+            name[: -len(".ndjson")]
+            for name in os.listdir(self.manifests_path)
+            if name.endswith(".ndjson")
+        )
+
+    def manifest(self, run_id):
+        entries = []
+        with open(os.path.join(self.manifests_path, f"{run_id}.ndjson"), "r", encoding="utf8") as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+        return entries
+
+    def replay(self, run_id, kind=None):
+        """Yield (manifest entry, body) of every payload archived by a run, optionally of one kind"""
+        for entry in self.manifest(run_id):
+            if kind is None or entry.get("kind") == kind:
+                yield entry, self.get(entry["sha256"])
+
+    def prune(self):
+        """
+        Remove manifests older than retention_days, then the blobs no remaining
+        manifest points at and that were not stored or reused since
+        """
+        if self.retention_days <= 0:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        referenced = set()
+        for run_id in self.runs():
+            path = os.path.join(self.manifests_path, f"{run_id}.ndjson")
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                continue
+            referenced.update(entry["sha256"] for entry in self.manifest(run_id))
+
+        removed = 0
+        for folder in os.scandir(self.blobs_path):
+            if not folder.is_dir():
+                continue
+            for blob in os.scandir(folder.path):
+                digest = blob.name.split(".", 1)[0]
+                if digest not in referenced and blob.stat().st_mtime < cutoff:
+                    os.remove(blob.path)
+                    removed += 1
+        with self._lock:
+            self._known &= referenced
+        if removed:
+            logger.info(f"Removed {removed} payload archive blobs older than {self.retention_days} days")
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+class ArchiveRun:
+    """The manifest of one organization's run, safe to record into from several threads"""
+
+    def __init__(self, archive, run_id, organization_slug):
+        self.archive = archive
+        self.run_id = run_id
+        self.organization_slug = organization_slug
+        self.manifest_path = os.path.join(archive.manifests_path, f"{run_id}.ndjson")
+        self._lock = threading.Lock()
+
+    def record(self, kind, body, **metadata):
+        """Archive body and add a manifest line for it, returns the blob sha256"""
+        digest = self.archive.put(body)
+        line = json.dumps(
+            {
+                "kind": kind,
+                "sha256": digest,
+                "at": current_time(),
+                "organization_slug": self.organization_slug,
+                **metadata,
+            },
+            ensure_ascii=False,
+        )
+        with self._lock:
+            with open(self.manifest_path, "a", encoding="utf8") as f:
+                f.write(line + "\n")
+        return digest
+
+
+def replay_team_usage(archive, run_id):
+    """
+    Yield (manifest entry, usage days) for the team metrics archived by a run,
+    converted the same way get_copilot_usages converts fresh responses
+    """
+    for entry, body in archive.replay(run_id, kind="team_metrics"):
+        yield entry, convert_metrics_to_usage(body)
+
+
+def replay_data_splitters(archive, run_id, since_day=None):
+    """Yield (team_slug, DataSplitter) for the team metrics archived by a run, as main() builds them"""
+    for entry, usage in replay_team_usage(archive, run_id):
+        yield entry["team_slug"], DataSplitter(
+            usage,
+            additional_properties={
+                "organization_slug": entry["organization_slug"],
+                "team_slug": entry["team_slug"],
+                "position_in_tree": entry.get("position_in_tree"),
+            },
+            since_day=since_day,
+        )
+
+
+if __name__ == "__main__":
+    archive = PayloadArchive()
+    if len(sys.argv) < 2:
+        for run_id in archive.runs():
+            print(run_id)
+        sys.exit(0)
+
+    for team_slug, splitter in replay_data_splitters(archive, sys.argv[1]):
+        print(
+            f"{team_slug}: {len(splitter.get_total_list())} total, "
+            f"{len(splitter.get_breakdown_list())} breakdown, "
+            f"{len(splitter.get_breakdown_chat_list())} breakdown chat, "
+            f"{len(splitter.get_pr_reviews_list())} PR reviews, "
+            f"{len(splitter.get_dotcom_chat_list())} dotcom chat"
+        )
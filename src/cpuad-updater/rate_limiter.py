@@ -0,0 +1,179 @@
+"""
+Token-bucket scheduler that paces GitHub API requests against the rate limit budget
+"""
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+# Lower value is served first when requests are queued
+PRIORITY_HIGH = 0  # cheap endpoints, e.g. billing
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2  # large endpoints, e.g. per-team metrics
+
+
+class RateLimitScheduler:
+    """
+    Shared by every thread that talks to the GitHub API.
+
+    - acquire() blocks until a token is available. The refill rate is the configured
+      requests per second; once X-RateLimit-Remaining drops below pace_below it is
+      lowered to spread the remaining budget over the time left until X-RateLimit-Reset.
+      Below the reserve, requests wait for the reset.
+    - Waiting requests are served by priority, then in arrival order.
+    - backoff() pauses all requests after a 403/429 rate limit response, honouring
+      Retry-After and otherwise using exponential backoff with full jitter.
+    - share(n) makes it one of n worker processes drawing on the same budget: the rate,
+      burst and paced budget are divided by n, since processes cannot share the bucket.
+    """
+
+    def __init__(
+        self, requests_per_second=None, burst=None, reserve=None, pace_below=None, max_backoff=None
+    ):
+        if requests_per_second is None:
+            requests_per_second = float(os.getenv("GITHUB_REQUESTS_PER_SECOND", 10))
+        if burst is None:
+            burst = int(os.getenv("GITHUB_BURST", 10))
+        if reserve is None:
+            reserve = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", 50))
+        if pace_below is None:
+            pace_below = int(os.getenv("GITHUB_RATE_LIMIT_PACE_BELOW", 1000))
+        if max_backoff is None:
+            max_backoff = float(os.getenv("GITHUB_MAX_BACKOFF_SECONDS", 300))
+
+        self.requests_per_second = requests_per_second
+        self.burst = max(burst, 1)
+        self.reserve = reserve
+        self.pace_below = pace_below
+        self.max_backoff = max_backoff
+
+        self.shares = 1
+
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._limit = None
+        self._remaining = None
+        self._reset_at = None  # epoch seconds, as sent by GitHub
+        self._paused_until = 0.0  # monotonic
+
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+
+    def share(self, parts):
+        """Pace this process as one of `parts` processes sharing the GitHub rate limit"""
+        with self._condition:
+            self.shares = max(int(parts), 1)
+            self._tokens = min(self._tokens, self._burst())
+            self._condition.notify_all()
+
+    def _burst(self):
+        return max(self.burst // self.shares, 1)
+
+    def _effective_rate(self):
+        rate = self.requests_per_second / self.shares
+        if self._remaining is None or self._reset_at is None or self._remaining > self.pace_below:
+            return rate
+        seconds_to_reset = max(self._reset_at - time.time(), 1.0)
+        available = max(self._remaining - self.reserve, 0) / self.shares
+        return min(rate, available / seconds_to_reset)
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self._burst(), self._tokens + elapsed * self._effective_rate())
+
+    def _delay(self, now):
+        # Seconds the head of the queue has to wait before it may send a request
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._remaining is not None and self._remaining <= self.reserve:
+            if self._reset_at and self._reset_at > time.time():
+                return self._reset_at - time.time()
+            # The window has been reset, the next response will tell the new budget
+            self._remaining = None
+            self._reset_at = None
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0.0
+        rate = self._effective_rate()
+        return (1 - self._tokens) / rate if rate > 0 else 1.0
+
+    def acquire(self, priority=PRIORITY_NORMAL):
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if self._waiting[0] == ticket:
+                        timeout = self._delay(time.monotonic())
+                        if timeout <= 0:
+                            self._tokens -= 1
+                            if self._remaining is not None:
+                                self._remaining -= 1
+                            return
+                    self._condition.wait(timeout=timeout)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    def update_from_headers(self, headers):
+        # Only the REST "core" budget is tracked; GraphQL and search have their own
+        if headers.get("X-RateLimit-Resource", "core") != "core":
+            return
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset_at = int(headers["X-RateLimit-Reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._condition:
+            self._remaining = remaining
+            self._reset_at = reset_at
+            if headers.get("X-RateLimit-Limit", "").isdigit():
+                self._limit = int(headers["X-RateLimit-Limit"])
+            self._condition.notify_all()
+
+    @staticmethod
+    def is_rate_limited(response):
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        if response.headers.get("Retry-After") or response.headers.get("X-RateLimit-Remaining") == "0":
+            return True
+        return "rate limit" in response.text.lower()
+
+    def backoff(self, response, attempt):
+        """Pause all requests after a rate limited response, returns the delay in seconds"""
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            delay = float(retry_after)
+        elif response.headers.get("X-RateLimit-Remaining") == "0" and response.headers.get(
+            "X-RateLimit-Reset", ""
+        ).isdigit():
+            delay = max(int(response.headers["X-RateLimit-Reset"]) - time.time(), 1.0)
+        else:
+            delay = random.uniform(0, min(self.max_backoff, 2 ** (attempt + 1)))
+        delay = min(delay, self.max_backoff)
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._condition.notify_all()
+        return delay
+
+    def status(self):
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "tokens": round(self._tokens, 2),
+                "rate_per_second": round(self._effective_rate(), 3),
+                "limit": self._limit,
+                "remaining": self._remaining,
+                "reset_at": self._reset_at,
+                "paused_seconds": round(max(self._paused_until - now, 0.0), 1),
+                "queue_depth": len(self._waiting),
+            }
@@ -0,0 +1,58 @@
+"""
+Per-organization run counters (HTTP requests, documents written), kept in a ContextVar
+so organizations processed concurrently in the same process are counted separately
+"""
+import contextvars
+import functools
+import threading
+
+_current_run = contextvars.ContextVar("cpuad_run_stats", default=None)
+
+
+class RunStats:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def add(self, key, value=1):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+def start_run(name):
+    """Start counting for the current thread/context, returns the RunStats"""
+    stats = RunStats(name)
+    _current_run.set(stats)
+    return stats
+
+
+def current():
+    """The RunStats of the current thread/context, None outside of a run"""
+    return _current_run.get()
+
+
+def record(key, value=1):
+    """Add to a counter of the current run, no-op outside of a run"""
+    stats = _current_run.get()
+    if stats is not None:
+        stats.add(key, value)
+
+
+def bind(fn):
+    """
+    Wrap fn so it runs in a copy of the caller's context, for work handed to a
+    ThreadPoolExecutor: executor threads do not inherit the submitting context
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # A Context can only be entered by one thread at a time, so copy it per call
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
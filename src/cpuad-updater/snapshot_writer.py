@@ -0,0 +1,267 @@
+"""
+Debug snapshots of intermediate payloads (raw metrics, converted usage, split lists,
+seats, teams), written as compressed NDJSON by a background thread so ingest never
+waits on disk
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+import run_stats
+from config import Paras
+from log_utils import current_time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Stages snapshots are grouped by, SNAPSHOT_STAGES enables a subset of them
+STAGES = ("organizations", "teams", "seats", "metrics", "usage", "split", "user_metrics")
+
+_DAY_FOLDER = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _parse_stages(value):
+    value = value.strip().lower()
+    if value in ("", "none", "off", "false"):
+        return set()
+    if value in ("all", "true"):
+        return set(STAGES)
+    return {stage.strip() for stage in value.split(",") if stage.strip()}
+
+
+class SnapshotWriter:
+    """
+    Appends snapshots to one file per stage and day, LOG_PATH/YYYY-MM-DD/<stage>_YYYY-MM-DD.ndjson.gz
+    (.zst with SNAPSHOT_COMPRESSION=zstd), one line per record:
+    {"snapshot": <name>, "at": <time>, "record": <record>}.
+
+    save() only serializes the payload and queues it; a writer thread compresses and
+    appends queued snapshots, each batch as its own gzip member / zstd frame so files
+    stay readable if the process dies. When the queue holds SNAPSHOT_QUEUE_SIZE
+    snapshots or SNAPSHOT_QUEUE_MB of serialized payloads the snapshot is dropped
+    instead of blocking. Date folders older than LOG_RETENTION_DAYS are removed.
+    """
+
+    def __init__(
+        self, root=None, stages=None, sample_rate=None, compression=None, queue_size=None, retention_days=None,
+        queue_bytes=None,
+    ):
+        self.root = root if root is not None else Paras.log_path
+        self.stages = _parse_stages(os.getenv("SNAPSHOT_STAGES", "all")) if stages is None else set(stages)
+        self.sample_rate = float(os.getenv("SNAPSHOT_SAMPLE_RATE", 1.0)) if sample_rate is None else sample_rate
+        compression = (compression or os.getenv("SNAPSHOT_COMPRESSION", "gzip")).lower()
+        if compression == "zstd" and zstandard is None:
+            logger.warning("SNAPSHOT_COMPRESSION=zstd needs the zstandard package, using gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.queue_size = int(os.getenv("SNAPSHOT_QUEUE_SIZE", 256)) if queue_size is None else queue_size
+        self.queue_bytes = (
+            int(os.getenv("SNAPSHOT_QUEUE_MB", 64)) * 1024 * 1024 if queue_bytes is None else queue_bytes
+        )
+        self.retention_days = int(os.getenv("LOG_RETENTION_DAYS", 0)) if retention_days is None else retention_days
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._queued_bytes = 0  # serialized payloads waiting for the writer thread
+        self._stats = {"queued": 0, "written": 0, "dropped": 0, "bytes": 0}
+        # The writer thread does not survive a fork, children start their own
+        os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.close)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._queued_bytes = 0
+
+    def enabled(self, stage):
+        return stage in self.stages and self.sample_rate > 0
+
+    def _sampled(self, key):
+        if self.sample_rate >= 1:
+            return True
+        # Deterministic, so a sampled team is kept in every stage
+        return zlib.crc32(key.encode()) % 10000 < self.sample_rate * 10000
+
+    def save(self, stage, name, data, sample_key=None):
+        """
+        Queue a snapshot of data (a list is one line per item) under stage. sample_key
+        (default name) decides whether it is kept when SNAPSHOT_SAMPLE_RATE < 1.
+        """
+        if not self.enabled(stage):
+            return
+        if not data:
+            logger.warning(f"No data to save for {name}")
+            return
+        if not self._sampled(sample_key or name):
+            return
+        with self._lock:
+            backlogged = self._queued_bytes >= self.queue_bytes
+        if backlogged:
+            # Not even serialized, the writer is behind
+            self._drop(name)
+            return
+
+        # Serialized now: the caller may modify data as soon as this returns
+        at = current_time()
+        payload = "".join(
+            json.dumps(
+                {"snapshot": name, "at": at, "record": record},
+                ensure_ascii=False,
+                separators=(",", ":"),
+                default=str,
+            )
+            + "\n"
+            for record in (data if isinstance(data, list) else [data])
+        ).encode("utf8")
+
+        snapshots = self._ensure_started()
+        with self._lock:
+            # One payload larger than the limit is still taken by an empty queue
+            full = self._queued_bytes and self._queued_bytes + len(payload) > self.queue_bytes
+            if not full:
+                try:
+                    snapshots.put_nowait((at[:10], stage, payload))
+                except queue.Full:
+                    full = True
+                else:
+                    self._queued_bytes += len(payload)
+                    self._stats["queued"] += 1
+        if full:
+            self._drop(name)
+
+    def _drop(self, name):
+        with self._lock:
+            self._stats["dropped"] += 1
+        run_stats.record("snapshots_dropped")
+        logger.debug(f"Snapshot queue full, dropped {name}")
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._queue,), name="snapshot-writer", daemon=True
+                )
+                self._thread.start()
+            return self._queue
+
+    def _run(self, snapshots):
+        pruned_day = None
+        while True:
+            batch = [snapshots.get()]
+            while True:
+                try:
+                    batch.append(snapshots.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            flushed = []
+            files = {}
+            for item in batch:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    flushed.append(item)
+                else:
+                    day, stage, payload = item
+                    files.setdefault((day, stage), []).append(payload)
+
+            for (day, stage), payloads in files.items():
+                self._append(day, stage, payloads)
+                with self._lock:
+                    self._queued_bytes -= sum(len(payload) for payload in payloads)
+
+            today = current_time()[:10]
+            if self.retention_days > 0 and pruned_day != today:
+                self.prune()
+                pruned_day = today
+
+            for event in flushed:
+                event.set()
+            if stop:
+                return
+
+    def _path(self, day, stage):
+        extension = {"gzip": ".gz", "zstd": ".zst"}.get(self.compression, "")
+        return os.path.join(self.root, day, f"{stage}_{day}.ndjson{extension}")
+
+    def _append(self, day, stage, payloads):
+        data = b"".join(payloads)
+        if self.compression == "gzip":
+            data = gzip.compress(data, compresslevel=6)
+        elif self.compression == "zstd":
+            data = zstandard.ZstdCompressor().compress(data)
+        path = self._path(day, stage)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # A single append per batch, so forked workers sharing the file do not interleave
+            with open(path, "ab") as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning(f"Failed to write snapshots to {path}: {e}")
+            with self._lock:
+                self._stats["dropped"] += len(payloads)
+            return
+        with self._lock:
+            self._stats["written"] += len(payloads)
+            self._stats["bytes"] += len(data)
+
+    def prune(self):
+        """Remove LOG_PATH/YYYY-MM-DD folders older than retention_days"""
+        if self.retention_days <= 0 or not os.path.isdir(self.root):
+            return
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and _DAY_FOLDER.match(entry.name) and entry.name < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                logger.info(f"Removed log folder older than {self.retention_days} days: {entry.path}")
+
+    def flush(self, timeout=None):
+        """Wait until the snapshots queued so far are written, False on timeout"""
+        with self._lock:
+            snapshots = self._queue
+        if snapshots is None:
+            return True
+        event = threading.Event()
+        snapshots.put(event)
+        return event.wait(timeout)
+
+    def close(self, timeout=30):
+        with self._lock:
+            snapshots, thread = self._queue, self._thread
+            self._queue = self._thread = None
+        if thread is None:
+            return
+        snapshots.put(None)
+        thread.join(timeout)
+
+    def status(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_snapshot_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SnapshotWriter()
+        return _writer
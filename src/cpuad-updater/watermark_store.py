@@ -0,0 +1,88 @@
+"""
+Per-(organization, team, index) ingest watermarks, persisted to a local JSON file
+"""
+import fcntl
+import json
+import os
+import threading
+from datetime import date, timedelta
+
+
+class WatermarkStore:
+    """
+    Remembers the newest day written to each index for an organization/team.
+    since() returns the day after which records still have to be written: the
+    watermark minus recheck_days, so late corrections to recent days are picked up.
+    """
+
+    def __init__(self, path=None, recheck_days=None):
+        if path is None:
+            path = os.path.join(os.getenv("STATE_PATH", "state"), "watermarks.json")
+        if recheck_days is None:
+            recheck_days = int(os.getenv("WATERMARK_RECHECK_DAYS", 2))
+        self.path = path
+        self.recheck_days = recheck_days
+        self._lock = threading.Lock()
+        self._watermarks = {}
+        self.reload()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf8") as f:
+            return json.load(f)
+
+    def _merge(self, watermarks):
+        # The newest day per key wins
+        with self._lock:
+            for key, watermark in watermarks.items():
+                self._watermarks[key] = max(watermark, self._watermarks.get(key, ""))
+
+    def reload(self):
+        """
+        Merge the watermarks saved to the file since it was loaded, e.g. in a forked
+        worker, by the workers of the previous cycles
+        """
+        self._merge(self._read())
+
+    @staticmethod
+    def _key(organization_slug, team_slug, index_name):
+        return f"{organization_slug}|{team_slug}|{index_name}"
+
+    def since(self, organization_slug, team_slug, index_name):
+        with self._lock:
+            watermark = self._watermarks.get(
+                self._key(organization_slug, team_slug, index_name)
+            )
+        if not watermark:
+            return None
+        cutoff = date.fromisoformat(watermark[:10]) - timedelta(days=self.recheck_days)
+        return cutoff.isoformat()
+
+    def update(self, organization_slug, team_slug, index_name, days):
+        days = [day[:10] for day in days if day]
+        if not days:
+            return
+        key = self._key(organization_slug, team_slug, index_name)
+        with self._lock:
+            self._watermarks[key] = max([*days, self._watermarks.get(key, "")])
+
+    def save(self):
+        """
+        Write the watermarks, merged with the file on disk: organizations processed in
+        other worker processes save to the same file, the newest day per key wins
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._merge(self._read())
+            with self._lock:
+                data = dict(self._watermarks)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf8") as f:
+                json.dump(data, f, indent=4, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+def is_newer(day, since_day):
+    """True when a record has to be written for the given since() cutoff, records without a day always are"""
+    return since_day is None or not day or day[:10] > since_day
@@ -0,0 +1,17 @@
+"""
+The NumPy leaderboard of UserAdoptionAccumulator must return exactly the entries of
+the per-user build_user_adoption_leaderboard it replaced (benchmarks/adoption_reference.py).
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+from bench_adoption import check_seeds  # noqa: E402
+
+
+@pytest.mark.parametrize("top_n", [1, 10])
+def test_leaderboard_matches_reference(top_n):
+    check_seeds(300, top_n)
@@ -0,0 +1,90 @@
+"""
+iter_ndjson_records on the payload shapes seen in report downloads: plain and gzip
+NDJSON, JSON documents, and broken payloads that must not be reported as complete.
+"""
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "cpuad-updater"))
+
+from ndjson_stream import ReportParseError, iter_ndjson_records  # noqa: E402
+
+RECORDS = [{"user_login": f"user{i}", "day": "2025-01-01", "count": i} for i in range(50)]
+
+
+def ndjson(records, newline=b"\n"):
+    return b"".join(json.dumps(record).encode() + newline for record in records)
+
+
+def chunked(payload, size):
+    return [payload[i : i + size] for i in range(0, len(payload), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 1 << 20])
+def test_ndjson(size):
+    assert list(iter_ndjson_records(chunked(ndjson(RECORDS), size))) == RECORDS
+
+
+@pytest.mark.parametrize("size", [1, 7, 1 << 20])
+def test_concatenated_gzip_members(size):
+    payload = gzip.compress(ndjson(RECORDS[:20])) + gzip.compress(ndjson(RECORDS[20:]))
+    assert list(iter_ndjson_records(chunked(payload, size))) == RECORDS
+
+
+@pytest.mark.parametrize("size", [1, 7, 1 << 20])
+def test_crlf_line_endings(size):
+    assert list(iter_ndjson_records(chunked(ndjson(RECORDS, b"\r\n"), size))) == RECORDS
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1 << 20])
+def test_utf8_bom(size):
+    payload = b"\xef\xbb\xbf" + ndjson(RECORDS)
+    assert list(iter_ndjson_records(chunked(payload, size))) == RECORDS
+
+
+def test_utf8_bom_before_json_array():
+    payload = b"\xef\xbb\xbf" + json.dumps(RECORDS).encode()
+    assert list(iter_ndjson_records([payload])) == RECORDS
+
+
+@pytest.mark.parametrize("size", [1, 7, 1 << 20])
+def test_json_documents(size):
+    assert list(iter_ndjson_records(chunked(json.dumps(RECORDS, indent=2).encode(), size))) == RECORDS
+    assert list(iter_ndjson_records(chunked(json.dumps(RECORDS[0], indent=2).encode(), size))) == RECORDS[:1]
+
+
+@pytest.mark.parametrize("bad_line", [b"not json", b'{"user_login": "broken", ', b"{"])
+def test_bad_first_line_skips_only_that_line(bad_line):
+    payload = bad_line + b"\n" + ndjson(RECORDS[1:])
+    records = []
+    with pytest.raises(ReportParseError):
+        for record in iter_ndjson_records(chunked(payload, 7)):
+            records.append(record)
+    assert records == RECORDS[1:]
+
+
+def test_bad_middle_line_skips_only_that_line():
+    payload = ndjson(RECORDS[:10]) + b"garbage\n" + ndjson(RECORDS[10:])
+    records = []
+    with pytest.raises(ReportParseError):
+        for record in iter_ndjson_records([payload]):
+            records.append(record)
+    assert records == RECORDS
+
+
+def test_truncated_gzip():
+    payload = gzip.compress(ndjson(RECORDS))
+    records = []
+    with pytest.raises(ReportParseError):
+        for record in iter_ndjson_records(chunked(payload[: len(payload) // 2], 7)):
+            records.append(record)
+    assert records == RECORDS[: len(records)]
+
+
+def test_unparsable_document():
+    with pytest.raises(ReportParseError):
+        list(iter_ndjson_records([json.dumps(RECORDS).encode()[:-10]]))
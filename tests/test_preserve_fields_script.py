@@ -0,0 +1,109 @@
+"""
+Integration test: write_bulk_to_es(update_condition=...) with the stored
+preserve_fields painless script leaves the same documents as write_to_es(update_condition=...).
+
+Opt-in, it needs a disposable Elasticsearch cluster and is skipped otherwise:
+
+    ES_INTEGRATION_URL=http://localhost:9200 python -m pytest tests/test_preserve_fields_script.py
+
+ELASTICSEARCH_USER / ELASTICSEARCH_PASS are used if set. Bootstrapping the
+ElasticsearchManager creates the project's indexes and stored script on that
+cluster; the cpuad_it_preserve_* indexes written by the test are deleted afterwards.
+"""
+import copy
+import os
+import sys
+import uuid
+
+import pytest
+
+UPDATER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "cpuad-updater")
+ES_INTEGRATION_URL = os.getenv("ES_INTEGRATION_URL")
+
+pytestmark = pytest.mark.skipif(not ES_INTEGRATION_URL, reason="ES_INTEGRATION_URL is not set")
+
+# Fields stamped with the time of the write, different on every call
+VOLATILE_FIELDS = ("last_updated_at", "@timestamp")
+
+CONDITION = {"is_active_today": 1}
+
+SEAT = {
+    "assignee_login": "octocat",
+    "organization_slug": "it-org",
+    "assignee_team_slug": "it-team",
+    "last_activity_at": "2025-01-01T10:00:00Z",
+    "last_activity_editor": "vscode/1.0",
+    "day": "2025-01-02",
+}
+
+# unique_hash -> document already indexed before the write, None when there is none
+EXISTING = {
+    "active": {**SEAT, "unique_hash": "active", "is_active_today": 1},
+    "inactive": {**SEAT, "unique_hash": "inactive", "is_active_today": 0},
+    "no-field": {**SEAT, "unique_hash": "no-field"},
+    "new": None,
+}
+
+# The same update is written to every document
+UPDATE = {
+    "last_activity_at": "2025-01-02T18:00:00Z",
+    "last_activity_editor": "jetbrains/2.0",
+    "is_active_today": 0,
+}
+
+# is_active_today each document must end up with
+EXPECTED_IS_ACTIVE_TODAY = {"active": 1, "inactive": 0, "no-field": 0, "new": 0}
+
+
+@pytest.fixture(scope="module")
+def manager(tmp_path_factory):
+    # Configuration is read from the environment when the updater modules are
+    # imported, and index mappings are loaded relative to the updater folder
+    os.environ["ELASTICSEARCH_URL"] = ES_INTEGRATION_URL
+    os.environ["STATE_PATH"] = str(tmp_path_factory.mktemp("state"))
+    sys.path.insert(0, UPDATER_PATH)
+    cwd = os.getcwd()
+    os.chdir(UPDATER_PATH)
+    try:
+        from es_manager import ElasticsearchManager
+
+        yield ElasticsearchManager()
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def indexes(manager):
+    suffix = uuid.uuid4().hex[:8]
+    names = {"single": f"cpuad_it_preserve_single_{suffix}", "bulk": f"cpuad_it_preserve_bulk_{suffix}"}
+    for index_name in names.values():
+        for doc_id, doc in EXISTING.items():
+            if doc is not None:
+                manager.es.index(index=index_name, id=doc_id, document=doc)
+        manager.es.indices.refresh(index=index_name)
+    yield names
+    manager.es.indices.delete(index=list(names.values()), ignore_unavailable=True)
+
+
+def updated_docs():
+    return [{**copy.deepcopy(SEAT), "unique_hash": doc_id, **UPDATE} for doc_id in EXISTING]
+
+
+def stable_source(manager, index_name, doc_id):
+    source = manager.es.get(index=index_name, id=doc_id)["_source"]
+    return {key: value for key, value in source.items() if key not in VOLATILE_FIELDS}
+
+
+def test_bulk_script_matches_write_to_es(manager, indexes):
+    for doc in updated_docs():
+        manager.write_to_es(indexes["single"], doc, update_condition=CONDITION)
+    written, failed = manager.write_bulk_to_es(indexes["bulk"], updated_docs(), update_condition=CONDITION)
+    assert (written, failed) == (len(EXISTING), 0)
+
+    for doc_id in EXISTING:
+        single = stable_source(manager, indexes["single"], doc_id)
+        bulk = stable_source(manager, indexes["bulk"], doc_id)
+        assert bulk == single, doc_id
+        assert bulk["is_active_today"] == EXPECTED_IS_ACTIVE_TODAY[doc_id], doc_id
+        # Fields outside the condition are always overwritten
+        assert bulk["last_activity_at"] == UPDATE["last_activity_at"], doc_id